@@ -1,5 +1,7 @@
 import os
+import re
 import sys
+import base64
 import time
 import traceback
 from time import sleep
@@ -11,13 +13,14 @@ import datetime
 from werkzeug.utils import secure_filename
 from PIL import Image
 import asyncio
-from src import service_bus, db_utils
+from src import service_bus, db_utils, sender_pool, resources, stage_timer
 import json
 import threading
-from processor import process_invoice, process_single_invoice
+from processor import process_invoice, process_single_invoice, get_pipeline_metrics
 from exception_processor import process_exceptions
 from src.utils.translation import translate_document
-from src.utils import arabic_util
+from src.utils import arabic_util, pdf_utils
+from azure.core.exceptions import ResourceNotFoundError
 
 log_folder = "logs"
 if not os.path.isdir(log_folder):
@@ -32,6 +35,9 @@ logger.addHandler(handler)
 logger.addHandler(stream_handler)
 logger.propagate = False
 
+# Models and clients load on first use unless listed in RESOURCE_WARMUP
+resources.warmup()
+
 # db_connection = db_utils.connect_db()
 
 ALLOWED_EXTENSION = "pdf"
@@ -47,6 +53,15 @@ correct_auth_token = os.getenv("SPEND_CONSOLE_AUTH_TOKEN")
 
 @app.route('/', methods=['POST'])
 def invoice_processor():
+    # output_mode=reference returns where the uploaded PDF is instead of the PDF itself (invoiceB64Data)
+    output_mode = flask.request.args.get('output_mode')
+    if output_mode is not None and output_mode not in pdf_utils.OUTPUT_MODES:
+        return flask.jsonify("Bad Request"), 400
+    with pdf_utils.output_mode(output_mode):
+        return process_invoice_request()
+
+
+def process_invoice_request():
     start = datetime.datetime.now()
     start = datetime.datetime.now()
     logger.info("Calling ML service for processing the invoice at %s", start.strftime("%m/%d/%Y, %H:%M:%S"))
@@ -150,10 +165,42 @@ def form_upload():
        # return flask.jsonify({"message": f"There was an error uploading the file : {e}"}), 500
 
     return flask.jsonify(response), 200
+@app.route('/invoice_document/<md5>', methods=['GET'])
+def invoice_document(md5):
+    """The PDF an invoiceDocument reference points to, as base64 JSON (invoiceB64Data) with format=base64."""
+    # Stored invoices are never served without a configured token
+    if not correct_auth_token or not ('Auth-Token' in flask.request.headers and
+                                      flask.request.headers['Auth-Token'] == correct_auth_token):
+        return flask.jsonify("Incorrect authentication token"), 401
+    if not re.fullmatch(r"[0-9a-f]{32}", md5):
+        return flask.jsonify("Bad Request"), 400
+    try:
+        data = pdf_utils.download_document(md5)
+    except ResourceNotFoundError:
+        return flask.jsonify("Not Found"), 404
+    if flask.request.args.get('format') == 'base64':
+        return flask.jsonify({"invoiceB64Data": base64.b64encode(data).decode('utf-8')})
+    return flask.Response(data, mimetype="application/pdf")
 @app.route('/health_check', methods=['GET'])
 def test():
     return flask.jsonify("Test passed")
 
+@app.route('/servicebus_metrics', methods=['GET'])
+def servicebus_metrics():
+    return flask.jsonify(sender_pool.get_sender_pool().get_metrics())
+
+@app.route('/pipeline_metrics', methods=['GET'])
+def pipeline_metrics():
+    # Invoices processed by the Flask process, the Service Bus worker processes log theirs
+    return flask.jsonify(get_pipeline_metrics())
+
+@app.route('/stage_timings/<correlation_id>', methods=['GET'])
+def stage_timings(correlation_id):
+    timings = stage_timer.get_timings(correlation_id)
+    if timings is None:
+        return flask.jsonify("No stage timings for this correlation ID"), 404
+    return flask.jsonify(timings)
+
 t= threading.Thread(target=asyncio.run, args=(service_bus.listen_for_messages(),))
 t.start()
 
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark of raw_text_utils.other_field_values against the previous one regex per field name loop,
+over the blocks of recorded Form Recognizer responses. Also checks both produce the same field values.
+
+    python -m benchmarks.field_matcher responses/*.json --version v2.1 --repeat 20
+"""
+import re
+import sys
+import json
+import time
+import string
+import argparse
+from collections import defaultdict
+
+from src import raw_text_utils
+from src.raw_text_utils import FIELD_NAMES, insert_key_value
+
+
+def legacy_other_field_values(blocks_list):
+    field_values = defaultdict(lambda: [])
+    previous_word = ""
+    split_point = [":", "#", "."]
+    for block in blocks_list:
+        for blk in block:
+            for line in blk["lines"]:
+                break_point = False
+                if previous_word:
+                    insert_key_value(previous_word, line, field_values)
+                    previous_word = ""
+                for sp in split_point:
+                    if sp in line:
+                        break_point = True
+                        words = line.split(sp)
+                        if len(words) > 1 and len(words[1]) > 3:
+                            if ("to" in words[0].lower() or "from" in words[0].lower()) and len(words) > 2:
+                                insert_key_value(words[1], words[2], field_values)
+                            else:
+                                insert_key_value(words[0], words[1], field_values)
+                        else:
+                            previous_word = words[0]
+                        break
+                if break_point is True:
+                    continue
+                translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+                line = line.translate(translator).lower()
+                for fn in FIELD_NAMES:
+                    field_search = re.compile(r"\b%s\b" % fn, re.I)
+                    if field_search.search(line):
+                        if not fn == "po":
+                            words = line.lower().split(fn)
+                            if len(words) > 1 and len(words[1]) > 3:
+                                if len(line.replace(fn, "").split(" ")) <= 6:
+                                    insert_key_value(fn, words[1], field_values)
+                            else:
+                                previous_word = fn
+                            break
+                        else:
+                            if not re.compile(r'\b%s\b' % "po box", re.I).search(line) or re.compile(
+                                    r'\b%s\b' % "p o box", re.I).search(line):
+                                words = line.lower().split(fn)
+                                if len(words) > 1 and len(words[1]) > 3:
+                                    if len(line.split(" ")) < 5:
+                                        insert_key_value(fn, words[1], field_values)
+                                else:
+                                    previous_word = fn
+                                break
+    return field_values
+
+
+def time_call(func, blocks_lists, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for blocks_list in blocks_lists:
+            func(blocks_list)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("responses", nargs="+", help="Recorded Form Recognizer response JSON files")
+    parser.add_argument("--version", default="v3.1", choices=["v2.1", "v3.1"])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    blocks_lists = []
+    for path in args.responses:
+        with open(path, "rb") as f:
+            blocks_lists.append(raw_text_utils.identify_blocks(json.load(f), args.version))
+    lines = sum(len(blk["lines"]) for blocks_list in blocks_lists for block in blocks_list for blk in block)
+
+    for blocks_list in blocks_lists:
+        if dict(raw_text_utils.other_field_values(blocks_list)) != dict(legacy_other_field_values(blocks_list)):
+            print("Field values differ from the legacy implementation")
+            return 1
+
+    legacy = time_call(legacy_other_field_values, blocks_lists, args.repeat)
+    compiled = time_call(raw_text_utils.other_field_values, blocks_lists, args.repeat)
+    print(f"{len(blocks_lists)} responses, {lines} lines")
+    print(f"legacy:   {legacy * 1000:.2f}ms ({lines / legacy:.0f} lines/s)")
+    print(f"compiled: {compiled * 1000:.2f}ms ({lines / compiled:.0f} lines/s)")
+    print(f"speedup:  {legacy / compiled:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
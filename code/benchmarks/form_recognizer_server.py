@@ -0,0 +1,215 @@
+"""
+Local stand-in for the Form Recognizer endpoints forms_recognizer.build_api_endpoint calls (v2.1
+prebuilt/invoice/analyze and v3.1 documentModels/prebuilt-invoice:analyze), for load tests that should
+not use Azure quota. Analyze requests get a 202 with an Operation-Location to poll, like the real service,
+and the operation result is the recorded response of the posted file, looked up by its md5 in
+<responses>/formrecognizer-responses-v2|v3/<md5>.json (the blob cache layout) or <responses>/<md5>.json.
+Latency, 429s, 500s and failed analyses can be injected.
+
+    python -m benchmarks.form_recognizer_server --responses recorded/ --port 8765 --latency 2 --throttle-rate 0.1
+    FR_ENDPOINT=http://localhost:8765 FR_DISK_CACHE_ENABLED=False python app.py
+
+GET /stats returns the request counts.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict, Counter
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+V2_ANALYZE_PATH = "/formrecognizer/v2.1/prebuilt/invoice/analyze"
+V2_RESULTS_PATH = "/formrecognizer/v2.1/prebuilt/invoice/analyzeResults/"
+V3_ANALYZE_PATH = "/formrecognizer/documentModels/prebuilt-invoice:analyze"
+V3_RESULTS_PATH = "/formrecognizer/documentModels/prebuilt-invoice/analyzeResults/"
+CONTAINER_NAMES = {"v2.1": "formrecognizer-responses-v2", "v3.1": "formrecognizer-responses-v3"}
+# Operations kept for polling, the oldest are dropped first
+MAX_OPERATIONS = 10000
+
+
+class FormRecognizerStandIn:
+    def __init__(self, responses_dir, fallback_response=None, latency=0.0, latency_jitter=0.0, submit_latency=0.0,
+                 throttle_rate=0.0, retry_after=1, error_rate=0.0, failure_rate=0.0, seed=None):
+        self.responses_dir = responses_dir
+        self.fallback_response = fallback_response
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.submit_latency = submit_latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.operations = OrderedDict()
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def chance(self, rate):
+        with self._lock:
+            return rate > 0 and self.random.random() < rate
+
+    def find_response(self, md5, version):
+        for path in [os.path.join(self.responses_dir, CONTAINER_NAMES[version], f"{md5}.json"),
+                     os.path.join(self.responses_dir, f"{md5}.json")]:
+            if os.path.exists(path):
+                return path
+        return self.fallback_response
+
+    def start_operation(self, data, version):
+        """Operation ID of a new analysis of data, None when there is no recorded response for it."""
+        md5 = hashlib.md5(data).hexdigest()
+        response_path = self.find_response(md5, version)
+        if response_path is None:
+            return None, md5
+        with self._lock:
+            duration = self.latency + self.random.uniform(0, self.latency_jitter)
+            fails = self.failure_rate > 0 and self.random.random() < self.failure_rate
+            operation_id = str(uuid.uuid4())
+            self.operations[operation_id] = {"response_path": response_path, "version": version, "fails": fails,
+                                             "created": time.time(), "ready_at": time.monotonic() + duration}
+            while len(self.operations) > MAX_OPERATIONS:
+                self.operations.popitem(last=False)
+        return operation_id, md5
+
+    def get_operation(self, operation_id):
+        with self._lock:
+            return self.operations.get(operation_id)
+
+    def operation_result(self, operation):
+        created = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(operation["created"]))
+        if time.monotonic() < operation["ready_at"]:
+            return {"status": "running", "createdDateTime": created, "lastUpdatedDateTime": created}
+        if operation["fails"]:
+            return {"status": "failed", "createdDateTime": created, "lastUpdatedDateTime": created,
+                    "error": {"code": "InternalServerError", "message": "Injected analyze failure"}}
+        with open(operation["response_path"], "rb") as f:
+            result = json.load(f)
+        result["status"] = "succeeded"
+        return result
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, as the client reuses its connections
+    stand_in = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, code, message, headers=None):
+        self.stand_in.count(f"status_{status}")
+        self.send_json(status, {"error": {"code": code, "message": message}}, headers)
+
+    def injected_error(self):
+        """Sends an injected 429 or 500 and returns True, False when the request goes through."""
+        if self.stand_in.chance(self.stand_in.throttle_rate):
+            self.send_error_json(429, "429", "Injected rate limit", {"Retry-After": str(self.stand_in.retry_after)})
+            return True
+        if self.stand_in.chance(self.stand_in.error_rate):
+            self.send_error_json(500, "InternalServerError", "Injected server error")
+            return True
+        return False
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if path == V2_ANALYZE_PATH:
+            version, results_path, query = "v2.1", V2_RESULTS_PATH, ""
+        elif path == V3_ANALYZE_PATH:
+            version, results_path, query = "v3.1", V3_RESULTS_PATH, "?" + (urlsplit(self.path).query or "")
+        else:
+            self.send_error_json(404, "NotFound", f"No endpoint at {path}")
+            return
+        self.stand_in.count(f"analyze_{version}")
+        if self.stand_in.submit_latency:
+            time.sleep(self.stand_in.submit_latency)
+        if self.injected_error():
+            return
+        operation_id, md5 = self.stand_in.start_operation(data, version)
+        if operation_id is None:
+            self.send_error_json(400, "InvalidRequest", f"No recorded {version} response for md5 {md5}")
+            return
+        host = self.headers.get("Host", f"{self.server.server_address[0]}:{self.server.server_address[1]}")
+        self.send_response(202)
+        self.send_header("Operation-Location", f"http://{host}{results_path}{operation_id}{query}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/stats":
+            with self.stand_in._lock:
+                stats = dict(self.stand_in.stats, operations=len(self.stand_in.operations))
+            self.send_json(200, stats)
+            return
+        if not (path.startswith(V2_RESULTS_PATH) or path.startswith(V3_RESULTS_PATH)):
+            self.send_error_json(404, "NotFound", f"No endpoint at {path}")
+            return
+        self.stand_in.count("poll")
+        if self.injected_error():
+            return
+        operation = self.stand_in.get_operation(path.rsplit("/", 1)[-1])
+        if operation is None:
+            self.send_error_json(404, "NotFound", "Unknown operation")
+            return
+        self.send_json(200, self.stand_in.operation_result(operation))
+
+
+def make_server(stand_in, host="127.0.0.1", port=8765):
+    handler = type("Handler", (StandInHandler,), {"stand_in": stand_in})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", required=True, help="Directory of recorded responses named <md5>.json")
+    parser.add_argument("--fallback-response", default=None,
+                        help="Response returned for files that were not recorded, these get a 400 otherwise")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds an analysis takes")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Random extra seconds per analysis")
+    parser.add_argument("--submit-latency", type=float, default=0.0, help="Seconds before answering a POST")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds of the 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of analyses ending as failed")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    stand_in = FormRecognizerStandIn(args.responses, args.fallback_response, args.latency, args.latency_jitter,
+                                     args.submit_latency, args.throttle_rate, args.retry_after, args.error_rate,
+                                     args.failure_rate, args.seed)
+    server = make_server(stand_in, args.host, args.port)
+    print(f"Form Recognizer stand-in listening on http://{args.host}:{args.port}, "
+          f"run the worker with FR_ENDPOINT=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Reports the cold start cost of importing a module (app by default) per imported module, using
+python -X importtime in a fresh interpreter, and fails when the total is over the target.
+
+    python -m benchmarks.import_time --module app --target 5 --top 20
+    python -m benchmarks.import_time --module app --warmup "spacy.*"
+"""
+import sys
+import argparse
+import subprocess
+
+
+def measure_import(module, warmup=None):
+    code = f"import {module}"
+    if warmup:
+        code += ("\nfrom src import resources\nresources.warmup({!r})\n"
+                 "for name, seconds in resources.get_init_timings().items():\n"
+                 "    print(f'resource {{name}} {{seconds}}')").format(warmup.split(","))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        timings.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    resource_timings = {}
+    for line in result.stdout.splitlines():
+        if line.startswith("resource "):
+            _, name, seconds = line.split()
+            resource_timings[name] = float(seconds)
+    return timings, resource_timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--target", type=float, default=None, help="Maximum import time in seconds")
+    parser.add_argument("--top", type=int, default=20, help="Number of slowest modules to list")
+    parser.add_argument("--warmup", default=None, help="Also time resources.warmup() for these patterns")
+    args = parser.parse_args(argv)
+
+    timings, resource_timings = measure_import(args.module, args.warmup)
+    total = next((cumulative for name, _, cumulative in timings if name == args.module), None)
+    if total is None:
+        total = sum(self_seconds for _, self_seconds, _ in timings)
+
+    print(f"Importing {args.module} took {total:.3f}s")
+    print(f"{'self s':>8} {'cumul. s':>9}  module")
+    for name, self_seconds, cumulative in sorted(timings, key=lambda t: t[1], reverse=True)[:args.top]:
+        print(f"{self_seconds:8.3f} {cumulative:9.3f}  {name}")
+    for name, seconds in resource_timings.items():
+        print(f"warmup {name}: {seconds:.3f}s")
+
+    if args.target is not None and total > args.target:
+        print(f"Import time {total:.3f}s is over the {args.target}s target")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Replays recorded Form Recognizer responses through the post-OCR pipeline (processor.process_single_invoice)
+with the Form Recognizer, GPT, UNSPSC and blob calls stubbed out, and reports pages/s, p50/p95 of every
+stage and the peak memory. Fails when the results are worse than a baseline by more than --max-regression.
+
+    python -m benchmarks.replay
+    python -m benchmarks.replay responses/ more/response.json --repeat 5 --output replay.json
+    python -m benchmarks.replay responses/ --baseline replay.json --max-regression 0.2
+"""
+import os
+import sys
+import copy
+import glob
+import json
+import math
+import time
+import logging
+import argparse
+import contextlib
+from unittest import mock
+
+import processor
+from src import forms_recognizer, mapping_utils, stage_timer
+from src.utils import azure_utils, pdf_utils, validation_populater
+from src.generativeai import extraction_util
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures")
+DEFAULT_RESPONSES = [os.path.join(FIXTURES, "CSVN515208_form_recognizer_response_v2.json"),
+                     os.path.join(FIXTURES, "CSVN515208_form_recognizer_response_v3.json")]
+# Stages faster than this in the baseline are too noisy to fail a run on
+MIN_STAGE_SECONDS = 0.001
+
+
+def detect_version(azure_response):
+    return "v2.1" if "readResults" in azure_response["analyzeResult"] else "v3.1"
+
+
+def load_responses(paths, version=None):
+    """(path, response, version) of every recorded response, directories are read for their *.json files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.json"))))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            print(f"Skipping {path}, it does not exist")
+    responses = []
+    for path in files:
+        with open(path, "rb") as f:
+            azure_response = json.load(f)
+        if "analyzeResult" not in azure_response:
+            print(f"Skipping {path}, it is not an analyze response")
+            continue
+        responses.append((path, azure_response, version or detect_version(azure_response)))
+    return responses
+
+
+class UnspscResponse:
+    status_code = 200
+
+    def __init__(self, items_count):
+        self.items_count = items_count
+
+    def json(self):
+        return {"results": [{"category": "", "category_code": ""}] * self.items_count}
+
+
+def unspsc_post(url, data=None, **kwargs):
+    return UnspscResponse(len(json.loads(data)["items"]))
+
+
+def not_called(name):
+    def stub(*args, **kwargs):
+        raise RuntimeError(f"{name} is not called during a replay")
+    return stub
+
+
+@contextlib.contextmanager
+def stubbed_services():
+    """Patches the network and PDF calls of the pipeline, everything between them runs as in production."""
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(forms_recognizer, "get_response", not_called("Form Recognizer")))
+        stack.enter_context(mock.patch.object(extraction_util, "update_fields_using_genai",
+                                              lambda azure_response, detected_language: azure_response))
+        stack.enter_context(mock.patch.object(validation_populater.requests, "post", unspsc_post))
+        stack.enter_context(mock.patch.object(azure_utils, "upload_blob", lambda *args, **kwargs: None))
+        # There is no PDF behind a recorded response
+        stack.enter_context(mock.patch.object(pdf_utils, "encode_document", lambda *args, **kwargs: {
+            "invoiceB64Data": "", "compressedFilePath": None}))
+        stack.enter_context(mock.patch.object(pdf_utils, "check_scanned", lambda *args, **kwargs: False))
+        stack.enter_context(mock.patch.object(pdf_utils, "extract_adj_no", lambda *args, **kwargs: None))
+        stack.enter_context(mock.patch.object(pdf_utils, "extract_employee_ids", lambda *args, **kwargs: []))
+        yield
+
+
+def replay(path, azure_response, version, logger):
+    """Processes a copy of the response, returns whether it succeeded, its duration and stage timings."""
+    azure_response = copy.deepcopy(azure_response)
+    with stage_timer.collecting(enabled=True) as timings:
+        start = time.perf_counter()
+        result = processor.process_single_invoice(path, logger, None, "pdf", version, False, upload_log=False,
+                                                  final_processing=True, azure_response=azure_response)
+        seconds = time.perf_counter() - start
+    # None is an exception in the pipeline, "Unknown" a text too short to detect its language
+    return result is not None, seconds, timings.as_dict()
+
+
+def percentile(values, percent):
+    """Nearest rank percentile."""
+    values = sorted(values)
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run(responses, repeat=3, warmup=1, verbose=False):
+    logger = logging.getLogger("replay")
+    logger.setLevel(logging.WARNING)
+    page_counts = [len(azure_response["analyzeResult"][mapping_utils.get_response_structure(version)[0]])
+                   for _, azure_response, version in responses]
+    stage_seconds = {}
+    invoice_seconds = []
+    failures = set()
+    with stubbed_services(), open(os.devnull, "w") as devnull, \
+            (contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)):
+        # Models load and caches fill during the warmup runs, they are not timed
+        for _ in range(warmup):
+            for path, azure_response, version in responses:
+                replay(path, azure_response, version, logger)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for path, azure_response, version in responses:
+                succeeded, seconds, timings = replay(path, azure_response, version, logger)
+                if not succeeded:
+                    failures.add(path)
+                invoice_seconds.append(seconds)
+                for name, stage in timings.items():
+                    stage_seconds.setdefault(name, []).append(stage["seconds"])
+        seconds = time.perf_counter() - start
+    pages = sum(page_counts) * repeat
+    return {
+        "responses": len(responses),
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "pagesPerSecond": round(pages / seconds, 2) if seconds else None,
+        "invoice": {"p50": round(percentile(invoice_seconds, 50), 4),
+                    "p95": round(percentile(invoice_seconds, 95), 4)},
+        "stages": {name: {"count": len(values), "p50": round(percentile(values, 50), 4),
+                          "p95": round(percentile(values, 95), 4)}
+                   for name, values in sorted(stage_seconds.items())},
+        "peakMemoryMb": peak_memory_mb(),
+        "failures": sorted(failures),
+    }
+
+
+def find_regressions(result, baseline, max_regression):
+    """Descriptions of the results worse than the baseline by more than max_regression (0.2 for 20%)."""
+    regressions = []
+    if baseline.get("pagesPerSecond") and result["pagesPerSecond"] < baseline["pagesPerSecond"] * (1 - max_regression):
+        regressions.append(f"pages/s {result['pagesPerSecond']} vs {baseline['pagesPerSecond']}")
+    for name, stage in result["stages"].items():
+        baseline_stage = baseline.get("stages", {}).get(name)
+        if baseline_stage is None or baseline_stage["p95"] < MIN_STAGE_SECONDS:
+            continue
+        if stage["p95"] > baseline_stage["p95"] * (1 + max_regression):
+            regressions.append(f"{name} p95 {stage['p95']}s vs {baseline_stage['p95']}s")
+    if baseline.get("peakMemoryMb") and result["peakMemoryMb"] and \
+            result["peakMemoryMb"] > baseline["peakMemoryMb"] * (1 + max_regression):
+        regressions.append(f"peak memory {result['peakMemoryMb']}MB vs {baseline['peakMemoryMb']}MB")
+    return regressions
+
+
+def print_report(result):
+    print(f"{result['responses']} responses, {result['pages']} pages in {result['seconds']}s "
+          f"({result['pagesPerSecond']} pages/s), peak memory {result['peakMemoryMb']}MB")
+    print(f"invoice: p50 {result['invoice']['p50']:.4f}s p95 {result['invoice']['p95']:.4f}s")
+    print(f"{'p50 s':>8} {'p95 s':>8} {'count':>6}  stage")
+    for name, stage in sorted(result["stages"].items(), key=lambda item: item[1]["p95"], reverse=True):
+        print(f"{stage['p50']:8.4f} {stage['p95']:8.4f} {stage['count']:6d}  {name}")
+    for path in result["failures"]:
+        print(f"Processing failed for {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("responses", nargs="*", default=DEFAULT_RESPONSES,
+                        help="Recorded analyze responses or directories of them")
+    parser.add_argument("--version", default=None, help="v2.1 or v3.1, worked out per response by default")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Writes the results as JSON, usable as a baseline")
+    parser.add_argument("--baseline", default=None, help="Results of an earlier run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed slowdown against the baseline, 0.2 for 20%%")
+    parser.add_argument("--min-pages-per-second", type=float, default=None)
+    parser.add_argument("--verbose", action="store_true", help="Keeps the pipeline's own output")
+    args = parser.parse_args(argv)
+
+    responses = load_responses(args.responses, args.version)
+    if not responses:
+        print("No responses to replay")
+        return 1
+    result = run(responses, args.repeat, args.warmup, args.verbose)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failed = bool(result["failures"])
+    if args.min_pages_per_second is not None and result["pagesPerSecond"] < args.min_pages_per_second:
+        print(f"{result['pagesPerSecond']} pages/s is under the {args.min_pages_per_second} target")
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(result, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"Regression over {args.max_regression:.0%}: {regression}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
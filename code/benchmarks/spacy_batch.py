@@ -0,0 +1,84 @@
+"""
+Compares spacy_inference.predict_batch with the single text predict_* functions on the page texts of
+recorded Form Recognizer responses.
+
+    python -m benchmarks.spacy_batch responses/*.json --version v3.1 --batch-size 16 --n-process 1
+"""
+import sys
+import json
+import time
+import argparse
+
+from src import raw_text_utils, response_slicer, mapping_utils
+from src.ner import spacy_inference
+
+
+def load_page_texts(paths, version):
+    page_key, _, _ = mapping_utils.get_response_structure(version)
+    texts = []
+    for path in paths:
+        with open(path, "rb") as f:
+            azure_response = json.load(f)
+        for page_number in range(1, len(azure_response["analyzeResult"][page_key]) + 1):
+            page_response = response_slicer.slice_response(azure_response, [page_number], version)
+            raw_text, _ = raw_text_utils.get_raw_text(page_response, version)
+            texts.append(raw_text)
+    return texts
+
+
+def predict_one_by_one(texts):
+    results = []
+    for text in texts:
+        results.append({
+            "entities": spacy_inference.predict(text),
+            "bank_details": spacy_inference.predict_bank_details(text, {"ABN": [], "AccountNum": [], "AccountName": [],
+                                                                        "BSB": [], "SwiftCode": [], "BankName": []}),
+            "ntn_strn": spacy_inference.predict_ntn_strn_num(text, {"NTN": [], "STRN": []}),
+            "credit_memo_num": spacy_inference.predict_credit_memo_num(text),
+            "contract_num": spacy_inference.predict_contract_num(text),
+            "account_num": spacy_inference.predict_account_num(text),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("responses", nargs="+", help="Recorded Form Recognizer response JSON files")
+    parser.add_argument("--version", default="v3.1", choices=["v2.1", "v3.1"])
+    parser.add_argument("--batch-size", type=int, default=spacy_inference.PIPE_BATCH_SIZE)
+    parser.add_argument("--n-process", type=int, default=spacy_inference.PIPE_N_PROCESS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    texts = load_page_texts(args.responses, args.version)
+    if not texts:
+        print("No pages found")
+        return 1
+    print(f"{len(texts)} pages from {len(args.responses)} responses")
+
+    # Warm both paths up first so model loading and first call allocations are not timed
+    expected = predict_one_by_one(texts[:1])
+    spacy_inference.predict_batch(texts[:1], batch_size=args.batch_size, n_process=args.n_process)
+
+    single_times, batch_times = [], []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        expected = predict_one_by_one(texts)
+        single_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        results = spacy_inference.predict_batch(texts, batch_size=args.batch_size, n_process=args.n_process)
+        batch_times.append(time.perf_counter() - start)
+
+    single, batch = min(single_times), min(batch_times)
+    print(f"per call: {single:.3f}s ({len(texts) / single:.1f} pages/s)")
+    print(f"batched:  {batch:.3f}s ({len(texts) / batch:.1f} pages/s), "
+          f"batch_size={args.batch_size} n_process={args.n_process}")
+    print(f"speedup:  {single / batch:.2f}x")
+    if results != expected:
+        print("Batched entities differ from the per call entities")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,7 @@ import concurrent.futures
 
 from src.utils import azure_utils
 from src.generativeai import user_action_automation
-from src import db_utils
+from src import db_utils, resources
 
 
 EXCEPTION_FIELD_MAPPING = {'Invoice.General.Tax': 'Tax',
@@ -60,7 +60,8 @@ EXCEPTION_FIELD_MAPPING = {'Invoice.General.Tax': 'Tax',
                             'Invoice.General.NoLineItems': 'Items'}
 ITEMS_RELATED_FIELDS = ['OriginalInvoiceTotal', 'Tax', 'SubTotal']
 
-DB_CONNECTION = db_utils.connect_db()
+# Connected on the first exception request instead of at import
+DB_CONNECTION = resources.register("sql.connection", db_utils.connect_db, per_process=True)
 
 def process_exceptions(invoice_id, exceptions):
     actions = []
@@ -71,7 +72,7 @@ def process_exceptions(invoice_id, exceptions):
     if any(field in ITEMS_RELATED_FIELDS for field in relevant_fields) and "Items" not in relevant_fields:
         relevant_fields.append("Items")
     print("Relevant fields: ", relevant_fields)
-    relevant_fields_data = db_utils.get_processed_invoice_data(invoice_id, relevant_fields, DB_CONNECTION)
+    relevant_fields_data = db_utils.get_processed_invoice_data(invoice_id, relevant_fields, DB_CONNECTION.get())
     print("Relevant fields data: ", relevant_fields_data)
     print("Time taken to get invoice data from db: ", time.time()-start_time)
 
@@ -1,7 +1,16 @@
+import os
+import copy
+import json
+import itertools
+import contextvars
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src import forms_recognizer, raw_text_utils, validation_util, scores_calculator, split_util, mapping_utils
+from src import response_slicer, response_cache, keywords, text_views, stage_timer, invoice_model
+from src import layout as layout_analysis
 from src.ner import spacy_inference
 from src.utils import pdf_utils, azure_utils, currency_extraction, bank_details_util, vat_extraction
+from src.utils import pdf_compression
 from src.ML import classification_inference
 from src.generativeai import extraction_util
 from langdetect import detect
@@ -15,7 +24,17 @@ PO_SYNONYMS = ["po/claim no", "purchase order", "sap", "customer order no", "ord
                "your order no", "order no","order no .","order number","order id", "po no", "ship-to-ref" ,"po",
                "assessment number", "p o", "customer reference", "your reference", "reference", "our ref", "ref"]
 
-ADCB_KEYWORDS = ["adcb", "al hilal bank", "abu dhabi commercial bank"]
+ADCB_KEYWORDS = keywords.ADCB_KEYWORDS
+
+# Number of pages of a multi-page PDF analysed concurrently during split detection, 1 analyses them one by one
+FR_PAGE_CONCURRENCY = int(os.getenv("FR_PAGE_CONCURRENCY", "8"))
+# Analyse a multi-page PDF once and slice per-page/per-split responses from it instead of one analysis per page
+ANALYZE_ONCE = os.getenv("FR_ANALYZE_ONCE", "False").lower() == "true"
+# Every this many process_invoice calls a process logs its pipeline metrics (get_pipeline_metrics), 0 never does
+PIPELINE_METRICS_LOG_EVERY = int(os.getenv("PIPELINE_METRICS_LOG_EVERY", "50"))
+# Pages of a multi-page PDF skip the stages split detection does not read (page encoding, classification,
+# check_scanned, ...), False runs the full pipeline per page
+SPLIT_PROBE = os.getenv("SPLIT_PROBE", "True").lower() == "true"
 
 
 # log_folder = "logs"
@@ -34,130 +53,143 @@ ADCB_KEYWORDS = ["adcb", "al hilal bank", "abu dhabi commercial bank"]
 # sys.stdout = log_writer
 
 
-def process_single_invoice(pdf, logger, log_filename, extension, version, run_classification, upload_log, final_processing=False, temp=False, file_id=None, correlation_id=None):
+def process_single_invoice(pdf, logger, log_filename, extension, version, run_classification, upload_log, final_processing=False, temp=False, file_id=None, correlation_id=None, azure_response=None, document=None, split_probe=False):
+    # split_probe is for the pages of split detection, it skips the stages whose results split_util.find_splits and
+    # the scores do not read, everything they do read is worked out exactly as for a final invoice
+    # The caller passes the context of the file it already opened, otherwise it is created for this call only
+    owns_document = document is None
+    if owns_document:
+        document = pdf_utils.DocumentContext(pdf)
+    # Time spent in each stage of this invoice, None unless STAGE_TIMINGS is on
+    timings_scope = stage_timer.collecting(correlation_id)
+    timings = timings_scope.start()
     try:
         tapal_placeholders = {"NTN": [], "STRN": []}
 
-        azure_response = forms_recognizer.get_response(pdf, extension, logger, version)
+        # azure_response is passed in when it was sliced from an analysis of the whole document
+        if azure_response is None:
+            with stage_timer.stage("form_recognizer"):
+                azure_response = forms_recognizer.get_response(pdf, extension, logger, version, pdf_md5=document.md5)
         page_key, text_or_content, value_type = mapping_utils.get_response_structure(version)
         read_results = azure_response.get("analyzeResult", {}).get(page_key, [])
         if all(result.get("lines", []) == [] for result in read_results):
             logger.info("Page is blank or contains no meaningful content.")
             return None, ""
 
-        raw_text, raw_text_without_spaces = raw_text_utils.get_raw_text(azure_response, version)
+        with stage_timer.stage("raw_text"):
+            raw_text, raw_text_without_spaces, line_index = raw_text_utils.build_raw_text(azure_response, version)
         # For cases where there is no text, text is too short, or a blank page return the detected language as unknown
         if not raw_text or len(raw_text.strip()) < 3:
             return "Unknown"
+        # Lowercased, single line, punctuation stripped, ... versions of the raw text, each worked out once
+        views = text_views.get(raw_text)
         try:
-            detected_language = detect(raw_text)
-            if "yemen" in raw_text.lower():
+            with stage_timer.stage("language_detection"):
+                detected_language = detect(raw_text)
+            if views.lower_index.has("yemen"):
                 detected_language = "ar"
         except LangDetectException:
             return "Unknown"
 
         if (final_processing is True) and (version == "v3.1") and (temp is False):
-            if any(bank in raw_text.lower() for bank in ADCB_KEYWORDS):
-                azure_response = vat_extraction.extract_vat_info(azure_response)
+            if views.lower_index.has_any(ADCB_KEYWORDS):
+                with stage_timer.stage("vat_extraction"):
+                    azure_response = vat_extraction.extract_vat_info(azure_response)
             # if "InvoiceId" in azure_response['analyzeResult']["documents"][0]['fields']:
-            azure_response = extraction_util.update_fields_using_genai(azure_response, detected_language)
+            with stage_timer.stage("genai"):
+                azure_response = extraction_util.update_fields_using_genai(azure_response, detected_language)
         # raw_text = raw_text_utils.get_raw_text(azure_response)
         missing_fields = validation_util.get_missing_fields(azure_response,version)
         logger.debug("Missing fields: %s", str(missing_fields))
-        page_blocks_list = raw_text_utils.identify_blocks(azure_response,version)
-        other_fields = raw_text_utils.other_field_values(page_blocks_list)
+        # Line polygons are read once and shared by block detection and the final invoice checks
+        with stage_timer.stage("blocks"):
+            layout = layout_analysis.DocumentLayout(azure_response, version)
+            page_blocks_list = raw_text_utils.identify_blocks(azure_response,version, layout)
+            other_fields = raw_text_utils.other_field_values(page_blocks_list)
         print("Other fields: %s", str(other_fields))
 
         # blocks_text = raw_text_utils.get_blocks_text(page_blocks_list)
-        entities = spacy_inference.predict(raw_text)
+        entities = spacy_inference.predict(raw_text, views)
         logger.debug("Extracted entities: %s", str(entities))
-        entities = validation_util.validate_ner_fields(raw_text, entities, logger)
-        bank_dets_entities, associated_bank_dets = bank_details_util.extract_bank_details(entities, raw_text, other_fields)
+        with stage_timer.stage("validate_ner_fields"):
+            entities = validation_util.validate_ner_fields(raw_text, entities, logger, views, line_index)
+        with stage_timer.stage("bank_details"):
+            bank_dets_entities, associated_bank_dets = bank_details_util.extract_bank_details(entities, raw_text, other_fields, views)
         logger.debug("Entities after validation: %s", str(entities))
         logger.debug("Associated bank entities: %s", str(associated_bank_dets))
-        tapal_entities = spacy_inference.predict_ntn_strn_num(raw_text, tapal_placeholders)
+        tapal_entities = spacy_inference.predict_ntn_strn_num(raw_text, tapal_placeholders, views)
         print(tapal_entities)
         container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
-        detected_currency = currency_extraction.find_currency(azure_response, raw_text, container_key, text_or_content)
+        detected_currency = currency_extraction.find_currency(azure_response, raw_text, container_key, text_or_content, views)
         tapal_entities = validation_util.populate_ntn_strn(raw_text, tapal_entities, version)
         strn_num = tapal_entities["STRN"]
         if not azure_response['analyzeResult'][container_key]:
             azure_response['analyzeResult'][container_key].append({'fields': {}})
+        # The fields are read and written through this model from here on, to_response() hands the response back
+        invoice = invoice_model.Invoice(azure_response, version)
         if strn_num:
-            azure_response['analyzeResult'][container_key][0]['fields']["STRN"] = {
-                "type": "string",
-                "valueString": strn_num,
-                text_or_content: strn_num
-            }
+            invoice.set_text("STRN", strn_num)
         if "adj no" in other_fields:
             adj_no = pdf_utils.extract_adj_no(pdf)
             if adj_no:
                 if adj_no:
-                    azure_response['analyzeResult'][container_key][0]['fields']["InvoiceId"] = {
-                        "type": "string",
-                        "valueString": adj_no,
-                        text_or_content: adj_no
-                    }
-        if "tapal" in raw_text.lower() and final_processing:
+                    invoice.set_text("InvoiceId", adj_no)
+        if views.lower_index.has("tapal") and final_processing:
             employee_ids = pdf_utils.extract_employee_ids(pdf)
             if employee_ids:
-                azure_response = validation_util.populate_employee_id(azure_response, raw_text, version, employee_ids)
+                azure_response = validation_util.populate_employee_id(azure_response, raw_text, version, employee_ids, views)
         iban_num = raw_text_utils.extract_iban_num(raw_text)
         if raw_text_utils.is_australian_address(raw_text):
             if bank_dets_entities["ABN"]:
-                azure_response['analyzeResult'][container_key][0]['fields']["TaxID"] = \
-                 {text_or_content: bank_dets_entities["ABN"], "valueString": bank_dets_entities["ABN"], "type": "ABN"}
+                invoice.set("TaxID",
+                 {text_or_content: bank_dets_entities["ABN"], "valueString": bank_dets_entities["ABN"], "type": "ABN"})
             if bank_dets_entities["AccountNum"]:
                 account_num = bank_dets_entities["AccountNum"][0]
-                azure_response['analyzeResult'][container_key][0]['fields']["AccountDetails"] = \
-                 {text_or_content: account_num, "valueString": account_num, "type": "AccountNum"}
+                invoice.set("AccountDetails",
+                 {text_or_content: account_num, "valueString": account_num, "type": "AccountNum"})
         else:
             if tapal_entities["NTN"]:
-                azure_response['analyzeResult'][container_key][0]['fields']["TaxID"] = \
-                 {text_or_content: tapal_entities["NTN"], "valueString": tapal_entities["NTN"], "type": "NTN"}
+                invoice.set("TaxID",
+                 {text_or_content: tapal_entities["NTN"], "valueString": tapal_entities["NTN"], "type": "NTN"})
             if iban_num:
-                azure_response['analyzeResult'][container_key][0]['fields']["AccountDetails"] = \
+                invoice.set("AccountDetails",
                     {text_or_content: iban_num, "valueString": iban_num,
-                     "type": "IBAN"}
+                     "type": "IBAN"})
             trns = []
-            if "customer_TRN" in azure_response['analyzeResult'][container_key][0]['fields']:
-                trns.append(azure_response['analyzeResult'][container_key][0]['fields']["customer_TRN"]["content"])
-            if "vendor_TRN" in azure_response['analyzeResult'][container_key][0]['fields']:
-                trns.append(azure_response['analyzeResult'][container_key][0]['fields']["vendor_TRN"]["content"])
+            if "customer_TRN" in invoice:
+                trns.append(invoice.fields["customer_TRN"]["content"])
+            if "vendor_TRN" in invoice:
+                trns.append(invoice.fields["vendor_TRN"]["content"])
             if trns:
-                azure_response['analyzeResult'][container_key][0]['fields']["TaxID"] = \
-                    {text_or_content: trns, "valueString": trns, "type": "TRN"}
+                invoice.set("TaxID",
+                    {text_or_content: trns, "valueString": trns, "type": "TRN"})
 
 
-        azure_response['analyzeResult'][container_key][0]['fields']["BankDetails"] = bank_dets_entities
-        azure_response['analyzeResult'][container_key][0]['fields']["AssocBankDetails"] = associated_bank_dets
-        azure_response['analyzeResult'][container_key][0]['fields']["Currency"] = detected_currency
+        invoice.set("BankDetails", bank_dets_entities)
+        invoice.set("AssocBankDetails", associated_bank_dets)
+        invoice.set("Currency", detected_currency)
         azure_response = validation_util.populate_po(azure_response, raw_text, raw_text_without_spaces,
                                                      entities, PO_SYNONYMS, other_fields, missing_fields,
-                                                     FR_FIELD_TO_ENTITIY_MAPPING, version)
+                                                     FR_FIELD_TO_ENTITIY_MAPPING, version, views)
         logger.debug("Entities after adding PO value: %s", str(entities))
 
         lpo_value = raw_text_utils.extract_lpo(raw_text)
         if lpo_value:
-            azure_response['analyzeResult'][container_key][0]['fields']["LPO"] = {
-                "type": "string",
-                "valueString": lpo_value,
-                text_or_content: lpo_value}
+            invoice.set_text("LPO", lpo_value)
 
-        azure_response['isTaxInvoice'] = raw_text_utils.check_is_tax_invoice(raw_text)
+        azure_response['isTaxInvoice'] = raw_text_utils.check_is_tax_invoice(raw_text, views)
         azure_response['isCreditNote'] = raw_text_utils.check_is_credit_note(azure_response, raw_text, version)
 
         if detected_language != "ar":
-            azure_response = validation_util.validate_po(azure_response, raw_text,version)
-        azure_response = validation_util.validate_fr_fields(azure_response, raw_text, page_blocks_list, other_fields,
-                                                            version, detected_language, final_processing)
+            azure_response = validation_util.validate_po(azure_response, raw_text,version, views)
+        with stage_timer.stage("validate_fr_fields"):
+            azure_response = validation_util.validate_fr_fields(azure_response, raw_text, page_blocks_list, other_fields,
+                                                                version, detected_language, final_processing, views,
+                                                                invoice)
         azure_response = validation_util.validate_invoice_from_raw_text(azure_response, raw_text, version)
         #azure_response = validation_util.populate_employee_id(azure_response, raw_text, version)
-        if "PurchaseOrder" not in azure_response['analyzeResult'][container_key][0]['fields'] and "LPO" in azure_response['analyzeResult'][container_key][0]['fields']:
-            azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"] = {
-                "type": "string",
-                "valueString": lpo_value,
-                text_or_content: lpo_value}
+        if "PurchaseOrder" not in invoice and "LPO" in invoice:
+            invoice.set_text("PurchaseOrder", lpo_value)
        # print(page_blocks_list)
 
         logger.debug("Entities: ", entities)
@@ -170,35 +202,48 @@ def process_single_invoice(pdf, logger, log_filename, extension, version, run_cl
         azure_response['analyzeResult'][container_key][0]['overallConfidence'] = overall_conf_score
         azure_response['analyzeResult'][container_key][0]['completenessScore'] = completeness_score
 
-        azure_response['invoiceB64Data'], azure_response['compressedFilePath'] = pdf_utils.base64_encode(pdf, final_processing, file_id, correlation_id)
+        if not split_probe:
+            with stage_timer.stage("encode_document"):
+                # invoiceB64Data, or invoiceDocument (where the uploaded PDF is) in the reference output mode
+                azure_response.update(pdf_utils.encode_document(pdf, final_processing, file_id, correlation_id, document=document))
 
         if version == 'v2.1':
             azure_response = validation_util.extract_total_tax(azure_response,raw_text)
-        azure_response = validation_util.populate_credit_note_num(azure_response, other_fields, raw_text, version)
-        azure_response = validation_util.convert_negative_to_positive(azure_response, "InvoiceTotal",version)
-        azure_response = validation_util.convert_negative_to_positive(azure_response, "TotalTax",version)
-        azure_response = validation_util.convert_negative_to_positive(azure_response, "SubTotal",version)
+        azure_response = validation_util.populate_credit_note_num(azure_response, other_fields, raw_text, version, views)
+        azure_response = validation_util.convert_negative_to_positive(azure_response, "InvoiceTotal",version, invoice)
+        azure_response = validation_util.convert_negative_to_positive(azure_response, "TotalTax",version, invoice)
+        azure_response = validation_util.convert_negative_to_positive(azure_response, "SubTotal",version, invoice)
         azure_response = raw_text_utils.hardcoded_7_eleven_values(azure_response, final_processing, version)
 
-        excluded = raw_text_utils.get_excluded_list(raw_text, page_blocks_list)
-        azure_response["excludedLabels"] = excluded
+        if not split_probe:
+            excluded = raw_text_utils.get_excluded_list(raw_text, page_blocks_list)
+            azure_response["excludedLabels"] = excluded
 
         if completeness_score < 0.3 and detected_language != "ar":
             azure_response['isInvoice'] = False
         else:
             azure_response['isInvoice'] = True
-        if run_classification:
-            template = classification_inference.predict_template(raw_text)
+        if run_classification and not split_probe:
+            with stage_timer.stage("classification"):
+                template = classification_inference.predict_template(raw_text)
             print("Predicted Invoice Template:", template)
             azure_response['invoiceTemplate'] = template
 
-        azure_response['isBill'] = raw_text_utils.is_utility_bill(raw_text)
-        if azure_response['isBill'] is True:
+        azure_response['isBill'] = raw_text_utils.is_utility_bill(raw_text, views)
+        if azure_response['isBill'] is True and not split_probe:
             azure_response['greenhouse_emission'] = raw_text_utils.extract_co2_emission(raw_text)
-        azure_response['isScanned'] = pdf_utils.check_scanned(pdf)
-        azure_response = validation_util.final_invoice_verification(raw_text, azure_response,version, detected_language)
+        if not split_probe:
+            with stage_timer.stage("check_scanned"):
+                azure_response['isScanned'] = pdf_utils.check_scanned(pdf, document)
+        with stage_timer.stage("final_invoice_verification"):
+            azure_response = validation_util.final_invoice_verification(raw_text, azure_response,version, detected_language,
+                                                                        layout, views)
         if upload_log is True:
-            azure_utils.upload_blob(log_filename, logger)
+            with stage_timer.stage("upload_log"):
+                azure_utils.upload_blob(log_filename, logger)
+        azure_response = invoice.to_response()
+        if timings is not None:
+            azure_response['diagnostics'] = stage_timer.diagnostics(timings)
         return azure_response, raw_text
     except Exception:
         print(traceback.format_exc())
@@ -206,40 +251,150 @@ def process_single_invoice(pdf, logger, log_filename, extension, version, run_cl
         if upload_log is True:
             azure_utils.upload_blob(log_filename, logger)
         return None
+    finally:
+        timings_scope.stop()
+        if owns_document:
+            document.close()
+
+
+def analyze_split_page(path, logger, log_filename, extension, version, run_classification, upload_log, file_id,
+                       correlation_id, page_response=None):
+    print("*"*50, path)
+    temp_azure_response, temp_raw_text = process_single_invoice(path, logger, log_filename, extension, version, run_classification, upload_log=upload_log, file_id=file_id, correlation_id=correlation_id, azure_response=page_response, split_probe=SPLIT_PROBE)
+    if page_response is not None:
+        # Sliced from the whole document analysis, only pages with too little usable text are analysed again as images
+        needs_image = temp_azure_response is None or len(temp_raw_text) < 350 or temp_raw_text.count("&") >= 10
+    else:
+        needs_image = temp_azure_response is not None or len(temp_raw_text) < 350 or temp_raw_text.count("&") >= 10
+    if needs_image:
+        updated_path = pdf_utils.convert_pdf_to_image(path)
+        temp_azure_response, temp_raw_text = process_single_invoice(updated_path, logger, log_filename, "jpg", version, run_classification, upload_log=upload_log, file_id=file_id, correlation_id=correlation_id, split_probe=SPLIT_PROBE)
+    return temp_azure_response, temp_raw_text
+
+
+def analyze_pages_concurrently(split_pdf_paths, logger, log_filename, extension, version, run_classification,
+                               upload_log, file_id, correlation_id, page_responses=None):
+    """
+    Sends every page to Form Recognizer at once (at most FR_PAGE_CONCURRENCY in flight) instead of one
+    round trip after another. Results are collected as they complete and returned in page order. The
+    pages share one log file, it is uploaded once after all of them finished instead of by each page.
+    """
+    page_results = [None] * len(split_pdf_paths)
+    if page_responses is None:
+        page_responses = [None] * len(split_pdf_paths)
+    if not split_pdf_paths:
+        return page_results
+    max_workers = max(1, min(FR_PAGE_CONCURRENCY, len(split_pdf_paths)))
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Each page runs in a copy of this context so it shares the request scoped Form Recognizer cache state
+            futures = {executor.submit(contextvars.copy_context().run, analyze_split_page, path, logger, log_filename, extension, version,
+                                       run_classification, False, file_id, correlation_id, page_responses[i]): i
+                       for i, path in enumerate(split_pdf_paths)}
+            for future in as_completed(futures):
+                page_results[futures[future]] = future.result()
+    finally:
+        if upload_log is True:
+            azure_utils.upload_blob(log_filename, logger)
+    return page_results
+
 
+def get_split_page_ranges(split_points):
+    # Same page ranges pdf_utils.split_pdfs produces for split_points, as 1-based page numbers
+    page_ranges = []
+    start = 0
+    for end in split_points:
+        if end > start:
+            page_ranges.append(list(range(start + 1, end + 1)))
+        start = end
+    return page_ranges
 
+
+_processed_invoices = itertools.count(1)
+
+
+def get_pipeline_metrics():
+    """
+    Counters of this process: hits and misses of the Form Recognizer response cache tiers, bytes saved and
+    time per page of the PDF compression, and runs, skips and time of the validate_fr_fields rules.
+    """
+    return {"pid": os.getpid(),
+            "responseCache": response_cache.get_stats(),
+            "pdfCompression": pdf_compression.get_metrics(),
+            "validationRules": validation_util.FR_FIELD_RULES.get_stats()}
+
+
+def log_pipeline_metrics(logger):
+    # Worker processes have their own counters, so each one logs them every PIPELINE_METRICS_LOG_EVERY invoices
+    if PIPELINE_METRICS_LOG_EVERY and next(_processed_invoices) % PIPELINE_METRICS_LOG_EVERY == 0:
+        logger.info("Pipeline metrics: %s", json.dumps(get_pipeline_metrics()))
+
+
+@stage_timer.collected
+@response_cache.request_scoped
 def process_invoice(pdf, pdf_path, logger, log_filename, extension, process_always, version, run_classification,
                         upload_log=True, temp=False, file_id=None, correlation_id=None):
     print("Extension: ", extension)
-    page_count = pdf_utils.get_page_count(pdf)
+    # The PDF stays open for the whole request and is closed whatever happens, worker processes are long-lived
+    with pdf_utils.DocumentContext(pdf) as document:
+        responses = process_invoice_document(document, pdf, pdf_path, logger, log_filename, extension,
+                                             process_always, version, run_classification, upload_log, temp,
+                                             file_id, correlation_id)
+    log_pipeline_metrics(logger)
+    return responses
+
+
+def process_invoice_document(document, pdf, pdf_path, logger, log_filename, extension, process_always, version,
+                             run_classification, upload_log=True, temp=False, file_id=None, correlation_id=None):
+    with stage_timer.stage("page_count"):
+        page_count = pdf_utils.get_page_count(pdf, document)
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
     responses = []
     if page_count <= 1:
-        azure_response, raw_text = process_single_invoice(pdf, logger, log_filename, extension, version, run_classification, upload_log=upload_log, final_processing=True, temp=temp, file_id=file_id, correlation_id=correlation_id)
+        azure_response, raw_text = process_single_invoice(pdf, logger, log_filename, extension, version, run_classification, upload_log=upload_log, final_processing=True, temp=temp, file_id=file_id, correlation_id=correlation_id, document=document)
         if (len(raw_text) < 350 or raw_text.count("&") >= 10 or raw_text.count("!") >= 20 or raw_text.count("%") >= 20) and extension.lower() == "pdf":
-            updated_path = pdf_utils.convert_pdf_to_image(pdf)
+            with stage_timer.stage("convert_pdf_to_image"):
+                updated_path = pdf_utils.convert_pdf_to_image(pdf)
             azure_response, raw_text = process_single_invoice(updated_path, logger, log_filename, "jpg", version, run_classification, upload_log=upload_log, final_processing=True, temp=temp, file_id=file_id, correlation_id=correlation_id)
         responses.append(azure_response)
     elif 1 < page_count < 30 or process_always is True:
         logger.info("PDF contains %s pages. Analysing PDF to identify if it contains multiple invoices" % page_count)
+        full_response = None
+        page_responses = None
         # split_pdf_paths = pdf_utils.split_individual_page_into_multiple_pdfs(pdf, pdf_path)
         try:
-            split_pdf_paths = pdf_utils.split_pdfs(pdf, pdf_path, list(range(1, page_count + 1)))
+            if ANALYZE_ONCE and extension.lower() == "pdf":
+                # Whole document is analysed once and every page/split response is sliced from that result
+                try:
+                    with stage_timer.stage("form_recognizer"):
+                        full_response = forms_recognizer.get_response(pdf, extension, logger, version,
+                                                                      pdf_md5=document.md5)
+                    page_responses = [response_slicer.slice_response(full_response, [page_number], version)
+                                      for page_number in range(1, page_count + 1)]
+                except Exception:
+                    # Pages are then analysed one by one, as without FR_ANALYZE_ONCE
+                    print(traceback.format_exc())
+                    logger.error(traceback.format_exc())
+                    full_response = None
+                    page_responses = None
+            with stage_timer.stage("split_pdfs"):
+                split_pdf_paths = pdf_utils.split_pdfs(pdf, pdf_path, list(range(1, page_count + 1)), document)
             temp_responses = []
             temp_raw_texts = []
-            for path in split_pdf_paths:
-                print("*"*50, path)
-                # temp_azure_response = forms_recognizer.get_response(path, extension)
-                temp_azure_response, temp_raw_text = process_single_invoice(path, logger, log_filename, extension, version, run_classification, upload_log=upload_log, file_id=file_id, correlation_id=correlation_id)
-                if temp_azure_response is not None or len(temp_raw_text) < 350 or temp_raw_text.count("&") >= 10:
-                    updated_path = pdf_utils.convert_pdf_to_image(path)
-                    temp_azure_response, temp_raw_text = process_single_invoice(updated_path, logger, log_filename, "jpg", version, run_classification, upload_log=upload_log, file_id=file_id, correlation_id=correlation_id)
+            if page_responses is not None and len(page_responses) != len(split_pdf_paths):
+                page_responses = None
+            with stage_timer.stage("split_detection_pages"):
+                page_results = analyze_pages_concurrently(split_pdf_paths, logger, log_filename, extension, version,
+                                                          run_classification, upload_log, file_id, correlation_id,
+                                                          page_responses)
+            for temp_azure_response, temp_raw_text in page_results:
                 if temp_azure_response:
                     temp_responses.append(temp_azure_response)
                     temp_raw_texts.append(temp_raw_text)
                 # temp_responses.append(temp_azure_response)
                 # temp_raw_texts.append(temp_raw_text)
-            split_points = split_util.find_splits(temp_responses, temp_raw_texts,version)
+            with stage_timer.stage("find_splits"):
+                split_points = split_util.find_splits(temp_responses, temp_raw_texts,version)
 
             # split_points = pdf_utils.extract_text_and_find_split_points(pdf)
             logger.info("Found %s invoices in the pdf document" % len(split_points))
@@ -247,21 +402,32 @@ def process_invoice(pdf, pdf_path, logger, log_filename, extension, process_alwa
             print("There is an unknown issue with PDF, treating it as a single invoice")
             split_points = []
         if split_points:
-            split_pdfs_paths = pdf_utils.split_pdfs(pdf, pdf_path, split_points)
-            for individual_pdf in split_pdfs_paths:
+            with stage_timer.stage("split_pdfs"):
+                split_pdfs_paths = pdf_utils.split_pdfs(pdf, pdf_path, split_points, document)
+            split_responses = [None] * len(split_pdfs_paths)
+            if full_response is not None:
+                split_page_ranges = get_split_page_ranges(split_points)
+                if len(split_page_ranges) == len(split_pdfs_paths):
+                    for i, page_numbers in enumerate(split_page_ranges):
+                        sliced_response = response_slicer.slice_response(full_response, page_numbers, version)
+                        # Splits whose sliced fields are insufficient are sent to Form Recognizer again
+                        if response_slicer.is_slice_sufficient(sliced_response, version):
+                            split_responses[i] = sliced_response
+            for individual_pdf, split_response in zip(split_pdfs_paths, split_responses):
                 logger.info("Sending %s to Form Recognizer+AI Engine" % individual_pdf.split("/")[-1])
-                azure_response, raw_text = process_single_invoice(individual_pdf, logger, log_filename, extension, version, run_classification, upload_log=upload_log, final_processing=True, file_id=file_id, correlation_id=correlation_id)
+                azure_response, raw_text = process_single_invoice(individual_pdf, logger, log_filename, extension, version, run_classification, upload_log=upload_log, final_processing=True, file_id=file_id, correlation_id=correlation_id, azure_response=split_response)
                 if azure_response and azure_response.get('analyzeResult'):
                     responses.append(azure_response)
                 else:
                     logger.info("Page %s is blank or invalid. Skipping..." % individual_pdf.split("/")[-1])
             if responses:
-                responses = validation_util.validate_responses(responses, version)
+                with stage_timer.stage("validate_responses"):
+                    responses = validation_util.validate_responses(responses, version)
             else:
                 logger.warning("No valid responses to validate.")
         else:
             if page_count > 20 and temp_azure_response['isBill']:
-                split_pdf_paths = pdf_utils.split_pdfs(pdf, pdf_path, list(range(1, min(page_count, 6))))
+                split_pdf_paths = pdf_utils.split_pdfs(pdf, pdf_path, list(range(1, min(page_count, 6))), document)
                 tax_invoice_page = None
                 # Checking for 'Tax Invoice' label in response of first 5 pages
                 for i, path in enumerate(split_pdf_paths):
@@ -276,7 +442,7 @@ def process_invoice(pdf, pdf_path, logger, log_filename, extension, process_alwa
                     # If found, the page with tax invoice with 3 pages is sent in single split
                     start_page = tax_invoice_page
                     end_page = min(page_count, tax_invoice_page + 3)
-                    split_pdf_path = pdf_utils.split_pdfs(pdf, pdf_path, list(range(start_page, end_page + 1)))[0]
+                    split_pdf_path = pdf_utils.split_pdfs(pdf, pdf_path, list(range(start_page, end_page + 1)), document)[0]
                     logger.info("Sending pages %s to %s to Form Recognizer+AI Engine" % (start_page, end_page))
                     azure_response, raw_text = process_single_invoice(split_pdf_path, logger, log_filename, extension,
                                                                       version, run_classification,
@@ -286,7 +452,7 @@ def process_invoice(pdf, pdf_path, logger, log_filename, extension, process_alwa
                 else:
                     # If not found, only first page is sent in response
                     split_points = [1]
-                    split_pdfs_paths = pdf_utils.split_pdfs(pdf, pdf_path, split_points)
+                    split_pdfs_paths = pdf_utils.split_pdfs(pdf, pdf_path, split_points, document)
                     for individual_pdf in split_pdfs_paths:
                         logger.info("Sending %s to Form Recognizer+AI Engine" % individual_pdf.split("/")[-1])
                         azure_response, raw_text = process_single_invoice(individual_pdf, logger, log_filename,
@@ -298,7 +464,9 @@ def process_invoice(pdf, pdf_path, logger, log_filename, extension, process_alwa
                 azure_response, raw_text = process_single_invoice(pdf, logger, log_filename, extension, version,
                                                                   run_classification, upload_log=upload_log,
                                                                   final_processing=True,
-                                                                  file_id=file_id, correlation_id=correlation_id)
+                                                                  file_id=file_id, correlation_id=correlation_id,
+                                                                  azure_response=copy.deepcopy(full_response),
+                                                                  document=document)
                 if azure_response is not None and (len(raw_text) < 350 or raw_text.count("&") >= 14) and \
                         azure_response['analyzeResult'][container_key][0]['completenessScore'] < 0.2:
                     updated_path = pdf_utils.convert_pdf_to_image(pdf)
@@ -313,7 +481,7 @@ def process_invoice(pdf, pdf_path, logger, log_filename, extension, process_alwa
     else:
         print("Too many pages..Processing the first only")
         split_points = [1]
-        split_pdfs_paths = pdf_utils.split_pdfs(pdf, pdf_path, split_points)
+        split_pdfs_paths = pdf_utils.split_pdfs(pdf, pdf_path, split_points, document)
         for individual_pdf in split_pdfs_paths:
             logger.info("Sending %s to Form Recognizer+AI Engine" % individual_pdf.split("/")[-1])
             azure_response, raw_text = process_single_invoice(individual_pdf, logger, log_filename, extension, version, run_classification, upload_log=upload_log, final_processing=True, file_id=file_id, correlation_id=correlation_id)
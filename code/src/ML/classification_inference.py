@@ -1,9 +1,11 @@
 import joblib
 import re
 import os
+import functools
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
 import pandas as pd
+from src import resources
 from src.utils import helper
 
 CLASSIFICATION_MODEL = helper.get_path("models", "classifcation_model_6May_2024")
@@ -23,15 +25,34 @@ category_to_gl_mapping = {
 }
 
 
+# Loaded once per process on the first prediction
+classification_model = resources.register("classifier.model", lambda: joblib.load(model_path))
+count_vectorizer = resources.register("classifier.vectorizer", lambda: joblib.load(vectorizer_path))
+STEM_CACHE_SIZE = 100000
+
+
+@functools.lru_cache(maxsize=None)
+def get_stop_words():
+    return frozenset(stopwords.words('english'))
+
+
+_stemmer = PorterStemmer()
+
+
+@functools.lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word):
+    # Invoice vocabulary repeats a lot between pages, so most words are stemmed once per process
+    return _stemmer.stem(word)
+
+
 def preprocess_text(raw_text):
     text = raw_text.lower()
     text = re.sub(r'[^a-zA-Z\s]', '', text)
 
-    stop_words = set(stopwords.words('english'))
+    stop_words = get_stop_words()
     words = text.split()
     words = [word for word in words if word not in stop_words]
-    ps = PorterStemmer()
-    words = [ps.stem(word) for word in words]
+    words = [stem(word) for word in words]
 
     return ' '.join(words)
 
@@ -39,21 +60,28 @@ def load_dataframe_for_prediction(raw_text):
     data = {'processed_text': [preprocess_text(raw_text)]}
     return pd.DataFrame(data)
 
-def predict_template(raw_text):
+def get_template_result(predicted_category):
+    # Added gl_code mapping to be displayed according to predicted category
+    if predicted_category in category_to_gl_mapping:
+        gl_code = category_to_gl_mapping[predicted_category]
+        return {"predicted_category": predicted_category, "gl_code": gl_code}
+    else:
+        return {"predicted_category": predicted_category, "gl_code": "N/A"}
+
+def predict_templates(raw_texts):
+    """Predicts the template of many texts with one vectorizer and model call, one result dict per text."""
+    raw_texts = list(raw_texts)
+    if not raw_texts:
+        return []
     try:
-        model = joblib.load(model_path)
-        vectorizer = joblib.load(vectorizer_path)
-        df_pred = pd.DataFrame({'processed_text': [preprocess_text(raw_text)]})
-        text_vectorized = vectorizer.transform(df_pred['processed_text'])
+        model = classification_model.get()
+        vectorizer = count_vectorizer.get()
+        text_vectorized = vectorizer.transform([preprocess_text(raw_text) for raw_text in raw_texts])
         print("Processed Text Vectorized Shape:", text_vectorized.shape)
-        template_prediction = model.predict(text_vectorized)
-        predicted_category = template_prediction[0]
-
-        # Added gl_code mapping to be displayed according to predicted category
-        if predicted_category in category_to_gl_mapping:
-            gl_code = category_to_gl_mapping[predicted_category]
-            return {"predicted_category": predicted_category, "gl_code": gl_code}
-        else:
-            return {"predicted_category": predicted_category, "gl_code": "N/A"}
+        template_predictions = model.predict(text_vectorized)
+        return [get_template_result(predicted_category) for predicted_category in template_predictions]
     except Exception as e:
-        return {"error": f"An error occurred: {str(e)}"}
+        return [{"error": f"An error occurred: {str(e)}"} for _ in raw_texts]
+
+def predict_template(raw_text):
+    return predict_templates([raw_text])[0]
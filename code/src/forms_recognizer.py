@@ -1,99 +1,262 @@
 import os
-import json
-import polling2
-import requests
+import time
+import random
+import asyncio
+import threading
 import traceback
+import collections
+import aiohttp
 import backoff
 from azure.core.exceptions import ResourceNotFoundError
 
+from src import response_cache
 from src.utils import helper, azure_utils
 
 
 OCP_APIM_SUBSCRIPTION_KEY = os.getenv("OCP_APIM_SUBSCRIPTION_KEY")
+# Form Recognizer resource analyses are sent to, a local stand-in (benchmarks/form_recognizer_server.py) for load tests
+FR_ENDPOINT = os.getenv("FR_ENDPOINT", "https://invoiceaiformrecogniser.cognitiveservices.azure.com")
+# Documents analysed at the same time by one worker, all of them share one keep-alive connection pool
+FR_MAX_CONCURRENT_ANALYSES = int(os.getenv("FR_MAX_CONCURRENT_ANALYSES", "16"))
+FR_MAX_CONNECTIONS = int(os.getenv("FR_MAX_CONNECTIONS", "32"))
+FR_SUBMIT_RETRIES = int(os.getenv("FR_SUBMIT_RETRIES", "4"))
+FR_POLL_RETRIES = int(os.getenv("FR_POLL_RETRIES", "6"))
+FR_POLL_TIMEOUT = float(os.getenv("FR_POLL_TIMEOUT", "200"))
+FR_MIN_POLL_INTERVAL = float(os.getenv("FR_MIN_POLL_INTERVAL", "0.5"))
+FR_MAX_POLL_INTERVAL = float(os.getenv("FR_MAX_POLL_INTERVAL", "5"))
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
 
-def test(response):
-    response = json.loads(response.content)
-    if 'status' in response:
-        return response['status'] == 'succeeded'
-    return False
 
+class FormRecognizerError(Exception):
+    pass
 
-def build_api_endpoint(version):
+
+def build_api_endpoint(version, base_url=None):
+    base_url = (base_url or FR_ENDPOINT).rstrip("/")
     if version == 'v2.1':
-        return 'https://invoiceaiformrecogniser.cognitiveservices.azure.com/formrecognizer/v2.1/prebuilt/invoice/analyze?includeTextDetails=true'
+        return f'{base_url}/formrecognizer/v2.1/prebuilt/invoice/analyze?includeTextDetails=true'
     elif version == 'v3.1':
-        return 'https://invoiceaiformrecogniser.cognitiveservices.azure.com/formrecognizer/documentModels/prebuilt-invoice:analyze?api-version=2023-07-31'
+        return f'{base_url}/formrecognizer/documentModels/prebuilt-invoice:analyze?api-version=2023-07-31'
     else:
         raise ValueError(f"Unsupported version: {version}")
 
 
-def get_form_recognizer_response(blob_url):
+def get_content_type(type):
+    if type == "pdf":
+        return "application/pdf"
+    elif type in ["png", "jpg", "jpeg"]:
+        return f"image/{type}"
+    elif type == "bmp":
+        return "image/bmp"
+    elif type in ["tiff", "tif"]:
+        return "image/tiff"
+    raise ValueError(f"Unsupported file type: {type}")
+
+
+def get_retry_after(headers, default=None):
+    retry_after = headers.get("Retry-After")
+    if retry_after is None:
+        return default
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        return default
+
+
+class FormRecognizerClient:
+    """
+    asyncio Form Recognizer client sharing one keep-alive session between all documents in flight.
+    Submit and poll are retried separately, so once the POST has succeeded a failing poll is retried
+    against the same operation and the document is never submitted twice.
+    """
+
+    def __init__(self, api_key, max_concurrent_analyses=FR_MAX_CONCURRENT_ANALYSES,
+                 max_connections=FR_MAX_CONNECTIONS):
+        self.api_key = api_key
+        self.max_concurrent_analyses = max_concurrent_analyses
+        self.max_connections = max_connections
+        self._session = None
+        self._semaphore = None
+        # Latest per-call latencies, most recent last
+        self.call_latencies = collections.deque(maxlen=500)
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=120),
+                                                  headers={'Ocp-Apim-Subscription-Key': self.api_key})
+        return self._session
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_analyses)
+        return self._semaphore
+
+    @staticmethod
+    def _backoff_delay(attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+        return min(2 ** attempt, 30) + random.uniform(0, 0.5)
+
+    async def submit(self, data, content_type, version):
+        """
+        POSTs the document and returns the Operation-Location to poll and the suggested first poll delay.
+        Only failures where the service cannot have started an analysis are retried: a connection that could
+        not be opened (nothing was sent) and explicit 429/5xx answers. A timeout or dropped connection after
+        the document was sent is raised, the service may already be analysing (and billing) it.
+        """
+        api_endpoint = build_api_endpoint(version)
+        session = self._get_session()
+        for attempt in range(FR_SUBMIT_RETRIES + 1):
+            retry_after = None
+            try:
+                async with session.post(api_endpoint, data=data, headers={'Content-Type': content_type}) as response:
+                    if response.status == 202:
+                        return response.headers['Operation-Location'], get_retry_after(response.headers)
+                    body = await response.text()
+                    if response.status not in RETRYABLE_STATUS_CODES:
+                        raise FormRecognizerError(f"Analyze request failed with status {response.status}: {body}")
+                    retry_after = get_retry_after(response.headers)
+                    error = FormRecognizerError(f"Analyze request failed with status {response.status}: {body}")
+            except aiohttp.ClientConnectorError as e:
+                error = e
+            if attempt == FR_SUBMIT_RETRIES:
+                raise error
+            await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+
+    async def poll(self, operation_location, first_delay=None):
+        """Polls the analyze operation until it finishes, backing off while it is still running."""
+        session = self._get_session()
+        interval = max(first_delay or 1, FR_MIN_POLL_INTERVAL)
+        deadline = time.monotonic() + FR_POLL_TIMEOUT
+        failures = 0
+        polls = 0
+        while True:
+            await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Analyze operation did not finish within {FR_POLL_TIMEOUT} seconds")
+            retry_after = None
+            try:
+                async with session.get(operation_location) as response:
+                    polls += 1
+                    retry_after = get_retry_after(response.headers)
+                    if response.status == 200:
+                        azure_response = await response.json(content_type=None)
+                        failures = 0
+                        status = azure_response.get('status')
+                        if status == 'succeeded':
+                            return azure_response, polls
+                        if status == 'failed':
+                            raise FormRecognizerError(f"Analyze operation failed: {azure_response.get('error')}")
+                        # Still running, poll less often the longer the document takes
+                        interval = retry_after if retry_after is not None else \
+                            min(interval * 1.5, FR_MAX_POLL_INTERVAL)
+                        continue
+                    body = await response.text()
+                    if response.status not in RETRYABLE_STATUS_CODES:
+                        raise FormRecognizerError(f"Poll request failed with status {response.status}: {body}")
+                    error = FormRecognizerError(f"Poll request failed with status {response.status}: {body}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            failures += 1
+            if failures > FR_POLL_RETRIES:
+                raise error
+            interval = self._backoff_delay(failures, retry_after)
+
+    async def analyze(self, data, content_type, version):
+        async with self._get_semaphore():
+            start = time.monotonic()
+            operation_location, first_delay = await self.submit(data, content_type, version)
+            submitted = time.monotonic()
+            azure_response, polls = await self.poll(operation_location, first_delay)
+            finished = time.monotonic()
+        latency = {"submit_seconds": round(submitted - start, 3), "poll_seconds": round(finished - submitted, 3),
+                   "total_seconds": round(finished - start, 3), "polls": polls, "version": version}
+        self.call_latencies.append(latency)
+        return azure_response, latency
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_client = None
+_client_loop = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Shared client running on a background event loop, so synchronous callers (and the page threads in
+    processor) all reuse the same connection pool.
+    """
+    global _client, _client_loop, _client_pid
+    with _client_lock:
+        # A forked worker process inherits the client but not the thread running its loop
+        if _client is None or _client_pid != os.getpid():
+            _client_pid = os.getpid()
+            _client_loop = asyncio.new_event_loop()
+            threading.Thread(target=_client_loop.run_forever, name="form-recognizer-client", daemon=True).start()
+            _client = FormRecognizerClient(OCP_APIM_SUBSCRIPTION_KEY)
+    return _client, _client_loop
+
+
+@backoff.on_exception(backoff.expo, Exception, max_time=30)
+def get_form_recognizer_response(container_name, pdf_md5):
     try:
-        response_path = azure_utils.download_blob_file(blob_url, "./")
+        content = azure_utils.download_blob_content(container_name, f"{pdf_md5}.json")
         print("File found on azure")
     except ResourceNotFoundError:
         print("File NOT found on azure")
-        response_path = None
-    return response_path
+        content = None
+    return content
 
 
+def get_cached_response(pdf_md5, container_name):
+    return response_cache.get(container_name, pdf_md5,
+                              lambda: get_form_recognizer_response(container_name, pdf_md5))
 
-@backoff.on_exception(backoff.expo, Exception, max_time=30)
-def get_response(pdf, type, logger, version):
-    pdf_md5 = helper.check_md5sum(pdf)
+
+def get_container_name(version):
     if version == "v2.1":
-        container_name = "formrecognizer-responses-v2"
+        return "formrecognizer-responses-v2"
     elif version == "v3.1":
-        container_name = "formrecognizer-responses-v3"
-    blob_url = f"{container_name}//{pdf_md5}.json"
-    response_path = get_form_recognizer_response(blob_url)
-    if response_path is None:
-        if type == "pdf":
-            content_type = "application/pdf"
-        elif type in ["png", "jpg", "jpeg"]:
-            content_type = f"image/{type}"
-        elif type == "bmp":
-            content_type = "image/bmp"
-        elif type in ["tiff", "tif"]:
-            content_type = "image/tiff"
-        else:
-            raise ValueError(f"Unsupported file type: {type}")
+        return "formrecognizer-responses-v3"
+    raise ValueError(f"Unsupported version: {version}")
 
-        api_endpoint = build_api_endpoint(version)
-        print(f"API Endpoint: {api_endpoint}")
-        with open(pdf, "rb") as file:
-            response = requests.post(
-                api_endpoint,
-                headers={'Content-Type': content_type,
-                         'Ocp-Apim-Subscription-Key': OCP_APIM_SUBSCRIPTION_KEY},
-                data=file
-            )
 
-        print(response.headers)
-        get_url = response.headers['Operation-Location']
+def cache_response(azure_response, pdf_md5, container_name, logger):
+    # The analysis already succeeded, a storage error only means the next request analyses the file again
+    try:
+        content = response_cache.put(container_name, pdf_md5, azure_response)
+        azure_utils.upload_blob_content(content, f"{pdf_md5}.json", logger, container_name)
+    except Exception:
+        print(traceback.format_exc())
+        logger.error(traceback.format_exc())
 
+
+def get_response(pdf, type, logger, version, pdf_md5=None):
+    if pdf_md5 is None:
+        pdf_md5 = helper.check_md5sum(pdf)
+    container_name = get_container_name(version)
+    azure_response = get_cached_response(pdf_md5, container_name)
+    if azure_response is None:
+        content_type = get_content_type(type)
+        print(f"API Endpoint: {build_api_endpoint(version)}")
+        with open(pdf, "rb") as file:
+            data = file.read()
+        client, client_loop = get_client()
         try:
-            new_response = polling2.poll(lambda: requests.get(get_url,
-                                                              headers={'Content-Type': content_type,
-                                                                       'Ocp-Apim-Subscription-Key':
-                                                                           OCP_APIM_SUBSCRIPTION_KEY}),
-                                         step=1, timeout=200, check_success=test)
-        except polling2.TimeoutException as e:
+            azure_response, latency = asyncio.run_coroutine_threadsafe(
+                client.analyze(data, content_type, version), client_loop).result()
+        except Exception:
             print(traceback.format_exc())
             logger.error(traceback.format_exc())
-            raise e
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            logger.error(f"An error occurred: {e}")
-
-        azure_response = json.loads(new_response.content)
-        with open(f"{pdf_md5}.json", "w") as f:
-            json.dump(azure_response, f)
-        azure_utils.upload_blob(f"{pdf_md5}.json", logger, container_name)
-        if os.path.isfile(f"{pdf_md5}.json"):
-            os.remove(f"{pdf_md5}.json")
-    else:
-        with open(response_path, "r") as f:
-            azure_response = json.load(f)
-        os.remove(response_path)
+            raise
+        logger.info(f"Form Recognizer analysed {os.path.basename(pdf)} in {latency['total_seconds']}s "
+                    f"(submit {latency['submit_seconds']}s, {latency['polls']} polls)")
+        cache_response(azure_response, pdf_md5, container_name, logger)
     return azure_response
@@ -0,0 +1,130 @@
+import re
+import functools
+import collections
+
+# Identifier patterns (tax numbers, bank accounts, order numbers) looked for in the raw text of a document.
+# Patterns are compiled once, and each is only run when one of its anchors (a literal every match contains)
+# is in the text, a missing "-" for example rules out all NTN and STRN patterns without running them.
+
+IdentifierMatch = collections.namedtuple("IdentifierMatch", ["kind", "pattern_index", "value", "groups", "start",
+                                                             "end"])
+
+
+class IdentifierPattern:
+    def __init__(self, regex, flags=0, anchors=None):
+        self.pattern = re.compile(regex, flags)
+        self.ignore_case = bool(flags & re.IGNORECASE)
+        self.anchors = [anchor.lower() for anchor in anchors] if anchors and self.ignore_case else anchors
+
+    def may_match(self, text, lower_text):
+        if not self.anchors:
+            return True
+        text = lower_text() if self.ignore_case else text
+        return any(anchor in text for anchor in self.anchors)
+
+
+# NTN like 0709631-3, 34-01-0712331-7 or 071-2331-7
+NTN_PATTERNS = [r'\b\d{5,7}-\d{1}\b', r'\b\d{1,3}-\d{4}-\d{0,1}-\d{1}\b', r'\b\d{1,3}-\d{4}-\d{0,1}-\d{1,}\b']
+STRN_PATTERNS = [r'\b\d{2}-\d{2}-\d{4}-\d{3,}-\d{2}\b']
+IBAN_PATTERNS = [r"\bPK\d{2}[A-Z]{4}\d{16}\b"]
+LPO_PATTERNS = [r"LPO\s*\d{4,}", r"LP0\s*\d{4,}"]  # Sometimes OCR reads LPO as LP0
+ABN_PATTERNS = [r'ABN(?:/GST No.)?\s*(\d{7}\s*\d{4})']  # Optionally includes GST No. in the label
+ABN_FALLBACK_PATTERNS = [
+    r'ABN:\s*(\d{2}\s*\d{3}\s*\d{3}\s*\d{3})',  # Pattern for ABN: 12 345 678 910
+    r'ABN(\d{2})\s*(\d{3})\s*(\d{3})\s*(\d{3})',  # Pattern for ABN12 345 678 910
+    r'(A\.B\.N\.|ABN)\s*(\d{2})-(\d{3})-(\d{3})-(\d{3})',  # Pattern for ABN 90-088-123-067 or A.B.N. 30-604-211-225
+    r'ARN\s*(\d{2})\s*(\d{3})\s*(\d{2})\s*:\s*(\d{3})',  # Pattern for ARN 82 268 19: 478
+    r'A\.B\.N\.\s*(\d{11})',
+    r'\b(\d{11})\b',
+    r'(?:A\.B\.N\.:)\s*(\d{2})\s*(\d{3})\s*(\d{3})\s*(\d{3})\b'
+]
+ARN_PATTERNS = [r'ARN\s*(\d{2})\s*(\d{3})\s*(\d{2})\s*[:]\s*(\d{3})']  # ABN with a 1 misread as a colon
+TAFE_PO_PATTERNS = [
+    r'\b700(?:[\s-]?\d{4,7})\b',  # original pattern
+    r'\b700\d{4,7}-\d{3}\b',  # new pattern to match "7000064-353"
+    r'PO700\d{7}',  # new pattern to match PO7000065802
+    r'\b700\d{3}/\d{3}\b',  # pattern to match 700007/631
+    r'\bP/O700\d{7}\b',  # Match "P/O7000078201"
+    r'\b700\d{3}\s?\d{4}\b',  # pattern to match 700008 5519
+    r'\b760\d{4,7}\b',  # New pattern to match 760xxxxxxx
+    r'\b70000\s?\d{5}\b',  # pattern to match 70000 84057 or 70000 85361
+    r'\b70000[\s-]?\d{2}[\s-]?\d{2}[\s-]?\d{1}\b',  # Pattern to match "70000 85 36 1"
+    r'\b700\s?\d{3}\s?\d{4}\b',  # pattern to match "700 008 5528"
+    r'\bBAKERY700\d{7}\b',  # pattern to extract "BAKERY7000085007"
+    r'\bP\.O700\d{7}\b',  # pattern to extract "P.O7000066269"
+    r'\b700\d{7}p/o\b'  # Match "7000085855p/o"
+]
+CO2_EMISSION_PATTERNS = [r"greenhouse gas emissions(?:\W+\w+){0,6}.*?([-+]?\d*\.?\d+)\s*tonnes"]
+CREDIT_MEMO_PATTERNS = [r'SC\d+', r'CFS-CN\d+']
+
+IDENTIFIER_PATTERNS = {
+    "ntn": [IdentifierPattern(regex, anchors=["-"]) for regex in NTN_PATTERNS],
+    "strn": [IdentifierPattern(regex, anchors=["-"]) for regex in STRN_PATTERNS],
+    "iban": [IdentifierPattern(regex, anchors=["PK"]) for regex in IBAN_PATTERNS],
+    "lpo": [IdentifierPattern(regex, re.IGNORECASE, anchors=[regex[:3]]) for regex in LPO_PATTERNS],
+    "abn": [IdentifierPattern(regex, anchors=["ABN"]) for regex in ABN_PATTERNS],
+    "abn_fallback": [IdentifierPattern(regex) for regex in ABN_FALLBACK_PATTERNS],
+    "arn": [IdentifierPattern(regex, anchors=["ARN"]) for regex in ARN_PATTERNS],
+    "tafe_po": [IdentifierPattern(regex, re.IGNORECASE, anchors=["700", "760"]) for regex in TAFE_PO_PATTERNS],
+    "tafe_po_case_sensitive": [IdentifierPattern(regex, anchors=["700", "760"]) for regex in TAFE_PO_PATTERNS],
+    "co2_emission": [IdentifierPattern(regex, re.IGNORECASE, anchors=["greenhouse gas emissions"])
+                     for regex in CO2_EMISSION_PATTERNS],
+    "credit_memo": [IdentifierPattern(regex, anchors=["SC", "CFS-CN"]) for regex in CREDIT_MEMO_PATTERNS],
+}
+
+
+def findall_value(match):
+    """The item re.findall would return for the match."""
+    groups = match.groups()
+    if not groups:
+        return match.group()
+    if len(groups) == 1:
+        return groups[0]
+    return groups
+
+
+class IdentifierTable:
+    """
+    Matches of the identifier patterns in a text, by kind. Each kind is scanned the first time it is asked
+    for, matches are listed pattern by pattern (in the order of IDENTIFIER_PATTERNS) and by position.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._lower_text = None
+        self._matches = {}
+
+    def lower_text(self):
+        if self._lower_text is None:
+            self._lower_text = self.text.lower()
+        return self._lower_text
+
+    def matches(self, kind):
+        if kind not in self._matches:
+            matches = []
+            for pattern_index, identifier_pattern in enumerate(IDENTIFIER_PATTERNS[kind]):
+                if not identifier_pattern.may_match(self.text, self.lower_text):
+                    continue
+                for match in identifier_pattern.pattern.finditer(self.text):
+                    matches.append(IdentifierMatch(kind, pattern_index, findall_value(match), match.groups(),
+                                                   match.start(), match.end()))
+            self._matches[kind] = matches
+        return self._matches[kind]
+
+    def values(self, kind):
+        """Same values as calling re.findall with each pattern of the kind, one after the other."""
+        return [match.value for match in self.matches(kind)]
+
+    def first(self, kind):
+        """Match of the first pattern of the kind found in the text (leftmost match), None otherwise."""
+        matches = self.matches(kind)
+        return matches[0] if matches else None
+
+
+# A document's raw text goes through several of the extraction functions, tables are cached per text
+TABLE_CACHE_SIZE = 32
+
+
+@functools.lru_cache(maxsize=TABLE_CACHE_SIZE)
+def extract(text):
+    return IdentifierTable(text)
@@ -0,0 +1,121 @@
+from src import mapping_utils
+
+# Version agnostic access to the fields of an analysed invoice. process_single_invoice builds one Invoice per
+# invoice once the OCR (and GenAI) response is in, the validators read and write the fields through it and
+# to_response() hands the response back at the end. The model resolves the version specific keys (text/content,
+# valueNumber/valueCurrency) and the fields dict once and wraps the response's dicts instead of copying them,
+# so there is no conversion on the way in or out. Line items stay the response's dicts, wrapping each of
+# them costs more than the lookups it saves.
+
+
+def set_amount(field, value, text, text_key, value_key):
+    """Sets the value the way the version stores amounts (an amount object for currencies) and the text."""
+    if value_key == "valueCurrency":
+        field[value_key] = {"amount": value}
+        field["type"] = "currency"
+    else:
+        field[value_key] = value
+        field["type"] = "number"
+    field[text_key] = text
+
+
+class Field:
+    __slots__ = ("data", "text_key", "value_key")
+
+    def __init__(self, data, text_key, value_key):
+        self.data = data
+        self.text_key = text_key
+        self.value_key = value_key
+
+    @property
+    def text(self):
+        return self.data[self.text_key]
+
+    @text.setter
+    def text(self, text):
+        self.data[self.text_key] = text
+
+    @property
+    def value(self):
+        return self.data.get(self.value_key)
+
+    @value.setter
+    def value(self, value):
+        self.data[self.value_key] = value
+
+    def set_amount(self, value, text):
+        set_amount(self.data, value, text, self.text_key, self.value_key)
+
+
+class Invoice:
+    __slots__ = ("response", "version", "text_key", "value_key", "fields")
+
+    def __init__(self, response, version):
+        container_key, text_key, value_key = mapping_utils.get_version_structure(version)
+        self.response = response
+        self.version = version
+        self.text_key = text_key
+        self.value_key = value_key
+        self.fields = response['analyzeResult'][container_key][0]['fields']
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def get(self, name):
+        if name not in self.fields:
+            return None
+        return Field(self.fields[name], self.text_key, self.value_key)
+
+    def text(self, name, default=None):
+        if name not in self.fields:
+            return default
+        return self.fields[name][self.text_key]
+
+    def set(self, name, data):
+        self.fields[name] = data
+
+    def set_text(self, name, text, field_type="string"):
+        self.fields[name] = {"type": field_type, "valueString": text, self.text_key: text}
+
+    def set_amount(self, name, value, text):
+        """Same as mapping_utils.set_currency, the field is replaced by the amount."""
+        self.fields[name] = {}
+        set_amount(self.fields[name], value, text, self.text_key, self.value_key)
+
+    def remove(self, name):
+        self.fields.pop(name, None)
+
+    @property
+    def items(self):
+        """Line item dicts (valueArray of Items), empty when there are none."""
+        if "Items" not in self.fields:
+            return []
+        return self.fields["Items"]["valueArray"]
+
+    def delete_items(self, indexes):
+        value_array = self.fields["Items"]["valueArray"]
+        for index in sorted(set(indexes), reverse=True):  # Delete in reverse order so the other indexes stay valid
+            del value_array[index]
+
+    def set_item_text(self, item, name, text):
+        """Sets the text of a line item field (created when missing) and its valueNumber, None for non numbers."""
+        field = item.setdefault("valueObject", {}).setdefault(name, {})
+        field[self.text_key] = text
+        try:
+            field["valueNumber"] = float(str(text).replace(',', ''))
+        except ValueError:
+            field["valueNumber"] = None
+
+    def set_item_amount(self, item, name, value, text):
+        field = item.setdefault("valueObject", {})[name] = {}
+        set_amount(field, value, text, self.text_key, self.value_key)
+
+    def to_response(self):
+        return self.response
+
+
+def of(azure_response, version, invoice=None):
+    """The given invoice model when it wraps azure_response, otherwise a new one over azure_response."""
+    if invoice is not None and invoice.response is azure_response:
+        return invoice
+    return Invoice(azure_response, version)
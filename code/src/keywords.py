@@ -0,0 +1,99 @@
+# Keyword lists checked against the raw text of a document, through the KeywordIndex of its text views (see
+# text_views.TextViews) so each keyword is looked up once per document instead of once per call site
+
+TAX_INVOICE_KEYWORDS = ["tax invoice", "taxinvoice", "tax credit note", "tax credit", "tax receipt"]
+
+CREDIT_NOTE_LABELS = ["credit/adjustment note", "credit adjustment note", "credit memo", "tax adjustment note",
+                      "adjustment note", "credit adjustment", "tax invoice adjustment", "adjustment credit",
+                      "adjustment", "tax credit", "credit to", "credit adj note", "credit note number",
+                      "credit note date", "credit note"]
+
+UTILITY_VENDORS = ["agl south australia", "originenergy", "telstra", "energy intelligence", "energy australia"]
+UTILITY_KEYWORDS = ["water usage", "water notice", "water usage account", "water/sewer charges",
+                    "water account", "overdue water", "wastewater", "overdue water charges", "water supply",
+                    "electricity bill", "instalment notice", "water charges"]
+ACCOUNT_NUMBER_VENDORS = ["agl", "origin", "telstra", "energy intelligence", "energy australia"]
+
+TAFE_KEYWORDS = ["tafe", "t.a.f.e", "ryde", "hunter institute of technology", "hunter inst of technology",
+                 "hunter tafe - kumi kumi", "kurri kurri campus", "technical & further education commission",
+                 "northern sydney institute", "technical and further education", "coffs harbour education campus",
+                 "campbelltown college of t", "sydney institute of technology", "89755348137"]
+
+ADCB_KEYWORDS = ["adcb", "al hilal bank", "abu dhabi commercial bank"]
+
+EMAIL_KEYWORDS = ["from", "to", "subject", "cc", "attachments"]
+GREETING_KEYWORDS = ["dear", "hi", "hello"]
+REGARDS_KEYWORDS = ["regards", "best regards", "sincerely", "thanks", "thank you"]
+
+NOT_AN_INVOICE_LABELS = [["gb electrical contractors pty ltd", "gas maintenance sheet", "equipment details",
+                          "inspection details"],
+                         ["timesheet", "week ending sunday", "minutes", "monday", "tuesday", "wednesday", "thursday",
+                          "friday","consultant"],
+                         ["order form – support services"],
+                         ["statement of certification", "certification"], ["safe handl", "this product was prepar"],
+                         ['copy of legal services order'],
+                         ['company statement'], ['delivery docket','job','order'], ['financial terms'],
+                         ['delivery docket','material'],
+                         ['timesheet','day','night','time on', 'time off'],
+                         ['timesheet','start work','finish work'],
+                         ['timesheet','actual hours','start','finish','day worked'],
+                         ['rental agreement','rental','return address','return hours'],
+                         ['statement of hazardous nature','emergency overview'],
+                         ['timesheet','start', 'finish','total hrs'],
+                         ['delivery challan'],
+                         ['timesheet','dayshift','nightshift'],
+                         ['transmission certificate'],
+                         ['service report', 'work order number', 'job complete'],
+                         ['guest folio','name','room'],
+                         ['terms and conditions for purchase orders'],
+                         ['debit note'],
+                         ['quotation', 'repair advice form', 'description of components to be repaired'],
+                         ['email cover sheet', 'email address'],
+                         ['statement of account','std terms', 'dsb terms'],
+                         ['agency agreement', "between", "pact"],
+                         ['order confirmation', 'order no', 'order date', 'order line']]
+
+# Suppliers whose documents over 50 pages are still processed, with the number of pages kept (0 keeps all)
+WHITELISTED_SUPPLIERS = {
+    "telstra": 5,
+    "komatsu": 0,
+    "hertz": 0,
+    "agl south australia": 5,
+    "team global express": 5,
+    "carey mining": 5,
+    "coates hire": 5,
+    "sg fleet australia": 5,
+    "australia post": 5,
+    "messagemedia": 5,
+    "shell energy": 5,
+    "quarrico": 0,
+    "ara fire": 5
+}
+
+
+class KeywordIndex:
+    """
+    Keywords looked up in a text, each one searched for (as a substring, like `keyword in text`) the first
+    time it is asked about and remembered. Safe to share between threads, a keyword checked by two threads
+    at once is only searched for twice.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._results = {}
+
+    def has(self, keyword):
+        result = self._results.get(keyword)
+        if result is None:
+            result = self._results[keyword] = keyword in self.text
+        return result
+
+    def has_any(self, keywords):
+        return any(self.has(keyword) for keyword in keywords)
+
+    def has_all(self, keywords):
+        return all(self.has(keyword) for keyword in keywords)
+
+    def first(self, keywords):
+        """First of the keywords, in the given order, found in the text, None otherwise."""
+        return next((keyword for keyword in keywords if self.has(keyword)), None)
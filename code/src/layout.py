@@ -0,0 +1,120 @@
+import re
+import numpy as np
+from src import mapping_utils
+
+HEADER_MAX_LINES = 15
+HEADER_KEYWORDS = ["tax invoice", "invoice", "manual payment requisition form", "cheque requisition",
+                   "payment request form"]
+HEADER_PATTERN = re.compile(r"\b(?:{})\b".format("|".join(re.escape(kw) for kw in HEADER_KEYWORDS)), re.IGNORECASE)
+FONT_SIZE_KEYWORDS = ["tax invoice", "invoice"]
+BLOCK_Y_THRESHOLD = 0.5
+BLOCK_X_THRESHOLD_RATIO = 0.3
+
+
+class PageLayout:
+    """Line texts and polygons of one page as arrays, built once and shared by the layout based checks."""
+
+    def __init__(self, page, version):
+        page_key, text_or_content, block_type = mapping_utils.get_response_structure(version)
+        lines = page.get("lines", [])
+        self.width = page.get("width")
+        self.texts = [line[text_or_content] for line in lines]
+        polygons = np.full((len(lines), 8), np.nan)
+        for i, line in enumerate(lines):
+            polygon = line[block_type][:8]
+            polygons[i, :len(polygon)] = polygon
+        self.polygons = polygons
+        # Python's round, identify_blocks compares these with the thresholds exactly as before
+        self.min_x = np.array([round(line[block_type][0], 1) for line in lines], dtype=float)
+        self.min_y = np.array([round(line[block_type][1], 1) for line in lines], dtype=float)
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def heights(self):
+        return self.polygons[:, 5] - self.polygons[:, 1]
+
+    @property
+    def widths(self):
+        return self.polygons[:, 2] - self.polygons[:, 0]
+
+
+class DocumentLayout:
+    def __init__(self, azure_response, version):
+        page_key, _, _ = mapping_utils.get_response_structure(version)
+        self.pages = [PageLayout(page, version) for page in azure_response["analyzeResult"][page_key]]
+
+    def first_lines(self, max_lines):
+        """Texts and polygons of the first max_lines lines of the document, across pages."""
+        texts = []
+        polygons = []
+        for page in self.pages:
+            remaining = max_lines - len(texts)
+            if remaining <= 0:
+                break
+            texts.extend(page.texts[:remaining])
+            polygons.append(page.polygons[:remaining])
+        if not polygons:
+            return texts, np.empty((0, 8))
+        return texts, np.concatenate(polygons)
+
+    def identify_blocks(self):
+        """
+        Groups the lines of every page into blocks, the first block (in creation order) starting within
+        the x threshold and whose last line is within the y threshold takes the line. Same blocks as the
+        line by line comparison in raw_text_utils, with each line compared to all blocks at once.
+        """
+        page_blocks_list = []
+        if not self.pages:
+            return page_blocks_list
+        x_threshold = self.pages[0].width * BLOCK_X_THRESHOLD_RATIO
+        for page in self.pages:
+            blocks = []
+            block_x = np.empty(len(page))
+            block_y = np.empty(len(page))
+            for i, text in enumerate(page.texts):
+                min_x = page.min_x[i]
+                min_y = page.min_y[i]
+                count = len(blocks)
+                matches = np.flatnonzero((np.abs(min_x - block_x[:count]) < x_threshold) &
+                                         (np.abs(min_y - block_y[:count]) < BLOCK_Y_THRESHOLD))
+                if matches.size:
+                    blk = blocks[matches[0]]
+                    blk['lines'].append(text)
+                    blk['min_y'] = float(min_y)
+                    block_y[matches[0]] = min_y
+                else:
+                    blocks.append({'min_x': float(min_x), 'min_y': float(min_y), 'lines': [text]})
+                    block_x[count] = min_x
+                    block_y[count] = min_y
+            page_blocks_list.append(blocks)
+        return page_blocks_list
+
+    def has_header(self, max_lines=HEADER_MAX_LINES):
+        texts, _ = self.first_lines(max_lines)
+        for line_counter, text in enumerate(texts, 1):
+            match = HEADER_PATTERN.search(text.lower())
+            if match:
+                print(f"Found '{match.group(0)}' in line {line_counter}")
+                return True
+        return False
+
+    def header_font_size(self, max_lines=HEADER_MAX_LINES):
+        """
+        Estimated font size and average word width of the first of the first max_lines lines mentioning
+        an invoice, None when there is none. Small (inch based) polygons are scaled by 1000 first.
+        """
+        texts, polygons = self.first_lines(max_lines)
+        candidates = [i for i, text in enumerate(texts) if any(key in text.lower() for key in FONT_SIZE_KEYWORDS)]
+        if not candidates:
+            return None
+        heights = polygons[:, 5] - polygons[:, 1]
+        widths = polygons[:, 2] - polygons[:, 0]
+        scale = np.where((np.abs(widths) < 10) & (np.abs(heights) < 10), 1000, 1)
+        scaled = polygons * scale[:, None]
+        i = candidates[0]
+        font_size = scaled[i, 5] - scaled[i, 1]
+        avg_char_width = (scaled[i, 2] - scaled[i, 0]) / len(texts[i].split())
+        print(f"Estimated font size: {(font_size, avg_char_width)}")
+        return float(font_size), float(avg_char_width)
@@ -0,0 +1,71 @@
+import bisect
+from src import mapping_utils
+
+
+class LineIndex:
+    """
+    Where each line of the raw text starts, with the page and polygon of the line, so a character offset
+    in the raw text (an NER span for example) maps back to its line with a binary search.
+    """
+
+    def __init__(self, starts, texts, pages, polygons):
+        self.starts = starts
+        self.texts = texts
+        self.pages = pages
+        self.polygons = polygons
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line_at(self, offset):
+        """Number (0 based) of the line the character at offset is in, the line break counting as part of it."""
+        if not self.starts or offset < 0:
+            return None
+        line = bisect.bisect_right(self.starts, offset) - 1
+        if offset > self.starts[line] + len(self.texts[line]):
+            return None
+        return line
+
+    def line_span(self, line):
+        start = self.starts[line]
+        return start, start + len(self.texts[line])
+
+    def locate(self, start, end=None):
+        """
+        Bounding regions ({"pageNumber", "polygon"}) of the lines the characters from start to end
+        cover, as Form Recognizer v3.1 reports them for fields. Empty when start is outside the text.
+        """
+        first_line = self.line_at(start)
+        if first_line is None:
+            return []
+        last_line = self.line_at(max(start, end - 1)) if end is not None else first_line
+        if last_line is None:
+            last_line = len(self.starts) - 1
+        return [{"pageNumber": self.pages[line], "polygon": self.polygons[line]}
+                for line in range(first_line, last_line + 1)]
+
+
+def build(json_data, version):
+    """
+    Raw text of the response (all the lines of all the pages, each followed by a line break), the same
+    text without spaces and the LineIndex of the raw text, in one pass over the lines.
+    """
+    page_key, text_or_content, polygon_key = mapping_utils.get_response_structure(version)
+    starts = []
+    texts = []
+    pages = []
+    polygons = []
+    offset = 0
+    for page_index, page in enumerate(json_data["analyzeResult"][page_key]):
+        page_number = page.get("pageNumber", page.get("page", page_index + 1))
+        for line in page["lines"]:
+            text = line[text_or_content]
+            starts.append(offset)
+            texts.append(text)
+            pages.append(page_number)
+            polygons.append(line.get(polygon_key))
+            offset += len(text) + 1
+    lines = "".join([text + "\n" for text in texts])
+    # Removing spaces never touches the line breaks, so this is the same as removing them line by line
+    lines_without_spaces = lines.replace(" ", "")
+    return lines, lines_without_spaces, LineIndex(starts, texts, pages, polygons)
@@ -1,7 +1,6 @@
 import os
-import string
-import spacy
 
+from src import resources, text_views, stage_timer
 from src.utils import helper
 
 def list_files(startpath):
@@ -17,13 +16,8 @@ def list_files(startpath):
 
 
 MODEL_PATH = helper.get_path("models", "ner_model_Nov15")
-print ("****Before****")
-list_files(MODEL_PATH)
 if not os.path.isfile(os.path.join(MODEL_PATH, "meta.json")):
     MODEL_PATH = os.path.join(MODEL_PATH, "ner_model_Nov15")
-    print ("Moment of truth: " ,os.path.isfile(os.path.join(MODEL_PATH, "meta.json")))
-    print("****After****")
-    list_files(MODEL_PATH)
 # BANK_DETS_MODEL_PATH = "bank_dets_model/ner_model"
 BANK_DETS_MODEL_PATH = helper.get_path("models", "bank_dets_model_v3")
 CREDIT_MEMO_MODEL_PATH = helper.get_path("models", "ner_model_credit_note_12_Mar_25")
@@ -38,52 +32,59 @@ if not os.path.isfile(os.path.join(CONTRACT_NUM_MODEL_PATH, "meta.json")):
     CONTRACT_NUM_MODEL_PATH = os.path.join(CONTRACT_NUM_MODEL_PATH, "ner_model_contract_num_11_Mar_25")
 if not os.path.isfile(os.path.join(ACCOUNT_NUM_MODEL_PATH, "meta.json")):
     ACCOUNT_NUM_MODEL_PATH = os.path.join(ACCOUNT_NUM_MODEL_PATH, "ner_model_account_num_19Sept")
-nlp = spacy.load(MODEL_PATH)#+"/ner_model")
-nlp_bd = spacy.load(BANK_DETS_MODEL_PATH+"/ner_model")
-nlp_cm = spacy.load(CREDIT_MEMO_MODEL_PATH)
-nlp_tapal = spacy.load(TAPAL_NER_MODEL_PATH)
-nlp_cn = spacy.load(CONTRACT_NUM_MODEL_PATH)
-nlp_acn = spacy.load(ACCOUNT_NUM_MODEL_PATH)
+
+
+def load_model(model_path):
+    # spaCy itself is only imported once the first model is needed
+    import spacy
+    print("Loading spaCy model from", model_path)
+    return spacy.load(model_path)
+
+
+# Models are loaded on first use, resources.warmup(["spacy.*"]) loads them up front
+nlp = resources.register("spacy.ner", lambda: load_model(MODEL_PATH))#+"/ner_model")
+nlp_bd = resources.register("spacy.bank_details", lambda: load_model(BANK_DETS_MODEL_PATH+"/ner_model"))
+nlp_cm = resources.register("spacy.credit_memo", lambda: load_model(CREDIT_MEMO_MODEL_PATH))
+nlp_tapal = resources.register("spacy.tapal", lambda: load_model(TAPAL_NER_MODEL_PATH))
+nlp_cn = resources.register("spacy.contract_num", lambda: load_model(CONTRACT_NUM_MODEL_PATH))
+nlp_acn = resources.register("spacy.account_num", lambda: load_model(ACCOUNT_NUM_MODEL_PATH))
 
 
 # nlp = spacy.load(m_dir)
 
+# Batch inference settings, n_process > 1 forks spaCy workers so keep it at 1 inside the worker pool processes
+PIPE_BATCH_SIZE = int(os.getenv("SPACY_PIPE_BATCH_SIZE", "16"))
+PIPE_N_PROCESS = int(os.getenv("SPACY_PIPE_N_PROCESS", "1"))
+# Only the components entity recognition depends on run during batch inference
+NER_COMPONENTS = ("tok2vec", "transformer", "ner", "entity_ruler")
+
+PUNCTUATION_TRANSLATOR = text_views.PUNCTUATION_TRANSLATOR
+
 
-def predict(text):
+def strip_punctuation(text):
+    return text.translate(PUNCTUATION_TRANSLATOR)
+
+
+def join_lines(text):
+    return text.replace("\r\n", " ").replace("\n", " ")
+
+
+def get_entities(doc):
     entities = {}
-    translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
-    text = text.translate(translator)
-    doc = nlp(text)
-    # print(
-    #     "SPACY"
-    # )
-    # print(doc)
     for ent in doc.ents:
         entities[ent.label_] = {'text': ent.text, 'start': ent.start_char}
     return entities
 
 
-def predict_bank_details(text, entities_placeholder):
-    # entities = {}
-    translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
-    text = text.translate(translator)
-    doc = nlp_bd(text)
-    # print(
-    #     "SPACY"
-    # )
-    # print(doc)
-    print(doc.ents)
+def get_bank_details(doc, entities_placeholder):
     for ent in doc.ents:
         if ent.label_ in entities_placeholder:
             entities_placeholder[ent.label_].append(ent.text)
     return entities_placeholder
 
 
-def predict_credit_memo_num(text):
-    text = text.replace("\r\n", " ").replace("\n", " ")
-    doc = nlp_cm(text)
+def get_credit_memo_num(doc):
     if doc.ents:
-        print("Predicted credit memo number: ", doc.ents)
         credit_memo_num = doc.ents[0].text
         if credit_memo_num[0] == "-":
             credit_memo_num = credit_memo_num[1:]
@@ -91,11 +92,7 @@ def predict_credit_memo_num(text):
     return None
 
 
-def predict_ntn_strn_num(text, tapal_placeholders):
-    translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
-    text = text.translate(translator)
-    doc = nlp_tapal(text)
-
+def get_ntn_strn_num(doc, tapal_placeholders):
     ntn_entities = []
     strn_entities = []
 
@@ -113,18 +110,92 @@ def predict_ntn_strn_num(text, tapal_placeholders):
 
     return tapal_placeholders
 
-def predict_contract_num(text):
-    text = text.replace("\r\n", " ").replace("\n", " ")
-    doc = nlp_cn(text)
+
+def get_first_entity(doc):
     if doc.ents:
-        print("Predicted contract number: ", doc.ents)
         return doc.ents[0].text
     return None
 
-def predict_account_num(text):
-    text = text.replace("\r\n", " ").replace("\n", " ")
-    doc = nlp_acn(text)
+
+@stage_timer.timed("ner.entities")
+def predict(text, views=None):
+    doc = nlp.get()(text_views.of(text, views).punctuation_stripped)
+    # print(
+    #     "SPACY"
+    # )
+    # print(doc)
+    return get_entities(doc)
+
+
+@stage_timer.timed("ner.bank_details")
+def predict_bank_details(text, entities_placeholder, views=None):
+    doc = nlp_bd.get()(text_views.of(text, views).punctuation_stripped)
+    print(doc.ents)
+    return get_bank_details(doc, entities_placeholder)
+
+
+@stage_timer.timed("ner.credit_memo_num")
+def predict_credit_memo_num(text, views=None):
+    doc = nlp_cm.get()(text_views.of(text, views).joined_lines)
     if doc.ents:
-        return doc.ents[0].text
-    return None
+        print("Predicted credit memo number: ", doc.ents)
+    return get_credit_memo_num(doc)
+
+
+@stage_timer.timed("ner.ntn_strn")
+def predict_ntn_strn_num(text, tapal_placeholders, views=None):
+    doc = nlp_tapal.get()(text_views.of(text, views).punctuation_stripped)
+    return get_ntn_strn_num(doc, tapal_placeholders)
+
+@stage_timer.timed("ner.contract_num")
+def predict_contract_num(text, views=None):
+    doc = nlp_cn.get()(text_views.of(text, views).joined_lines)
+    if doc.ents:
+        print("Predicted contract number: ", doc.ents)
+    return get_first_entity(doc)
+
+@stage_timer.timed("ner.account_num")
+def predict_account_num(text, views=None):
+    return get_first_entity(nlp_acn.get()(text_views.of(text, views).joined_lines))
+
+
+def get_batch_models():
+    """Model, text preprocessing and result builder for every entity set predict_batch returns."""
+    return {
+        "entities": (nlp, strip_punctuation, get_entities),
+        "bank_details": (nlp_bd, strip_punctuation,
+                         lambda doc: get_bank_details(doc, {"ABN": [], "AccountNum": [], "AccountName": [], "BSB": [],
+                                                            "SwiftCode": [], "BankName": []})),
+        "ntn_strn": (nlp_tapal, strip_punctuation, lambda doc: get_ntn_strn_num(doc, {"NTN": [], "STRN": []})),
+        "credit_memo_num": (nlp_cm, join_lines, get_credit_memo_num),
+        "contract_num": (nlp_cn, join_lines, get_first_entity),
+        "account_num": (nlp_acn, join_lines, get_first_entity),
+    }
+
+
+def predict_batch(texts, entity_sets=None, batch_size=None, n_process=None):
+    """
+    Runs the NER models over many page texts at once with nlp.pipe. Every text is preprocessed once per
+    preprocessing kind instead of once per model, and components the entities do not depend on are disabled.
+    Returns one dict per text keyed by entity set, with the same values as the single text predict_* functions.
+    """
+    batch_size = batch_size or PIPE_BATCH_SIZE
+    n_process = n_process or PIPE_N_PROCESS
+    batch_models = get_batch_models()
+    if entity_sets is None:
+        entity_sets = list(batch_models)
+    texts = list(texts)
+    results = [{} for _ in texts]
+    preprocessed = {}
+    for entity_set in entity_sets:
+        model, preprocess, build_result = batch_models[entity_set]
+        model = model.get()
+        if preprocess not in preprocessed:
+            preprocessed[preprocess] = [preprocess(text) for text in texts]
+        disabled = [name for name in model.pipe_names if name not in NER_COMPONENTS]
+        docs = model.pipe(preprocessed[preprocess], batch_size=batch_size, n_process=n_process, disable=disabled)
+        for i, doc in enumerate(docs):
+            results[i][entity_set] = build_result(doc)
+    return results
+
 # data_dir = "../../model/ner_model"
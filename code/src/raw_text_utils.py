@@ -1,6 +1,7 @@
 import re
-import string
-from src import mapping_utils
+from src import mapping_utils, keywords, identifiers, text_views
+from src import layout as layout_analysis
+from src import line_index
 from collections import defaultdict
 
 FIELD_NAMES = ["po/claim no", "reference", "ref", "tax invoice number", "tax invoice no", "tax credit",
@@ -16,6 +17,15 @@ FIELD_NAMES = ["po/claim no", "reference", "ref", "tax invoice number", "tax inv
                "dn number Date", "d c", "shipment",
                "contract number", "contract no", "order number"]
 
+PUNCTUATION_TRANSLATOR = text_views.PUNCTUATION_TRANSLATOR
+# One lookahead per position, each alternative is a FIELD_NAMES entry as a whole word. At every position the
+# alternation reports the earliest entry of the list found there, so the lowest group over the line is the
+# entry the old one regex per field name loop matched first.
+FIELD_NAMES_PATTERN = re.compile("(?=%s)" % "|".join(r"\b(%s)\b" % fn for fn in FIELD_NAMES), re.I)
+FIELD_NAME_PATTERNS = [re.compile(r"\b%s\b" % fn, re.I) for fn in FIELD_NAMES]
+PO_BOX_PATTERN = re.compile(r'\b%s\b' % "po box", re.I)
+P_O_BOX_PATTERN = re.compile(r'\b%s\b' % "p o box", re.I)
+
 
 def get_raw_text(json_data, version):
     """
@@ -25,42 +35,21 @@ def get_raw_text(json_data, version):
     lines_without_spaces: we also remove all spaces from the lines because handwritten PO sometimes
     has spaces and it doesn't get matched otherwise
     """
-    container_key, text_or_content, block_type = mapping_utils.get_response_structure(version)
-    lines = ""
-    lines_without_spaces = ""
-    for page in json_data["analyzeResult"][container_key]:
-        for line in page["lines"]:
-            lines = lines + line[text_or_content]
-            lines = lines + "\n"
-            lines_without_spaces = lines_without_spaces + line[text_or_content].replace(" ", "")
-            lines_without_spaces = lines_without_spaces + "\n"
+    lines, lines_without_spaces, _ = line_index.build(json_data, version)
     return lines, lines_without_spaces
 
 
-def identify_blocks(data, version):
-    container_key, text_or_content, block_type = mapping_utils.get_response_structure(version)
-    page_blocks_list = []
+def build_raw_text(json_data, version):
+    """get_raw_text plus the line_index.LineIndex mapping raw text offsets to lines, pages and polygons"""
+    return line_index.build(json_data, version)
+
+
+def identify_blocks(data, version, layout=None):
     # x_threshold = data["analyzeResult"]["readResults"][0]["width"]*0.18
-    x_threshold = data["analyzeResult"][container_key][0]["width"] * 0.3
-    y_threshold = 0.5
-    for page in data["analyzeResult"][container_key]:
-        blocks = []
-        for line in page["lines"]:
-            min_x = round(line[block_type][0], 1)
-            min_y = round(line[block_type][1], 1)
-            closest_found = False
-            for blk in blocks:
-                if abs(min_x - blk['min_x']) < x_threshold:
-                    if abs(min_y - blk['min_y']) < y_threshold:
-                        closest_found = True
-                        blk['lines'].append(line[text_or_content])
-                        blk['min_y'] = min_y
-                        break
-            if closest_found is False:
-                new_blk = {'min_x': min_x, 'min_y': min_y, 'lines': [line[text_or_content]]}
-                blocks.append(new_blk)
-        page_blocks_list.append(blocks)
-    return page_blocks_list
+    # Lines within 30% of the first page width horizontally and 0.5 vertically of a block's last line join it
+    if layout is None:
+        layout = layout_analysis.DocumentLayout(data, version)
+    return layout.identify_blocks()
 
 
 def get_blocks_text(blocks_list):
@@ -71,8 +60,7 @@ def get_blocks_text(blocks_list):
                 text += line
                 text += "\n"
 
-    translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
-    text = text.translate(translator)
+    text = text.translate(PUNCTUATION_TRANSLATOR)
 
     return text
 
@@ -116,6 +104,26 @@ def insert_key_value(first_word, second_word, fields_dict):
     return fields_dict
 
 
+def find_field_name(line, start=0):
+    """
+    Index of the first entry of FIELD_NAMES (in list order, from start) found as a whole word in the line,
+    None if there is none.
+    """
+    if start > 0:
+        for index in range(start, len(FIELD_NAMES)):
+            if FIELD_NAME_PATTERNS[index].search(line):
+                return index
+        return None
+    best_index = None
+    for match in FIELD_NAMES_PATTERN.finditer(line):
+        index = match.lastindex - 1
+        if best_index is None or index < best_index:
+            best_index = index
+            if best_index == 0:
+                break
+    return best_index
+
+
 def other_field_values(blocks_list):
     field_values = defaultdict(lambda: [])
     previous_word = ""
@@ -151,54 +159,43 @@ def other_field_values(blocks_list):
 
                 if break_point is True:
                     continue
-                translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
-                line = line.translate(translator).lower()
+                line = line.translate(PUNCTUATION_TRANSLATOR).lower()
                 # print("Crossed continue...")
                 # print("Line now: ", line)
 
-                for fn in FIELD_NAMES:
-                    # print("Trying to match: ", fn)
-                    field_search = re.compile(r"\b%s\b" % fn, re.I)
-                    field_match = field_search.search(line)
-                    if field_match:
-                        # print("Matched ", fn)
-                        if not fn == "po":
+                field_index = find_field_name(line)
+                while field_index is not None:
+                    fn = FIELD_NAMES[field_index]
+                    # print("Matched ", fn)
+                    if not fn == "po":
+                        words = line.lower().split(fn)
+                        # print(words)
+                        if len(words) > 1 and len(words[1]) > 3:
+                            if len(line.replace(fn, "").split(" ")) <= 6:
+                                # print("Inserting: ", fn, " ", words[1])
+                                fields_values = insert_key_value(fn, words[1], field_values)
+                        else:
+                            # print("Added as prev word")
+                            previous_word = fn
+                        break
+                    else:
+                        if not PO_BOX_PATTERN.search(line) or P_O_BOX_PATTERN.search(line):
                             words = line.lower().split(fn)
-                            # print(words)
                             if len(words) > 1 and len(words[1]) > 3:
-                                if len(line.replace(fn, "").split(" ")) <= 6:
-                                    # print("Inserting: ", fn, " ", words[1])
+                                if len(line.split(" ")) < 5:
                                     fields_values = insert_key_value(fn, words[1], field_values)
                             else:
-                                # print("Added as prev word")
                                 previous_word = fn
                             break
-                        else:
-                            if not re.compile(r'\b%s\b' % "po box", re.I).search(line) or re.compile(
-                                    r'\b%s\b' % "p o box", re.I).search(line):
-                                words = line.lower().split(fn)
-                                if len(words) > 1 and len(words[1]) > 3:
-                                    if len(line.split(" ")) < 5:
-                                        fields_values = insert_key_value(fn, words[1], field_values)
-                                else:
-                                    previous_word = fn
-                                break
+                    # "po" in a PO box address, carry on with the field names after it
+                    field_index = find_field_name(line, field_index + 1)
 
     return field_values
 
 
-def check_is_tax_invoice(raw_text):
-    updated_raw_text = raw_text.replace("\n", " ").lower()
+def check_is_tax_invoice(raw_text, views=None):
     # pattern = r'\b(tax\s*.*\s*invoice)\b'
-    if "tax invoice" in updated_raw_text:
-        return True
-    elif "taxinvoice" in updated_raw_text:
-        return True
-    elif "tax credit note" in updated_raw_text:
-        return True
-    elif "tax credit" in updated_raw_text:
-        return True
-    elif "tax receipt" in updated_raw_text:
+    if text_views.of(raw_text, views).single_line_index.has_any(keywords.TAX_INVOICE_KEYWORDS):
         return True
     # elif re.search(pattern, updated_raw_text):
     #     return True
@@ -208,14 +205,15 @@ def check_is_tax_invoice(raw_text):
 def check_is_credit_note(azure_response, raw_text, version):
     container_key, text_or_content, block_type = mapping_utils.get_response_structure(version)
     check_first_lines = 25
-    credit_note_labels = ["credit/adjustment note", "credit adjustment note", "credit memo", "tax adjustment note",
-                          "adjustment note", "credit adjustment", "tax invoice adjustment", "adjustment credit","adjustment",
-                          "tax credit", "credit to", "credit adj note", "credit note number", "credit note date", "credit note"]
+    line_texts = []
     for line in azure_response["analyzeResult"][container_key][0]["lines"][:check_first_lines]:
         line_text = line[text_or_content].replace("\n", " ").lower()
         print(line_text)
-        if any(label in line_text for label in credit_note_labels):
-            return True
+        line_texts.append(line_text)
+    # Labels have no line breaks, so a label is in one of the lines exactly when it is in the joined lines
+    lines_text = "\n".join(line_texts)
+    if any(label in lines_text for label in keywords.CREDIT_NOTE_LABELS):
+        return True
     # updated_raw_text = raw_text.replace("\n", " ").lower()
     # if any(label in updated_raw_text for label in credit_note_labels):
     #     return True
@@ -223,22 +221,17 @@ def check_is_credit_note(azure_response, raw_text, version):
 
 
 def extract_lpo(raw_text):
-    regex = r"LPO\s*\d{4,}"
-    lpo_match = re.search(regex, raw_text, re.IGNORECASE)
+    lpo_match = identifiers.extract(raw_text).first("lpo")
     if lpo_match:
-        return lpo_match.group()
-    else:
-        regex = r"LP0\s*\d{4,}"  # Sometimes OCR reads LP0 as LP0
-        lpo_match = re.search(regex, raw_text, re.IGNORECASE)
-        if lpo_match:
-            return lpo_match.group().replace("LP0", "LPO")
+        if lpo_match.pattern_index == 0:
+            return lpo_match.value
+        return lpo_match.value.replace("LP0", "LPO")  # Sometimes OCR reads LPO as LP0
     return None
 
 def extract_iban_num(raw_text):
-    regex = r"\bPK\d{2}[A-Z]{4}\d{16}\b"
-    iban_match = re.search(regex, raw_text)
+    iban_match = identifiers.extract(raw_text).first("iban")
     if iban_match:
-        return iban_match.group()
+        return iban_match.value
     return None
 def get_excluded_list(raw_text, page_blocks_list):
     excluded = []
@@ -256,20 +249,14 @@ def is_australian_address(raw_text):
     pattern = re.compile(r'.*(\b(?:NSW|VIC|QLD|WA|SA|TAS|ACT|NT)\b).*\b\d{4}\b')
     return bool(re.search(pattern, raw_text))
 
-def is_utility_bill(raw_text):
-    vendor_list = ["agl south australia", "originenergy", "telstra", "energy intelligence", "energy australia"]
-    raw_text_lower = re.sub(r'([a-z])([A-Z])', r'\1 \2', raw_text.replace("\n", " ")).lower()
+def is_utility_bill(raw_text, views=None):
+    text_index = text_views.of(raw_text, views).camel_split_index
     # Check if any vendor from vendor_list and 'mitsubishi' are both present
-    vendor_found = any(vendor in raw_text_lower for vendor in vendor_list)
+    vendor_found = text_index.has_any(keywords.UTILITY_VENDORS)
     if vendor_found:
         return True
     # Check for specific keywords
-    keyword_list = [
-        "water usage", "water notice", "water usage account", "water/sewer charges",
-        "water account", "overdue water", "wastewater", "overdue water charges", "water supply",
-        "electricity bill", "instalment notice", "water charges"
-    ]
-    keyword_found = any(keyword in raw_text_lower for keyword in keyword_list)
+    keyword_found = text_index.has_any(keywords.UTILITY_KEYWORDS)
     if keyword_found:
         return True
     return False
@@ -361,10 +348,8 @@ def hardcoded_7_eleven_values(azure_response, use_gpt, version):
 
 def extract_co2_emission(raw_text):
     emission = ""
-    pattern = r"(?i)greenhouse gas emissions(?:\W+\w+){0,6}.*?([-+]?\d*\.?\d+)\s*tonnes"
-
-    match = re.search(pattern, raw_text)
+    match = identifiers.extract(raw_text).first("co2_emission")
     if match:
-        emission = float(match.group(1))
+        emission = float(match.groups[0])
     return emission
 
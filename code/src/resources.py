@@ -0,0 +1,78 @@
+import os
+import time
+import fnmatch
+import logging
+import threading
+
+logger = logging.getLogger("app_logger")
+
+# Comma separated resource names or patterns (e.g. "spacy.*,blob.service_client") loaded by warmup() at startup
+RESOURCE_WARMUP = os.getenv("RESOURCE_WARMUP", "")
+
+
+class LazyResource:
+    """
+    Model or client created on first get() instead of at import. per_process resources (network clients,
+    DB connections) are created again in a forked worker, the rest (models) are shared with the parent.
+    """
+
+    def __init__(self, name, factory, per_process=False):
+        self.name = name
+        self.factory = factory
+        self.per_process = per_process
+        self.init_seconds = None
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._pid is not None and (not self.per_process or self._pid == os.getpid())
+
+    def get(self):
+        if self.loaded:
+            return self._value
+        with self._lock:
+            if not self.loaded:
+                start = time.perf_counter()
+                self._value = self.factory()
+                self.init_seconds = round(time.perf_counter() - start, 3)
+                self._pid = os.getpid()
+                logger.info(f"Initialised {self.name} in {self.init_seconds}s")
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._pid = None
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register(name, factory, per_process=False):
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = LazyResource(name, factory, per_process)
+        return _registry[name]
+
+
+def get(name):
+    return _registry[name].get()
+
+
+def warmup(patterns=None):
+    """Loads the registered resources matching the given names/patterns now, RESOURCE_WARMUP by default."""
+    if patterns is None:
+        patterns = [pattern.strip() for pattern in RESOURCE_WARMUP.split(",") if pattern.strip()]
+    loaded = []
+    for name, resource in list(_registry.items()):
+        if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            resource.get()
+            loaded.append(name)
+    return loaded
+
+
+def get_init_timings():
+    return {name: resource.init_seconds for name, resource in _registry.items() if resource.loaded}
@@ -0,0 +1,187 @@
+import os
+import json
+import uuid
+import functools
+import threading
+import contextvars
+from collections import OrderedDict
+
+# In-process tier, bounded by the size of the serialized responses it holds
+FR_MEMORY_CACHE_MAX_BYTES = int(os.getenv("FR_MEMORY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Local content-addressed tier, responses are stored as <dir>/<container>/<md5[:2]>/<md5>.json
+FR_DISK_CACHE_DIR = os.getenv("FR_DISK_CACHE_DIR", os.path.join("cache", "formrecognizer"))
+FR_DISK_CACHE_MAX_BYTES = int(os.getenv("FR_DISK_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+FR_DISK_CACHE_ENABLED = os.getenv("FR_DISK_CACHE_ENABLED", "True").lower() == "true"
+DISK_PRUNE_EVERY = 50
+
+# Keys known to be missing from the blob tier during the current request (see request_scoped)
+_request_misses = contextvars.ContextVar("fr_request_misses", default=None)
+
+
+class MemoryCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DiskCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._puts = 0
+
+    def _path(self, container_name, md5):
+        return os.path.join(self.cache_dir, container_name, md5[:2], f"{md5}.json")
+
+    def get(self, container_name, md5):
+        try:
+            with open(self._path(container_name, md5), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, container_name, md5, data):
+        path = self._path(container_name, md5)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written next to the final path and renamed, so concurrent readers never see a partial file
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._puts += 1
+        if self._puts % DISK_PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Removes the least recently modified responses until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+memory_cache = MemoryCache(FR_MEMORY_CACHE_MAX_BYTES)
+disk_cache = DiskCache(FR_DISK_CACHE_DIR, FR_DISK_CACHE_MAX_BYTES)
+stats = {tier: {"hits": 0, "misses": 0} for tier in ("memory", "disk", "blob")}
+stats["blob"]["negative_hits"] = 0
+_stats_lock = threading.Lock()
+
+
+def _count(tier, outcome):
+    with _stats_lock:
+        stats[tier][outcome] += 1
+
+
+def get_stats():
+    with _stats_lock:
+        return {tier: dict(counters) for tier, counters in stats.items()}
+
+
+def get(container_name, md5, fetch_remote):
+    """
+    Looks a Form Recognizer response up in memory, then on local disk, then through fetch_remote
+    (the blob tier, returning the JSON bytes or None). Hits are promoted to the faster tiers and
+    every call returns a freshly parsed dict, as the pipeline mutates responses in place.
+    """
+    key = f"{container_name}/{md5}"
+    data = memory_cache.get(key)
+    if data is not None:
+        _count("memory", "hits")
+        return json.loads(data)
+    _count("memory", "misses")
+
+    if FR_DISK_CACHE_ENABLED:
+        data = disk_cache.get(container_name, md5)
+        if data is not None:
+            _count("disk", "hits")
+            memory_cache.put(key, data)
+            return json.loads(data)
+        _count("disk", "misses")
+
+    request_misses = _request_misses.get()
+    if request_misses is not None and key in request_misses:
+        _count("blob", "negative_hits")
+        return None
+    data = fetch_remote()
+    if data is None:
+        _count("blob", "misses")
+        if request_misses is not None:
+            request_misses.add(key)
+        return None
+    _count("blob", "hits")
+    memory_cache.put(key, data)
+    if FR_DISK_CACHE_ENABLED:
+        disk_cache.put(container_name, md5, data)
+    return json.loads(data)
+
+
+def put(container_name, md5, azure_response):
+    """Stores a fresh response in the local tiers and returns its JSON bytes for the blob upload."""
+    key = f"{container_name}/{md5}"
+    data = json.dumps(azure_response).encode("utf-8")
+    memory_cache.put(key, data)
+    if FR_DISK_CACHE_ENABLED:
+        disk_cache.put(container_name, md5, data)
+    request_misses = _request_misses.get()
+    if request_misses is not None:
+        request_misses.discard(key)
+    return data
+
+
+def request_scoped(func):
+    """
+    Blob misses are remembered for the duration of the decorated call (one request), so a page that
+    is looked up again during the same request does not cost another blob round trip. Threads started
+    inside the call see the same scope when run with contextvars.copy_context().run.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _request_misses.get() is not None:
+            return func(*args, **kwargs)
+        token = _request_misses.set(set())
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _request_misses.reset(token)
+    return wrapper
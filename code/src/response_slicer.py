@@ -0,0 +1,145 @@
+import copy
+from src import mapping_utils
+
+# A sliced split is only used as is when it has these fields, otherwise the split is sent to Form Recognizer again
+SLICE_REQUIRED_FIELDS = ["InvoiceId", "VendorName"]
+SLICE_TOTAL_FIELDS = ["InvoiceTotal", "AmountDue", "SubTotal"]
+
+
+def get_field_page(field, version):
+    """Page number a Form Recognizer field was found on, None if the field has no location."""
+    if version == "v2.1":
+        return field.get("page")
+    bounding_regions = field.get("boundingRegions") or []
+    if bounding_regions:
+        return bounding_regions[0].get("pageNumber")
+    return None
+
+
+def renumber_field(field, version, page_mapping):
+    if version == "v2.1":
+        if field.get("page") in page_mapping:
+            field["page"] = page_mapping[field["page"]]
+    else:
+        for region in field.get("boundingRegions", []):
+            if region.get("pageNumber") in page_mapping:
+                region["pageNumber"] = page_mapping[region["pageNumber"]]
+    return field
+
+
+def slice_fields(fields, version, page_mapping, keep_unlocated):
+    sliced_fields = {}
+    for name, field in fields.items():
+        if name == "Items" and isinstance(field, dict) and "valueArray" in field:
+            items = [renumber_field(copy.deepcopy(item), version, page_mapping) for item in field["valueArray"]
+                     if get_field_page(item, version) in page_mapping or
+                     (get_field_page(item, version) is None and keep_unlocated)]
+            if items:
+                sliced_items = copy.deepcopy({k: v for k, v in field.items() if k != "valueArray"})
+                sliced_items["valueArray"] = items
+                sliced_fields[name] = renumber_field(sliced_items, version, page_mapping)
+            continue
+        field_page = get_field_page(field, version) if isinstance(field, dict) else None
+        if field_page in page_mapping or (field_page is None and keep_unlocated):
+            sliced_fields[name] = renumber_field(copy.deepcopy(field), version, page_mapping)
+    return sliced_fields
+
+
+def get_document_pages(document, version):
+    if version == "v2.1":
+        page_range = document.get("pageRange") or []
+        if len(page_range) == 2:
+            return set(range(page_range[0], page_range[1] + 1))
+        return set()
+    return {region.get("pageNumber") for region in document.get("boundingRegions", [])}
+
+
+def slice_response(azure_response, page_numbers, version):
+    """
+    Builds the response Form Recognizer would have returned for the given (1-based) pages of an already
+    analysed document, in the v2.1 or v3.1 shape. Pages are renumbered from 1 as in a standalone analysis
+    of the split PDF and the original response is left untouched.
+    """
+    container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
+    page_key, _, _ = mapping_utils.get_response_structure(version)
+    page_numbers = sorted(page_numbers)
+    page_mapping = {page_number: i + 1 for i, page_number in enumerate(page_numbers)}
+    analyze_result = azure_response["analyzeResult"]
+
+    sliced_result = {k: v for k, v in analyze_result.items()
+                     if k not in (page_key, container_key, "pageResults", "tables", "content")}
+    sliced_result = copy.deepcopy(sliced_result)
+
+    sliced_pages = []
+    page_number_key = "page" if version == "v2.1" else "pageNumber"
+    for page in analyze_result.get(page_key, []):
+        if page.get(page_number_key) in page_mapping:
+            sliced_page = copy.deepcopy(page)
+            sliced_page[page_number_key] = page_mapping[page[page_number_key]]
+            sliced_pages.append(sliced_page)
+    sliced_result[page_key] = sliced_pages
+
+    if version == "v2.1":
+        sliced_page_results = []
+        for page_result in analyze_result.get("pageResults", []):
+            if page_result.get("page") in page_mapping:
+                sliced_page_result = copy.deepcopy(page_result)
+                sliced_page_result["page"] = page_mapping[page_result["page"]]
+                sliced_page_results.append(sliced_page_result)
+        sliced_result["pageResults"] = sliced_page_results
+    else:
+        content = analyze_result.get("content", "")
+        page_contents = []
+        for page in analyze_result.get(page_key, []):
+            if page.get(page_number_key) in page_mapping:
+                for span in page.get("spans", []):
+                    page_contents.append(content[span["offset"]:span["offset"] + span["length"]])
+        sliced_result["content"] = "\n".join(page_contents)
+        sliced_tables = []
+        for table in analyze_result.get("tables", []):
+            if any(region.get("pageNumber") in page_mapping for region in table.get("boundingRegions", [])):
+                sliced_table = copy.deepcopy(table)
+                sliced_table["boundingRegions"] = [region for region in sliced_table["boundingRegions"]
+                                                   if region.get("pageNumber") in page_mapping]
+                for region in sliced_table["boundingRegions"]:
+                    region["pageNumber"] = page_mapping[region["pageNumber"]]
+                sliced_tables.append(sliced_table)
+        sliced_result["tables"] = sliced_tables
+
+    sliced_documents = []
+    for document in analyze_result.get(container_key, []):
+        document_pages = get_document_pages(document, version)
+        if document_pages and not document_pages.intersection(page_mapping):
+            continue
+        # Fields without a location are attributed to the split holding the start of the document
+        keep_unlocated = not document_pages or min(document_pages) in page_mapping
+        sliced_document = copy.deepcopy({k: v for k, v in document.items() if k != "fields"})
+        sliced_document["fields"] = slice_fields(document.get("fields", {}), version, page_mapping, keep_unlocated)
+        if version == "v2.1":
+            sliced_document["pageRange"] = [1, len(page_numbers)]
+        else:
+            sliced_document["boundingRegions"] = [region for region in sliced_document.get("boundingRegions", [])
+                                                  if region.get("pageNumber") in page_mapping]
+            for region in sliced_document["boundingRegions"]:
+                region["pageNumber"] = page_mapping[region["pageNumber"]]
+        sliced_documents.append(sliced_document)
+    if not sliced_documents:
+        sliced_documents.append({"fields": {}})
+    sliced_result[container_key] = sliced_documents
+
+    sliced_response = {k: copy.deepcopy(v) for k, v in azure_response.items() if k != "analyzeResult"}
+    sliced_response["analyzeResult"] = sliced_result
+    return sliced_response
+
+
+def is_slice_sufficient(sliced_response, version):
+    """True when the sliced fields are good enough to skip analysing the split again."""
+    container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
+    page_key, _, _ = mapping_utils.get_response_structure(version)
+    analyze_result = sliced_response["analyzeResult"]
+    if not any(page.get("lines") for page in analyze_result.get(page_key, [])):
+        return False
+    fields = analyze_result[container_key][0]["fields"]
+    if not all(field in fields for field in SLICE_REQUIRED_FIELDS):
+        return False
+    return any(field in fields for field in SLICE_TOTAL_FIELDS)
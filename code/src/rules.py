@@ -0,0 +1,136 @@
+import time
+import threading
+from src import text_views, invoice_model
+
+# Declarative validation rules. Each rule names its triggers (version, language, fields, vendor name,
+# keywords), which are necessary conditions for it to change anything: rules whose triggers do not hold are
+# skipped without being called, the rules that run still do their own checks. Rules run in the order they
+# were added, and every rule's runs, skips and time are counted per process.
+
+
+class RuleContext:
+    """What the rules of a document read, azure_response is replaced by what each rule returns."""
+
+    def __init__(self, azure_response, version, detected_language=None, raw_text="", views=None, invoice=None,
+                 **values):
+        self.azure_response = azure_response
+        self.version = version
+        self.detected_language = detected_language
+        self.raw_text = raw_text
+        self.views = text_views.of(raw_text, views)
+        # The invoice's model when the caller has one (process_single_invoice does), otherwise one is made here
+        self.invoice = invoice_model.of(azure_response, version, invoice)
+        for name, value in values.items():
+            setattr(self, name, value)
+
+
+class Rule:
+    def __init__(self, name, action, versions=None, languages=None, exclude_languages=None, fields=None,
+                 vendors=None, keywords=None):
+        self.name = name
+        self.action = action
+        self.versions = versions
+        self.languages = languages
+        self.exclude_languages = exclude_languages
+        self.fields = fields
+        self.vendors = vendors
+        self.keywords = keywords
+
+    def matches_document(self, version, language):
+        """Triggers that hold for the whole document (indexed by RuleSet)."""
+        if self.versions is not None and version not in self.versions:
+            return False
+        if self.languages is not None and language not in self.languages:
+            return False
+        if self.exclude_languages is not None and language in self.exclude_languages:
+            return False
+        return True
+
+    def matches_fields(self, context):
+        """Triggers on the fields, checked right before the rule would run since earlier rules change them."""
+        if self.fields is not None and not all(field in context.invoice for field in self.fields):
+            return False
+        if self.vendors is not None:
+            vendor_name = context.invoice.text("VendorName")
+            if not isinstance(vendor_name, str) or not any(vendor in vendor_name for vendor in self.vendors):
+                return False
+        if self.keywords is not None and not context.views.lower_index.has_any(self.keywords):
+            return False
+        return True
+
+
+class RuleStats:
+    __slots__ = ("runs", "skips", "seconds")
+
+    def __init__(self):
+        self.runs = 0
+        self.skips = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {"runs": self.runs, "skips": self.skips, "seconds": round(self.seconds, 6)}
+
+
+class RuleSet:
+    def __init__(self, name):
+        self.name = name
+        self.rules = []
+        self.stats = {}
+        self._index = {}
+        # Documents are validated from several page threads at once, their counts are merged under the lock
+        self._stats_lock = threading.Lock()
+
+    def add(self, name, action, **triggers):
+        """Adds a rule, action is called with the RuleContext and returns the updated azure_response."""
+        if name in self.stats:
+            raise ValueError(f"Rule {name} is already in {self.name}")
+        self.rules.append(Rule(name, action, **triggers))
+        self.stats[name] = RuleStats()
+        self._index.clear()
+        return action
+
+    def applicable(self, version, language):
+        """Rules whose document triggers hold and the other rules, worked out once per version and language."""
+        key = (version, language)
+        if key not in self._index:
+            applicable = [rule for rule in self.rules if rule.matches_document(version, language)]
+            self._index[key] = (applicable, [rule for rule in self.rules if rule not in applicable])
+        return self._index[key]
+
+    def run(self, context):
+        applicable, not_applicable = self.applicable(context.version, context.detected_language)
+        skipped = [rule.name for rule in not_applicable]
+        ran = []
+        try:
+            for rule in applicable:
+                if not rule.matches_fields(context):
+                    skipped.append(rule.name)
+                    continue
+                start = time.perf_counter()
+                try:
+                    azure_response = rule.action(context)
+                finally:
+                    ran.append((rule.name, time.perf_counter() - start))
+                context.azure_response = azure_response
+                context.invoice = invoice_model.of(azure_response, context.version, context.invoice)
+        finally:
+            self._record(skipped, ran)
+        return context.azure_response
+
+    def _record(self, skipped, ran):
+        with self._stats_lock:
+            for name in skipped:
+                self.stats[name].skips += 1
+            for name, seconds in ran:
+                stats = self.stats[name]
+                stats.runs += 1
+                stats.seconds += seconds
+
+    def get_stats(self):
+        with self._stats_lock:
+            return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for stats in self.stats.values():
+                stats.__init__()
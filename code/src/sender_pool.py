@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from azure.servicebus import ServiceBusMessage
+from azure.servicebus.aio import ServiceBusClient
+from azure.servicebus.exceptions import MessageSizeExceededError
+
+SERVICE_BUS_CONNECTION_STRING = os.getenv("AZURE_SERVICEBUS_CONNECTION_STRING")
+# Messages for the same queue arriving within this window are sent together in one ServiceBusMessageBatch
+SEND_BATCH_WINDOW_SECONDS = float(os.getenv("SERVICE_BUS_SEND_BATCH_WINDOW_MS", "50")) / 1000
+MAX_MESSAGES_PER_SEND = int(os.getenv("SERVICE_BUS_MAX_MESSAGES_PER_SEND", "100"))
+
+sender_logger = logging.getLogger('servicebus_logger')
+
+
+class SenderPool:
+    """
+    Long-lived Service Bus senders keyed by queue name, shared by the invoice and exception resolution
+    paths. Outgoing messages are queued per queue name and flushed in batches so a burst of results
+    costs one AMQP send instead of one connection handshake per message.
+    """
+
+    def __init__(self, connection_string, batch_window=SEND_BATCH_WINDOW_SECONDS,
+                 max_messages_per_send=MAX_MESSAGES_PER_SEND):
+        self.connection_string = connection_string
+        self.batch_window = batch_window
+        self.max_messages_per_send = max_messages_per_send
+        self._client = None
+        self._senders = {}
+        self._pending = {}
+        self._flushers = {}
+        self.metrics = {}
+        # get_metrics is called from the Flask threads while the event loop thread records sends
+        self._metrics_lock = threading.Lock()
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = ServiceBusClient.from_connection_string(conn_str=self.connection_string)
+        return self._client
+
+    def _get_sender(self, queue_name):
+        if queue_name not in self._senders:
+            self._senders[queue_name] = self._get_client().get_queue_sender(queue_name=queue_name)
+        return self._senders[queue_name]
+
+    async def _drop_sender(self, queue_name):
+        # The link may be broken after a failed send, the next send opens a new one
+        sender = self._senders.pop(queue_name, None)
+        if sender is not None:
+            try:
+                await sender.close()
+            except Exception as e:
+                sender_logger.error(f"Failed to close sender for queue {queue_name}: {str(e)}")
+
+    async def send(self, queue_name, message_body):
+        """Queues message_body for queue_name and waits until the batch containing it has been sent."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(queue_name, []).append((message_body, future))
+        flusher = self._flushers.get(queue_name)
+        if flusher is None or flusher.done():
+            self._flushers[queue_name] = asyncio.create_task(self._flush(queue_name))
+        return await future
+
+    async def _flush(self, queue_name):
+        while self._pending.get(queue_name):
+            await asyncio.sleep(self.batch_window)
+            pending = self._pending[queue_name][:self.max_messages_per_send]
+            del self._pending[queue_name][:len(pending)]
+            await self._send_pending(queue_name, pending)
+
+    async def _send_pending(self, queue_name, pending):
+        try:
+            sender = self._get_sender(queue_name)
+            batches = []
+            batch = await sender.create_message_batch()
+            batch_futures = []
+            for message_body, future in pending:
+                message = ServiceBusMessage(message_body)
+                try:
+                    batch.add_message(message)
+                except MessageSizeExceededError:
+                    if not batch_futures:
+                        # The message alone is larger than the maximum batch size
+                        future.set_exception(MessageSizeExceededError(
+                            message=f"Message of {len(message_body)} characters exceeds the maximum batch size"))
+                        continue
+                    batches.append((batch, batch_futures))
+                    batch = await sender.create_message_batch()
+                    batch_futures = []
+                    batch.add_message(message)
+                batch_futures.append(future)
+            if batch_futures:
+                batches.append((batch, batch_futures))
+
+            for batch, batch_futures in batches:
+                send_start = time.time()
+                await sender.send_messages(batch)
+                self._record(queue_name, len(batch_futures), time.time() - send_start)
+                for future in batch_futures:
+                    if not future.done():
+                        future.set_result(None)
+        except Exception as e:
+            sender_logger.error(f"Failed to send batch to queue {queue_name}: {str(e)}")
+            await self._drop_sender(queue_name)
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _record(self, queue_name, batch_size, latency):
+        with self._metrics_lock:
+            queue_metrics = self.metrics.setdefault(queue_name, {"messages_sent": 0, "batches_sent": 0,
+                                                                 "max_batch_size": 0, "total_send_seconds": 0.0,
+                                                                 "last_send_seconds": 0.0})
+            queue_metrics["messages_sent"] += batch_size
+            queue_metrics["batches_sent"] += 1
+            queue_metrics["max_batch_size"] = max(queue_metrics["max_batch_size"], batch_size)
+            queue_metrics["total_send_seconds"] += latency
+            queue_metrics["last_send_seconds"] = latency
+        sender_logger.info(f"Sent batch of {batch_size} messages to queue {queue_name} in {latency * 1000:.1f} ms")
+
+    def get_metrics(self):
+        """Per-queue send counters with the average batch size and send latency."""
+        with self._metrics_lock:
+            snapshot = {queue_name: dict(queue_metrics) for queue_name, queue_metrics in self.metrics.items()}
+        metrics = {}
+        for queue_name, queue_metrics in snapshot.items():
+            batches_sent = queue_metrics["batches_sent"] or 1
+            metrics[queue_name] = dict(queue_metrics,
+                                       avg_batch_size=queue_metrics["messages_sent"] / batches_sent,
+                                       avg_send_seconds=queue_metrics["total_send_seconds"] / batches_sent)
+        return metrics
+
+    async def close(self):
+        for flusher in list(self._flushers.values()):
+            if not flusher.done():
+                await flusher
+        for queue_name in list(self._senders):
+            await self._drop_sender(queue_name)
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+_sender_pool = None
+
+
+def get_sender_pool():
+    # Created on first use so the client is bound to the listener's event loop
+    global _sender_pool
+    if _sender_pool is None:
+        _sender_pool = SenderPool(SERVICE_BUS_CONNECTION_STRING)
+    return _sender_pool
+
+
+async def send_message(queue_name, message_body):
+    await get_sender_pool().send(queue_name, message_body)
@@ -5,10 +5,9 @@ import sys
 import json
 import backoff
 import traceback
-from azure.servicebus.aio import ServiceBusClient
-from azure.servicebus import ServiceBusMessage
+from azure.servicebus.aio import ServiceBusClient, AutoLockRenewer
 from src.utils import azure_utils, pdf_utils, arabic_util
-from src import raw_text_utils
+from src import raw_text_utils, worker_pool, sender_pool, keywords, text_views
 import tempfile
 from processor import process_invoice
 from exception_processor import process_exceptions
@@ -157,24 +156,16 @@ SERVICE_BUS_CONNECTION_STRING = os.getenv("AZURE_SERVICEBUS_CONNECTION_STRING")
 SERVICE_BUS_QUEUE_NAME_RECEIVE = os.getenv("SERVICE_BUS_QUEUE_NAME_RECEIVE")
 SERVICE_BUS_QUEUE_EXCEPTIONS_RECEIVE = os.getenv("SERVICE_BUS_QUEUE_EXCEPTIONS_RECEIVE")
 SERVICE_BUS_QUEUE_EXCEPTIONS_SEND = os.getenv("SERVICE_BUS_QUEUE_EXCEPTIONS_SEND")
+# Upper bound on invoice messages being processed at once, receive size is sized from the free slots
+MAX_IN_FLIGHT_MESSAGES = int(os.getenv("SERVICE_BUS_MAX_IN_FLIGHT", "8"))
+# Prefetched messages are locked but their lock is not renewed until they are received, keep this small
+PREFETCH_COUNT = int(os.getenv("SERVICE_BUS_PREFETCH_COUNT", "0"))
+# Long multi-page PDFs can take longer than the queue lock duration, locks are renewed up to this many seconds
+MAX_LOCK_RENEWAL_SECONDS = int(os.getenv("SERVICE_BUS_MAX_LOCK_RENEWAL_SECONDS", "3600"))
 # db_connection = db_utils.connect_db()
 
 
-WHITELISTED_SUPPLIERS = {
-    "telstra": 5,
-    "komatsu": 0,
-    "hertz": 0,
-    "agl south australia": 5,
-    "team global express": 5,
-    "carey mining": 5,
-    "coates hire": 5,
-    "sg fleet australia": 5,
-    "australia post": 5,
-    "messagemedia": 5,
-    "shell energy": 5,
-    "quarrico": 0,
-    "ara fire": 5
-}
+WHITELISTED_SUPPLIERS = keywords.WHITELISTED_SUPPLIERS
 
 
 async def process_exceptions_resolution(message):
@@ -224,10 +215,7 @@ async def send_response_to_queue(invoice_id, actions, connection_id, user_id, se
         }
         message_body = json.dumps(message_content)
 
-        message = ServiceBusMessage(message_body)
-        service_bus_client = ServiceBusClient.from_connection_string(conn_str=SERVICE_BUS_CONNECTION_STRING)
-        sender = service_bus_client.get_queue_sender(queue_name=send_queue_name)
-        await sender.send_messages(message)
+        await sender_pool.send_message(send_queue_name, message_body)
 
         servicebus_logger.info(f"Successfully sent response for invoice ID {invoice_id} to queue {send_queue_name}")
     except Exception as e:
@@ -257,7 +245,7 @@ async def process_single_file(file_data, start, process_always, correlation_id,
         processing_folder = os.path.join(UPLOAD_FOLDER, correlation_id+str(datetime.datetime.now()).replace(":", "_"))
         os.mkdir(processing_folder)
             
-        downloaded_file_path = azure_utils.download_blob_file(file_path, processing_folder)
+        downloaded_file_path = await worker_pool.run_blocking(azure_utils.download_blob_file, file_path, processing_folder)
         
         filename = os.path.basename(downloaded_file_path)
         extension = filename.lower().split('.')[-1]
@@ -271,8 +259,9 @@ async def process_single_file(file_data, start, process_always, correlation_id,
         # invoice translation
         if run_translation:
             servicebus_logger.info(f'Translation triggered for file -> {filename}')
-            translated_file_path, invoice_lang = translate_document(downloaded_file_path)
-            translated_file_url, translated_path = azure_utils.upload_file_on_azure(translated_file_path, file_id,
+            translated_file_path, invoice_lang = await worker_pool.run_blocking(translate_document, downloaded_file_path)
+            translated_file_url, translated_path = await worker_pool.run_blocking(azure_utils.upload_file_on_azure,
+                                                                                    translated_file_path, file_id,
                                                                                     correlation_id,
                                                                                     "translated_invoice")
             downloaded_file_path = translated_file_path
@@ -283,21 +272,18 @@ async def process_single_file(file_data, start, process_always, correlation_id,
             matched_supplier = None
             if page_count > 50:
                 first_page_pdf = pdf_utils.split_pdfs(downloaded_file_path, processing_folder, [1, 2])[0]
-                temp_output = process_invoice(first_page_pdf, processing_folder, servicebus_logger, log_filename,
+                temp_output = await worker_pool.run_in_worker(process_invoice, first_page_pdf, processing_folder, servicebus_logger, log_filename,
                                               extension.lower(),
                                               process_always, version=version,
                                               run_classification=run_classification, temp=True, file_id=file_id,
                                               correlation_id=correlation_id)
                 temp_raw_text = raw_text_utils.get_raw_text(temp_output[0], version)
-                for supplier in WHITELISTED_SUPPLIERS:
-                    if supplier in temp_raw_text[0].lower():
-                        matched_supplier = supplier
-                        break
+                matched_supplier = text_views.get(temp_raw_text[0]).lower_index.first(WHITELISTED_SUPPLIERS)
             if (page_count <= 50) or (matched_supplier is not None):
                 if matched_supplier is not None and page_count > 50:
                     if WHITELISTED_SUPPLIERS[matched_supplier] != 0:
                         downloaded_file_path = pdf_utils.split_pdfs(downloaded_file_path, processing_folder, [0, WHITELISTED_SUPPLIERS[matched_supplier]])[0]
-                output = process_invoice(downloaded_file_path, processing_folder, servicebus_logger, log_filename,
+                output = await worker_pool.run_in_worker(process_invoice, downloaded_file_path, processing_folder, servicebus_logger, log_filename,
                                          extension.lower(),
                                          process_always, version=version, run_classification=run_classification,
                                          file_id=file_id, correlation_id=correlation_id)
@@ -342,7 +328,7 @@ async def process_single_file(file_data, start, process_always, correlation_id,
                         servicebus_logger.info(
                             f"File with correlation ID {correlation_id} and file name {file_name} skipped due to lower image height.")
                         return None
-                    output = process_invoice(downloaded_file_path, processing_folder, servicebus_logger, log_filename,
+                    output = await worker_pool.run_in_worker(process_invoice, downloaded_file_path, processing_folder, servicebus_logger, log_filename,
                                              extension.lower(),
                                              process_always=False, version=version,
                                              run_classification=run_classification, file_id=file_id,
@@ -367,7 +353,7 @@ async def process_single_file(file_data, start, process_always, correlation_id,
                             run_translation, process_always, tenant_id
                         )
             else:  # if running translation, file already converted to pdf, will process as a pdf file
-                output = process_invoice(downloaded_file_path, processing_folder, servicebus_logger, log_filename,
+                output = await worker_pool.run_in_worker(process_invoice, downloaded_file_path, processing_folder, servicebus_logger, log_filename,
                                          extension.lower(),
                                          process_always, version=version, run_classification=run_classification,
                                          file_id=file_id, correlation_id=correlation_id)
@@ -412,7 +398,7 @@ async def process_single_file(file_data, start, process_always, correlation_id,
                     f"Processing file with correlation ID {correlation_id} and file name {file_name} as a PDF despite unsupported file type.")
                 try:
                     # Processing the file as a PDF using the already downloaded file path
-                    output = process_invoice(downloaded_file_path, processing_folder, servicebus_logger, log_filename,
+                    output = await worker_pool.run_in_worker(process_invoice, downloaded_file_path, processing_folder, servicebus_logger, log_filename,
                                              extension="pdf",
                                              process_always=process_always, version=version,
                                              run_classification=run_classification, file_id=file_id,
@@ -459,7 +445,8 @@ async def process_single_file(file_data, start, process_always, correlation_id,
         json_response = json.dumps(output, indent=4)
         is_invoice = output[0].get('isInvoice', False)
         is_credit_note = output[0].get('isCreditNote', False)
-        response_path, result_path = azure_utils.upload_file_on_azure(json_response, file_id, correlation_id,"json_response")
+        response_path, result_path = await worker_pool.run_blocking(azure_utils.upload_file_on_azure, json_response, file_id,
+                                                                 correlation_id, "json_response")
         compressed_file_path = output[0]['compressedFilePath']
         response = {
             "fileId": file_id,
@@ -567,39 +554,90 @@ async def send_message_to_queue(correlation_id, tenant_id, source_type, supplier
         }
         message_body = json.dumps(message_content)
 
-        message = ServiceBusMessage(message_body)
-        service_bus_client = ServiceBusClient.from_connection_string(conn_str=SERVICE_BUS_CONNECTION_STRING)
-        sender = service_bus_client.get_queue_sender(queue_name=queue_name_send)
-        await sender.send_messages(message)
+        await sender_pool.send_message(queue_name_send, message_body)
 
         servicebus_logger.info(f"Sent confirmation message for correlation ID {correlation_id} to {queue_name_send}")
     except Exception as e:
         servicebus_logger.error(f"Error sending message: {str(e)}")
+        # Raised so the input message is abandoned and redelivered instead of being completed without a result
+        raise
+
+
+def on_lock_renew_failure(renewable, error):
+    servicebus_logger.error(f"Failed to renew lock for message {getattr(renewable, 'message_id', None)}: {str(error)}")
+
+
+async def handle_invoice_message(receiver, message, in_flight):
+    # The message is only completed once its result message has been sent, a failure or crash
+    # before that leaves it on the queue to be redelivered
+    try:
+        await process_and_upload_file(message)
+        await receiver.complete_message(message)
+    except Exception as e:
+        servicebus_logger.error(f"Error processing message {message.message_id}, abandoning it: {str(e)}")
+        servicebus_logger.error(f"Stack trace: {traceback.format_exc()}")
+        try:
+            await receiver.abandon_message(message)
+        except Exception as abandon_error:
+            servicebus_logger.error(f"Failed to abandon message {message.message_id}: {str(abandon_error)}")
+    finally:
+        in_flight.release()
+
+
+async def acquire_free_slots(in_flight):
+    # Waits for at least one free slot, then takes every other slot that is free right now
+    await in_flight.acquire()
+    slots = 1
+    while slots < MAX_IN_FLIGHT_MESSAGES and not in_flight.locked():
+        await in_flight.acquire()
+        slots += 1
+    return slots
 
 
 async def process_invoice_messages():
+    in_flight = asyncio.Semaphore(MAX_IN_FLIGHT_MESSAGES)
+    tasks = set()
     try:
         servicebus_logger.info("Starting invoice message processing service")
+        servicebus_logger.info(f"Max in-flight messages: {MAX_IN_FLIGHT_MESSAGES}, prefetch count: {PREFETCH_COUNT}")
         async with ServiceBusClient.from_connection_string(
                 conn_str=SERVICE_BUS_CONNECTION_STRING,
                 logging_enable=True,
         ) as servicebus_client:
-            receiver = servicebus_client.get_queue_receiver(queue_name=SERVICE_BUS_QUEUE_NAME_RECEIVE)
+            lock_renewer = AutoLockRenewer(max_lock_renewal_duration=MAX_LOCK_RENEWAL_SECONDS,
+                                           on_lock_renew_failure=on_lock_renew_failure)
+            receiver = servicebus_client.get_queue_receiver(queue_name=SERVICE_BUS_QUEUE_NAME_RECEIVE,
+                                                            prefetch_count=PREFETCH_COUNT,
+                                                            auto_lock_renewer=lock_renewer)
             servicebus_logger.info(f"Connected to queue: {SERVICE_BUS_QUEUE_NAME_RECEIVE}")
 
-            async with receiver:
-                while True:
-                    invoice_msgs = await receiver.receive_messages(max_wait_time=5, max_message_count=20)
-                    if invoice_msgs:
-                        servicebus_logger.info(f"Received batch of {len(invoice_msgs)} messages")
-                    for message in invoice_msgs:
+            async with lock_renewer, receiver:
+                try:
+                    while True:
+                        slots = await acquire_free_slots(in_flight)
                         try:
+                            invoice_msgs = await receiver.receive_messages(max_wait_time=5, max_message_count=slots)
+                        except Exception:
+                            for _ in range(slots):
+                                in_flight.release()
+                            raise
+                        # Give back the slots that were not filled by this receive
+                        for _ in range(slots - len(invoice_msgs)):
+                            in_flight.release()
+                        if invoice_msgs:
+                            servicebus_logger.info(f"Received batch of {len(invoice_msgs)} messages, "
+                                                   f"{len(tasks) + len(invoice_msgs)} in flight")
+                        for message in invoice_msgs:
                             servicebus_logger.info("Processing message...")
-                            asyncio.create_task(process_and_upload_file(message))
-                            await receiver.complete_message(message)
-                        except Exception as e:
-                            servicebus_logger.error(f"Error processing message: {str(e)}")
-                            servicebus_logger.error(f"Stack trace: {traceback.format_exc()}")
+                            task = asyncio.create_task(handle_invoice_message(receiver, message, in_flight))
+                            tasks.add(task)
+                            task.add_done_callback(tasks.discard)
+                finally:
+                    # Messages can only be settled through the receiver that received them, let the
+                    # in-flight ones finish before it is closed
+                    if tasks:
+                        servicebus_logger.info(f"Waiting for {len(tasks)} in-flight messages before closing receiver")
+                        await asyncio.gather(*tasks, return_exceptions=True)
 
     except Exception as e:
         servicebus_logger.error("Critical error in invoice message processing service")
@@ -634,6 +672,7 @@ async def process_exception_messages():
 
 async def listen_for_messages():
     print("IN LISTEN TO MESSAGE")
+    await worker_pool.run_blocking(worker_pool.warmup)
     while True:
         try:
             await asyncio.gather(
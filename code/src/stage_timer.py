@@ -0,0 +1,175 @@
+import os
+import time
+import functools
+import threading
+import contextvars
+from collections import OrderedDict
+
+# Stage timings (Form Recognizer, language detection, GenAI, NER, validation, encoding, ...) of the invoices
+# processed in a request, attached to the responses under "diagnostics". Off by default, stage() then only
+# reads a context variable and returns a shared no-op context manager.
+STAGE_TIMINGS_ENABLED = os.getenv("STAGE_TIMINGS", "False").lower() == "true"
+# Number of correlation IDs whose timings are kept for get_timings(), oldest dropped first
+STAGE_TIMINGS_MAX_REQUESTS = int(os.getenv("STAGE_TIMINGS_MAX_REQUESTS", "256"))
+
+_current = contextvars.ContextVar("stage_timings", default=None)
+
+
+class StageTimings:
+    """Count and total seconds of each stage, also added to the parent timings (the request's) when given."""
+
+    def __init__(self, correlation_id=None, parent=None):
+        self.correlation_id = correlation_id
+        self.parent = parent
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                self.stages[name] = [1, seconds]
+            else:
+                stage[0] += 1
+                stage[1] += seconds
+        if self.parent is not None:
+            self.parent.add(name, seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {name: {"count": count, "seconds": round(seconds, 4)}
+                    for name, (count, seconds) in self.stages.items()}
+
+
+class _Stage:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timings.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NO_STAGE = _NoStage()
+
+
+def stage(name):
+    """Times the with block as the named stage of the current invoice, when timings are being collected."""
+    timings = _current.get()
+    if timings is None:
+        return NO_STAGE
+    return _Stage(timings, name)
+
+
+def timed(name):
+    """Decorator version of stage()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_by_correlation_id = OrderedDict()
+_by_correlation_id_lock = threading.Lock()
+
+
+def _request_timings(correlation_id):
+    # Calls made for the same correlation ID (the first page check and the whole file for example) add up
+    with _by_correlation_id_lock:
+        timings = _by_correlation_id.get(correlation_id)
+        if timings is None:
+            timings = _by_correlation_id[correlation_id] = StageTimings(correlation_id)
+            while len(_by_correlation_id) > STAGE_TIMINGS_MAX_REQUESTS:
+                _by_correlation_id.popitem(last=False)
+        else:
+            _by_correlation_id.move_to_end(correlation_id)
+        return timings
+
+
+class collecting:
+    """
+    Collects the stages timed inside the with block (or between start() and stop()), nested blocks (an
+    invoice of a request) also add to the enclosing one and the outermost block of a correlation ID to
+    that ID's totals. Yields None when STAGE_TIMINGS is off.
+    """
+
+    def __init__(self, correlation_id=None, enabled=None):
+        self.correlation_id = correlation_id
+        self.enabled = STAGE_TIMINGS_ENABLED if enabled is None else enabled
+        self.timings = None
+        self._token = None
+
+    def start(self):
+        if not self.enabled:
+            return None
+        parent = _current.get()
+        if parent is None and self.correlation_id is not None:
+            parent = _request_timings(self.correlation_id)
+        self.timings = StageTimings(self.correlation_id, parent)
+        self._token = _current.set(self.timings)
+        return self.timings
+
+    def stop(self):
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+
+def collected(func):
+    """
+    Collects the stage timings of the decorated request (the correlation_id keyword argument) and adds
+    them to the diagnostics of the responses it returns as requestStageTimings.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with collecting(kwargs.get("correlation_id")) as timings:
+            responses = func(*args, **kwargs)
+        if timings is not None and isinstance(responses, list):
+            request_stage_timings = timings.as_dict()
+            for response in responses:
+                if isinstance(response, dict):
+                    response.setdefault("diagnostics", {})["requestStageTimings"] = request_stage_timings
+        return responses
+    return wrapper
+
+
+def diagnostics(timings):
+    """What goes under the "diagnostics" key of a response."""
+    result = {"stageTimings": timings.as_dict()}
+    if timings.correlation_id is not None:
+        result["correlationId"] = timings.correlation_id
+    return result
+
+
+def get_timings(correlation_id):
+    """Stage totals of the requests made with correlation_id in this process, None when there are none."""
+    with _by_correlation_id_lock:
+        timings = _by_correlation_id.get(correlation_id)
+    return timings.as_dict() if timings is not None else None
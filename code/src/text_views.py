@@ -0,0 +1,74 @@
+import re
+import string
+import functools
+from src import keywords
+
+PUNCTUATION_TRANSLATOR = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+CAMEL_CASE_PATTERN = re.compile(r'([a-z])([A-Z])')
+
+
+class TextViews:
+    """
+    Variants of a document's raw text used by the extraction and validation steps, each one worked out
+    the first time it is read and kept for the rest of the document's processing.
+    """
+
+    def __init__(self, raw_text):
+        self.raw_text = raw_text
+
+    @functools.cached_property
+    def lower(self):
+        return self.raw_text.lower()
+
+    @functools.cached_property
+    def single_line(self):
+        return self.raw_text.replace("\n", " ")
+
+    @functools.cached_property
+    def single_line_lower(self):
+        return self.single_line.lower()
+
+    @functools.cached_property
+    def joined_lines(self):
+        """Raw text with Windows and Unix line breaks replaced by spaces, as the line based NER models expect."""
+        return self.raw_text.replace("\r\n", " ").replace("\n", " ")
+
+    @functools.cached_property
+    def punctuation_stripped(self):
+        return self.raw_text.translate(PUNCTUATION_TRANSLATOR)
+
+    @functools.cached_property
+    def without_spaces(self):
+        """Same as the lines_without_spaces text of raw_text_utils.get_raw_text."""
+        return self.raw_text.replace(" ", "")
+
+    @functools.cached_property
+    def camel_split(self):
+        """Single line, lowercased raw text with camelCase words split ("OriginEnergy" -> "origin energy")."""
+        return CAMEL_CASE_PATTERN.sub(r'\1 \2', self.single_line).lower()
+
+    @functools.cached_property
+    def lower_index(self):
+        return keywords.KeywordIndex(self.lower)
+
+    @functools.cached_property
+    def single_line_index(self):
+        return keywords.KeywordIndex(self.single_line_lower)
+
+    @functools.cached_property
+    def camel_split_index(self):
+        return keywords.KeywordIndex(self.camel_split)
+
+
+# Functions that are not handed the views of the document they work on look them up by raw text
+VIEWS_CACHE_SIZE = 32
+
+
+@functools.lru_cache(maxsize=VIEWS_CACHE_SIZE)
+def get(raw_text):
+    return TextViews(raw_text)
+
+
+def of(raw_text, views=None):
+    """The given views, or the cached views of raw_text when there are none."""
+    return views if views is not None else get(raw_text)
@@ -5,6 +5,7 @@ from azure.keyvault.secrets import SecretClient
 from azure.identity import DefaultAzureCredential
 from collections import defaultdict
 import json
+from src import resources
 
 log_folder = "logs"
 log_filename = os.path.join(log_folder, "sc_app.log")
@@ -12,16 +13,21 @@ log_filename = os.path.join(log_folder, "sc_app.log")
 # sys.stdout = log_writer
 
 connect_str = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
-blob_service_client = BlobServiceClient.from_connection_string(connect_str)
+# Created on first use, see src.resources
+blob_service_client = resources.register("blob.service_client",
+                                         lambda: BlobServiceClient.from_connection_string(connect_str),
+                                         per_process=True)
 
 CONTAINER_MAPPING = defaultdict(lambda:'outputfiles')
 CONTAINER_MAPPING['translated_invoice'] = 'raw-uploads-test'
 CONTAINER_MAPPING['compressed_output'] = 'compressedoutput'
+CONTAINER_MAPPING['invoice_document'] = 'compressedoutput'
 
 
 BLOB_FILENAME_MAPPING = defaultdict(lambda:'.JSON')
 BLOB_FILENAME_MAPPING['translated_invoice'] = '-translated.pdf'
 BLOB_FILENAME_MAPPING['compressed_output'] = '.pdf'
+BLOB_FILENAME_MAPPING['invoice_document'] = '.pdf'
 
 
 def valid_model(model_path, file_name):
@@ -51,7 +57,7 @@ def download_blob_file(blob_url, target_dir):
 
     print("\nDownloading file to \n\t" + download_file_path)
     print("Downloading file from Azure Storage")
-    blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+    blob_client = blob_service_client.get().get_blob_client(container=container_name, blob=blob_name)
     blob_data = blob_client.download_blob()
     content = blob_data.readall()
 
@@ -62,7 +68,7 @@ def download_blob_file(blob_url, target_dir):
 
 
 def upload_blob(file_path, logger, container_name="logs"):
-    blob_client = blob_service_client.get_blob_client(container=container_name, blob=file_path)
+    blob_client = blob_service_client.get().get_blob_client(container=container_name, blob=file_path)
     logger.info("\nUploading to Azure Storage as blob:\n\t" + file_path)
 
     # Upload the created file
@@ -70,14 +76,26 @@ def upload_blob(file_path, logger, container_name="logs"):
         blob_client.upload_blob(data, overwrite=True)
 
 
+def download_blob_content(container_name, blob_name):
+    blob_client = blob_service_client.get().get_blob_client(container=container_name, blob=blob_name)
+    return blob_client.download_blob().readall()
+
+
+def upload_blob_content(content, blob_name, logger, container_name):
+    blob_client = blob_service_client.get().get_blob_client(container=container_name, blob=blob_name)
+    logger.info("\nUploading to Azure Storage as blob:\n\t" + blob_name)
+    blob_client.upload_blob(content, overwrite=True)
+
+
 def upload_file_on_azure(content, file_id, correlation_id, file_type):
     container_name = CONTAINER_MAPPING[file_type]
     subfolder_name = correlation_id
     blob_name = f'{subfolder_name}/{file_id}{BLOB_FILENAME_MAPPING[file_type]}'
-    blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+    blob_client = blob_service_client.get().get_blob_client(container=container_name, blob=blob_name)
 
     try:
-        if file_type == "translated_invoice" or file_type == 'compressed_output':
+        # Translated and compressed PDFs are passed as paths, or as bytes when they are only in memory
+        if (file_type == "translated_invoice" or file_type == 'compressed_output') and not isinstance(content, bytes):
             with open(content, 'rb') as data:
                 blob_client.upload_blob(data, overwrite=True)
         else:
@@ -103,11 +121,9 @@ def get_google_credentials():
 
 
 def get_invoice_json_from_azure_storage(invoice_id):
-    connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
     container_name = "invoicejson-test"
 
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-    container_client = blob_service_client.get_container_client(container_name)
+    container_client = blob_service_client.get().get_container_client(container_name)
     blob_name = f"{invoice_id}"
 
     blob_client = container_client.get_blob_client(blob_name)
@@ -1,8 +1,7 @@
 from abn import validate as validate_abn
 from fuzzywuzzy import fuzz, process
 import re
-import string
-from src import mapping_utils, font_size_estimation
+from src import mapping_utils, font_size_estimation, identifiers, text_views
 from src.ner import spacy_inference
 
 
@@ -44,36 +43,28 @@ def add_val_from_other_fields(other_fields, other_fields_key, bank_det_entities,
 
 
 def extract_abn_from_raw_text(raw_text, bank_det_entities):
-    abn_regex = re.compile(r'ABN(?:/GST No.)?\s*(\d{7}\s*\d{4})') #Changed regex pattern to optionally include GST No. in the pattern
-    matches = abn_regex.findall(raw_text)
+    # ABN patterns optionally include GST No. in the label, see identifiers.ABN_PATTERNS
+    identifier_table = identifiers.extract(raw_text)
+    matches = identifier_table.values("abn")
     #Extend the ABN list with the extracted values from the regex pattern
     bank_det_entities['ABN'].extend(matches)
-    if not matches:  # If no matches found, use different pattern to extract ABN
-        abn_regex_patterns = [
-            r'ABN:\s*(\d{2}\s*\d{3}\s*\d{3}\s*\d{3})',  # Pattern for ABN: 12 345 678 910
-            r'ABN(\d{2})\s*(\d{3})\s*(\d{3})\s*(\d{3})', # Pattern for ABN12 345 678 910
-            r'(A\.B\.N\.|ABN)\s*(\d{2})-(\d{3})-(\d{3})-(\d{3})', # Pattern for ABN 90-088-123-067 or A.B.N. 30-604-211-225
-            r'ARN\s*(\d{2})\s*(\d{3})\s*(\d{2})\s*:\s*(\d{3})', # Pattern for ARN 82 268 19: 478
-            r'A\.B\.N\.\s*(\d{11})',
-            r'\b(\d{11})\b',
-            r'(?:A\.B\.N\.:)\s*(\d{2})\s*(\d{3})\s*(\d{3})\s*(\d{3})\b'
-        ]
-        for pattern in abn_regex_patterns:
-            matches = re.findall(pattern, raw_text)
-            if matches:
-                for match in matches:
-                    abn = ''.join(match).replace(" ", "").replace("\n", "")
-                    if len(abn) == 10:
-                        # Checking raw text for a misread colon (:) and try to correct it
-                        possible_abn_match = re.search(r'ARN\s*(\d{2})\s*(\d{3})\s*(\d{2})\s*[:]\s*(\d{3})', raw_text)
-                        if possible_abn_match:
-                            # Correct the ABN by inserting '1' AFTER the colon (Mindrill case)
-                            corrected_abn = possible_abn_match.group(1) + possible_abn_match.group(
-                                2) + possible_abn_match.group(3) + "1" + possible_abn_match.group(4)
-                            abn = corrected_abn
-
-                    bank_det_entities['ABN'].append(abn)
-                break
+    if not matches:  # If no matches found, use different patterns to extract ABN
+        fallback_matches = identifier_table.matches("abn_fallback")
+        if fallback_matches:
+            # Values of the first fallback pattern that matches
+            for match in fallback_matches:
+                if match.pattern_index != fallback_matches[0].pattern_index:
+                    break
+                abn = ''.join(match.value).replace(" ", "").replace("\n", "")
+                if len(abn) == 10:
+                    # Checking raw text for a misread colon (:) and try to correct it
+                    possible_abn_match = identifier_table.first("arn")
+                    if possible_abn_match:
+                        # Correct the ABN by inserting '1' AFTER the colon (Mindrill case)
+                        groups = possible_abn_match.groups
+                        abn = groups[0] + groups[1] + groups[2] + "1" + groups[3]
+
+                bank_det_entities['ABN'].append(abn)
     raw_abns = [''.join(filter(str.isdigit, line)) for line in raw_text.split('\n') if
                 len(''.join(filter(str.isdigit, line))) == 11]
     bank_det_entities["ABN"].extend(raw_abns)
@@ -146,10 +137,9 @@ def account_number_bank_entities(raw_text, bank_det_entities):
     return bank_det_entities
 
 
-def associate_bank_entities(raw_text, bank_det_entities):
+def associate_bank_entities(raw_text, bank_det_entities, views=None):
     entities_sets = []
-    translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
-    raw_text = raw_text.translate(translator)
+    raw_text = text_views.of(raw_text, views).punctuation_stripped
     updated_bank_det_entities = {"ABN": [], "AccountNum": [], "AccountName": [], "BSB": [], "SwiftCode": [],
                                  "BankName": []}
 
@@ -172,10 +162,11 @@ def associate_bank_entities(raw_text, bank_det_entities):
     return entities_sets
 
 
-def extract_bank_details(entities,raw_text,other_fields):
+def extract_bank_details(entities,raw_text,other_fields, views=None):
+    views = text_views.of(raw_text, views)
     bank_details_placeholder = {"ABN": [], "AccountNum": [], "AccountName": [], "BSB": [], "SwiftCode": [],
                                 "BankName": []}
-    bank_dets_entities = spacy_inference.predict_bank_details(raw_text, bank_details_placeholder)
+    bank_dets_entities = spacy_inference.predict_bank_details(raw_text, bank_details_placeholder, views)
     print("ABN after inference: ", bank_dets_entities["ABN"])
     bank_dets_entities = bank_details_from_other_fields(other_fields, bank_dets_entities)
     print("ABN after other fields: ", bank_dets_entities["ABN"])
@@ -188,5 +179,5 @@ def extract_bank_details(entities,raw_text,other_fields):
     print("ABN after cleaning: ", bank_dets_entities["ABN"])
     bank_dets_entities = account_number_bank_entities(raw_text, bank_dets_entities)
     print("ABN after account number extraction: ", bank_dets_entities["ABN"])
-    associated_bank_dets = associate_bank_entities(raw_text, bank_dets_entities)
+    associated_bank_dets = associate_bank_entities(raw_text, bank_dets_entities, views)
     return bank_dets_entities,associated_bank_dets
\ No newline at end of file
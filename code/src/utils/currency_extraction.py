@@ -1,4 +1,5 @@
 import re
+from src import text_views
 
 
 def find_currency_in_response(azure_response, container_key, text_or_content):
@@ -7,7 +8,7 @@ def find_currency_in_response(azure_response, container_key, text_or_content):
     return ""
 
 
-def find_currency(azure_response, raw_text, container_key, text_or_content):
+def find_currency(azure_response, raw_text, container_key, text_or_content, views=None):
     currencies = ['AUD','USD','GBP','EUR','JPY','SGD','HKD','QAR','CNY','TWD','PLN','NZD', 'DKK', 'CAD', 'PKR', 'AED', 'EURO']
     currency_val = ""
     for currency in currencies:
@@ -27,7 +28,7 @@ def find_currency(azure_response, raw_text, container_key, text_or_content):
                 currency_val = "SAR"
 
     if not currency_val:
-        if "tapal" in raw_text.lower():
+        if text_views.of(raw_text, views).lower_index.has("tapal"):
             currency_val = "PKR"
     return currency_val
 
@@ -3,8 +3,12 @@ import hashlib
 
 
 def check_md5sum(file_path):
-    md5sum = hashlib.md5(open(file_path,'rb').read()).hexdigest()
-    return md5sum
+    # Streamed so large files are not read into memory at once
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
 
 def get_path(target_dir, file_name):
     target_dir = os.path.abspath(target_dir)
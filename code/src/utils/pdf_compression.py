@@ -0,0 +1,117 @@
+import io
+import os
+import time
+import hashlib
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import fitz
+from PIL import Image
+from src import stage_timer
+from src.response_cache import MemoryCache
+
+# PDFs are compressed by rendering every page and storing it as a JPEG, all in memory. PyMuPDF is not thread
+# safe so pages are rendered one after the other, the JPEG encoding (most of the time, Pillow releases the
+# GIL while encoding) runs in a thread pool and overlaps with the rendering of the next pages.
+PDF_COMPRESSION_WORKERS = int(os.getenv("PDF_COMPRESSION_WORKERS", "4"))
+# PDFs with at most this many bytes per page are already small and kept as they are
+PDF_COMPRESSION_SKIP_BYTES_PER_PAGE = int(os.getenv("PDF_COMPRESSION_SKIP_BYTES_PER_PAGE", str(100 * 1024)))
+PDF_COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("PDF_COMPRESSION_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+JPEG_QUALITY = 85
+
+# Compressed PDFs by md5 of the source, zoom and quality, the same split is often encoded more than once
+cache = MemoryCache(PDF_COMPRESSION_CACHE_MAX_BYTES)
+
+metrics = {"documents": 0, "skipped": 0, "cache_hits": 0, "pages": 0, "bytes_in": 0, "bytes_out": 0,
+           "seconds": 0.0}
+_metrics_lock = threading.Lock()
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        # A forked worker process inherits the pool but not its threads
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=PDF_COMPRESSION_WORKERS, thread_name_prefix="pdf-compression")
+            _executor_pid = os.getpid()
+    return _executor
+
+
+def _count(data, result, pages=0, seconds=0.0, outcome=None):
+    with _metrics_lock:
+        metrics["documents"] += 1
+        if outcome is not None:
+            metrics[outcome] += 1
+        metrics["pages"] += pages
+        metrics["bytes_in"] += len(data)
+        metrics["bytes_out"] += len(result)
+        metrics["seconds"] += seconds
+
+
+def get_metrics():
+    with _metrics_lock:
+        result = dict(metrics)
+    result["bytes_saved"] = result["bytes_in"] - result["bytes_out"]
+    result["seconds_per_page"] = round(result["seconds"] / result["pages"], 4) if result["pages"] else None
+    result["seconds"] = round(result["seconds"], 3)
+    return result
+
+
+def encode_jpeg(width, height, samples, quality=JPEG_QUALITY):
+    output = io.BytesIO()
+    Image.frombytes("RGB", [width, height], samples).save(output, "JPEG", quality=quality)
+    return output.getvalue()
+
+
+def render_pages(doc, zoom):
+    """JPEG bytes and pixel size of every page rendered at zoom, encoded in the thread pool when there is one."""
+    matrix = fitz.Matrix(zoom, zoom)
+    executor = get_executor() if PDF_COMPRESSION_WORKERS > 1 else None
+    pages = []
+    for page in doc:
+        pix = page.get_pixmap(matrix=matrix)
+        if executor is not None:
+            jpeg = executor.submit(encode_jpeg, pix.width, pix.height, pix.samples)
+        else:
+            jpeg = encode_jpeg(pix.width, pix.height, pix.samples)
+        pages.append((pix.width, pix.height, jpeg))
+    return [(width, height, jpeg.result() if executor is not None else jpeg) for width, height, jpeg in pages]
+
+
+@stage_timer.timed("compress_pdf")
+def compress(data, zoom=1, doc=None, md5=None, reuse_source=True):
+    """
+    Bytes of data (a PDF) with every page replaced by a JPEG of it. doc is the already open document of
+    data, if any. With reuse_source, a PDF under the size threshold or one that would not get smaller
+    is returned as it is.
+    """
+    with (fitz.open(stream=data, filetype="pdf") if doc is None else nullcontext(doc)) as source:
+        page_count = len(source)
+        if reuse_source and page_count and len(data) / page_count <= PDF_COMPRESSION_SKIP_BYTES_PER_PAGE:
+            _count(data, data, outcome="skipped")
+            return data
+        key = f"{md5 or hashlib.md5(data).hexdigest()}/{zoom}/{JPEG_QUALITY}/{reuse_source}"
+        compressed = cache.get(key)
+        if compressed is not None:
+            _count(data, compressed, outcome="cache_hits")
+            return compressed
+
+        start = time.perf_counter()
+        with fitz.open() as new_pdf:
+            for width, height, jpeg in render_pages(source, zoom):
+                new_page = new_pdf.new_page(width=width, height=height)
+                new_page.insert_image(new_page.rect, stream=jpeg)
+            compressed = new_pdf.tobytes(garbage=3, deflate=True, clean=True)
+        seconds = time.perf_counter() - start
+    if reuse_source and len(compressed) >= len(data):
+        compressed = data
+    cache.put(key, compressed)
+    _count(data, compressed, page_count, seconds)
+    print(f"Compressed {page_count} pages from {len(data)} to {len(compressed)} bytes "
+          f"in {seconds / max(page_count, 1):.3f}s per page")
+    return compressed
+
@@ -1,15 +1,72 @@
 import os
 import uuid
+import hashlib
+import threading
+import traceback
+import contextvars
 import fitz
 import base64
 import tabula
 import camelot
-from PIL import Image
-from src.utils import azure_utils
+from collections import OrderedDict
+from contextlib import contextmanager
+from src.utils import azure_utils, pdf_compression
 
-def get_page_count(filepath):
+class DocumentContext:
+    """
+    Facts about one input file computed at most once: the open PyMuPDF handle, the streamed md5,
+    the page count and the fonts of each page. Created once per input in process_invoice
+    and passed down instead of reopening and rereading the file in every helper.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._doc = None
+        self._md5 = None
+        self._page_fonts = {}
+
+    @property
+    def doc(self):
+        if self._doc is None:
+            self._doc = fitz.open(self.path)
+        return self._doc
+
+    @property
+    def page_count(self):
+        return self.doc.page_count
+
+    @property
+    def md5(self):
+        if self._md5 is None:
+            md5 = hashlib.md5()
+            with open(self.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    md5.update(chunk)
+            self._md5 = md5.hexdigest()
+        return self._md5
+
+    def page_fonts(self, page_num):
+        if page_num not in self._page_fonts:
+            self._page_fonts[page_num] = self.doc.load_page(page_num).get_fonts()
+        return self._page_fonts[page_num]
+
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def get_page_count(filepath, document=None):
     # pdf = PdfFileReader(open(filepath,'rb'))
     # page_count = pdf.getNumPages()
+    if document is not None:
+        return document.page_count
     doc = fitz.open(filepath)
     count = doc.page_count
     doc.close()
@@ -41,10 +98,18 @@ def convert_pdf_to_image(pdf_path):
         return pdf_to_image_converter(pdf_path)
 
 
-def compress_pdf(pdf_path, zoom=1, replace=True, file_id=None, correlation_id=None):
+def read_compressed_pdf(pdf_path, zoom=1, document=None, reuse_source=True):
+    """Bytes of the PDF compressed in memory (see pdf_compression), the open document is reused when given."""
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+    if document is None:
+        return pdf_compression.compress(data, zoom, reuse_source=reuse_source)
+    return pdf_compression.compress(data, zoom, document.doc, document.md5, reuse_source=reuse_source)
+
+
+def compress_pdf(pdf_path, zoom=1, replace=True, file_id=None, correlation_id=None, document=None):
     # Normalize path separators for the OS
     pdf_path = os.path.normpath(pdf_path)
-    temp_pdf_path = os.path.normpath(pdf_path.replace(".pdf", "_compressed.pdf"))
     # Create a truly unique temp path in same directory
     temp_dir = os.path.dirname(pdf_path)
     temp_name = f"temp_{uuid.uuid4().hex}.pdf"
@@ -52,34 +117,12 @@ def compress_pdf(pdf_path, zoom=1, replace=True, file_id=None, correlation_id=No
     compressed_paths = {'local': None, 'azure': None}
 
     try:
-        with fitz.open(pdf_path) as pdf_document:
-            print("Successfully opened source PDF")
-            with fitz.open() as new_pdf:
-                print("Created new PDF object")
-                for page_num in range(len(pdf_document)):
-                    page = pdf_document.load_page(page_num)
-                    # Create a pixmap with reduced resolution and compression
-                    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))  # Reduce to 85% resolution
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-
-                    # Create temporary image file with compression
-                    temp_img_path = os.path.join(temp_dir, f"temp_img_{uuid.uuid4().hex}.jpg")
-                    img.save(temp_img_path, "JPEG", quality=85)  # Adjust quality (1-100) to balance size/quality
-
-                    # Add compressed image to new PDF
-                    new_page = new_pdf.new_page(width=pix.width, height=pix.height)
-                    new_page.insert_image(new_page.rect, filename=temp_img_path)
-
-                    # Clean up temporary image
-                    os.remove(temp_img_path)
-                    print(f"Processed page {page_num + 1}")
-
-                print(f"Attempting to save to {temp_pdf_path}")
-                # Save with compression
-                new_pdf.save(temp_pdf_path, garbage=3, deflate=True, clean=True)
-                print("Successfully saved temp PDF")
-
-        print("All PDF objects closed")
+        # Replacing rewrites the file as rendered pages even when it is small, it is how unreadable PDFs are repaired
+        compressed = read_compressed_pdf(pdf_path, zoom, document, reuse_source=not replace)
+        print(f"Attempting to save to {temp_pdf_path}")
+        with open(temp_pdf_path, "wb") as f:
+            f.write(compressed)
+        print("Successfully saved temp PDF")
         if replace is True:
             # Replace original with temp file
             if os.path.exists(temp_pdf_path):
@@ -108,12 +151,12 @@ def compress_pdf(pdf_path, zoom=1, replace=True, file_id=None, correlation_id=No
         raise e
 
 
-def split_pdfs(filepath, output_folder, split_points):
+def split_pdfs(filepath, output_folder, split_points, document=None):
     print("Split points: ", split_points)
     split_pdfs_paths = []
     filename = filepath.split("/")[-1].split("\\")[-1]
     start = 0
-    doc = fitz.open(filepath)
+    doc = fitz.open(filepath) if document is None else document.doc
     for i, sp in enumerate(split_points):
         if "pdf" in filename:
             split_filename = filename.replace(".pdf", "_" + str(i + 1) + ".pdf")
@@ -135,21 +178,99 @@ def split_pdfs(filepath, output_folder, split_points):
     return split_pdfs_paths
 
 
-def base64_encode(pdf, final_processing, file_id=None, correlation_id=None):
-    compressed_file_path = None
+def read_document(pdf, final_processing, document=None):
+    """Bytes of the document as it goes in the response, the compressed PDF when processing is final."""
     if pdf[-4:].lower() == ".pdf" and final_processing is True:
-        compressed_pdf = compress_pdf(pdf, replace=False, file_id=file_id, correlation_id=correlation_id)
-        pdf = compressed_pdf['local']
-        if file_id is not None:
-            compressed_file_path = compressed_pdf['azure']
+        # Compressed in memory, the compressed PDF is only uploaded, never written to disk
+        return read_compressed_pdf(pdf, document=document)
     with open(pdf, "rb") as pdf_file:
-        encoded_string = base64.b64encode(pdf_file.read()).decode('utf-8')
+        data = pdf_file.read()
     if "temp_" in pdf:
         os.remove(pdf)
+    return data
+
+
+def base64_encode(pdf, final_processing, file_id=None, correlation_id=None, document=None):
+    compressed_file_path = None
+    data = read_document(pdf, final_processing, document)
+    if pdf[-4:].lower() == ".pdf" and final_processing is True and file_id is not None:
+        azure_file_url, compressed_file_path = azure_utils.upload_file_on_azure(data, file_id, correlation_id,
+                                                                                "compressed_output")
+    encoded_string = base64.b64encode(data).decode('utf-8')
 
     return encoded_string, compressed_file_path
 
 
+# "inline" embeds the document of every response as base64 (invoiceB64Data), "reference" uploads it once under
+# its md5 and only embeds its blob path, size and md5 (invoiceDocument), see the /invoice_document endpoint
+INVOICE_OUTPUT_MODE = os.getenv("INVOICE_OUTPUT_MODE", "inline").lower()
+OUTPUT_MODES = ("inline", "reference")
+DOCUMENTS_FOLDER = "documents"
+MAX_REMEMBERED_UPLOADS = 1024
+
+_output_mode = contextvars.ContextVar("invoice_output_mode", default=None)
+_uploaded_documents = OrderedDict()
+_uploaded_documents_lock = threading.Lock()
+
+
+@contextmanager
+def output_mode(mode):
+    """Output mode of the documents encoded inside the with block, INVOICE_OUTPUT_MODE when mode is None."""
+    if mode is not None and mode not in OUTPUT_MODES:
+        raise ValueError(f"Unsupported output mode: {mode}")
+    token = _output_mode.set(mode)
+    try:
+        yield
+    finally:
+        _output_mode.reset(token)
+
+
+def get_output_mode():
+    return _output_mode.get() or INVOICE_OUTPUT_MODE
+
+
+def upload_document(data):
+    """Uploads the document under its md5, once per process, and returns its invoiceDocument reference."""
+    md5 = hashlib.md5(data).hexdigest()
+    with _uploaded_documents_lock:
+        reference = _uploaded_documents.get(md5)
+    if reference is None:
+        blob_url, blob_path = azure_utils.upload_file_on_azure(data, md5, DOCUMENTS_FOLDER, "invoice_document")
+        if blob_path is None:
+            # upload_file_on_azure returns the error message instead of the URL when the upload fails
+            raise RuntimeError(blob_url)
+        reference = {"blobPath": blob_path, "size": len(data), "md5": md5}
+        with _uploaded_documents_lock:
+            _uploaded_documents[md5] = reference
+            while len(_uploaded_documents) > MAX_REMEMBERED_UPLOADS:
+                _uploaded_documents.popitem(last=False)
+    return dict(reference)
+
+
+def download_document(md5):
+    return azure_utils.download_blob_content(azure_utils.CONTAINER_MAPPING["invoice_document"],
+                                             f"{DOCUMENTS_FOLDER}/{md5}.pdf")
+
+
+def encode_document(pdf, final_processing, file_id=None, correlation_id=None, document=None):
+    """Response keys of the document: invoiceB64Data (inline) or invoiceDocument, and compressedFilePath."""
+    if get_output_mode() == "inline":
+        encoded_string, compressed_file_path = base64_encode(pdf, final_processing, file_id, correlation_id, document)
+        return {"invoiceB64Data": encoded_string, "compressedFilePath": compressed_file_path}
+    data = read_document(pdf, final_processing, document)
+    try:
+        reference = upload_document(data)
+    except Exception:
+        print(traceback.format_exc())
+        # The document stays in the response when it cannot be uploaded
+        return {"invoiceB64Data": base64.b64encode(data).decode('utf-8'), "compressedFilePath": None}
+    # The referenced upload is the compressed output as well, the PDF is not uploaded a second time
+    compressed_file_path = None
+    if pdf[-4:].lower() == ".pdf" and final_processing is True and file_id is not None:
+        compressed_file_path = reference["blobPath"]
+    return {"invoiceDocument": reference, "compressedFilePath": compressed_file_path}
+
+
 def extract_adj_no(filename):
     area = (82, 690, 82+82, 690+130)
     tables = tabula.read_pdf(filename, pages=1, area=area, guess=False)
@@ -201,15 +322,19 @@ def extract_employee_ids(filename):
         return []
 
 
-def get_fonts(pdf_path):
-    doc = fitz.open(pdf_path)
-    fonts = [page.get_fonts() for page in doc]
+def get_fonts(pdf_path, document=None):
+    # Only the first page decides whether the document is scanned
+    if document is None:
+        with fitz.open(pdf_path) as doc:
+            fonts = doc.load_page(0).get_fonts()
+    else:
+        fonts = document.page_fonts(0)
     print("Fonts: ", fonts)
-    return fonts[0]
+    return fonts
 
 
-def check_scanned(pdf_path):
-    fonts = get_fonts(pdf_path)
+def check_scanned(pdf_path, document=None):
+    fonts = get_fonts(pdf_path, document)
     if fonts:
         print("Likely a machine-generated PDF")
         return False
@@ -1,6 +1,7 @@
 from google.cloud import translate_v3beta1 as translate
 import os
 from PIL import Image
+from src import resources
 from src.utils import azure_utils
 import json
 import img2pdf
@@ -16,8 +17,10 @@ def set_google_application_credentials():
         temp_file.write(json.dumps(google_credentials))
 
     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_file.name
+    return temp_file.name
 
-set_google_application_credentials()
+# Fetched from Key Vault the first time a document is translated
+google_credentials = resources.register("google.credentials", set_google_application_credentials)
 PROJECT_ID = "core-parsec-423823-m6"
 
 def remove_text_layer(input_pdf, output_pdf):
@@ -55,6 +58,7 @@ def translate_document(file_path: str):
     else:
         remove_text_layer(file_path, file_path)
 
+    google_credentials.get()
     client = translate.TranslationServiceClient()
     parent = f"projects/{PROJECT_ID}/locations/global"
 
@@ -2,7 +2,7 @@ import re
 import json
 import requests
 import backoff
-from src import mapping_utils
+from src import mapping_utils, keywords, text_views, stage_timer
 from src.ner import spacy_inference
 from src.utils import helper
 
@@ -10,10 +10,11 @@ from src.utils import helper
 SHIPMENT_NUM_LABEL = ['delivery docket', 'shipper number', 'delivery no']
 
 
-def populate_shipment_number(azure_response, other_fields, raw_text, version):
+def populate_shipment_number(azure_response, other_fields, raw_text, version, views=None):
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
 
-    if "mitsubishi" in raw_text.lower():
+    text_index = text_views.of(raw_text, views).lower_index
+    if text_index.has("mitsubishi"):
         matched_labels = [label for label in SHIPMENT_NUM_LABEL if label in other_fields]
 
         if matched_labels:
@@ -27,7 +28,7 @@ def populate_shipment_number(azure_response, other_fields, raw_text, version):
                     text_or_content: delivery_number
                 }
         else:
-            if "shipment" in raw_text.lower():
+            if text_index.has("shipment"):
                 # Prioritizing to check the S00 9-digit number first
                 match_s00 = re.search(r'\bS00\d{6}\b', raw_text)
                 if match_s00:
@@ -47,8 +48,8 @@ def populate_shipment_number(azure_response, other_fields, raw_text, version):
                             "valueString": shipment_number,
                             text_or_content: shipment_number
                         }
-    elif "costco" in raw_text.lower():
-        if "visy" in raw_text.lower() and "packaging" in raw_text.lower():
+    elif text_index.has("costco"):
+        if text_index.has_all(["visy", "packaging"]):
             if "InvoiceId" in azure_response['analyzeResult'][container_key][0]['fields']:
                 invoice_id = azure_response['analyzeResult'][container_key][0]['fields']["InvoiceId"]
                 azure_response['analyzeResult'][container_key][0]['fields']["ShipmentNumber"] = {
@@ -60,9 +61,9 @@ def populate_shipment_number(azure_response, other_fields, raw_text, version):
     return azure_response
 
 
-def populate_dc_num(azure_response, raw_text, version):
+def populate_dc_num(azure_response, raw_text, version, views=None):
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
-    if 'tapal' in raw_text.lower() and 'dc no' in raw_text.lower():
+    if text_views.of(raw_text, views).lower_index.has_all(['tapal', 'dc no']):
         if 'Items' in azure_response['analyzeResult'][container_key][0]['fields']:
             for item in azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray']:
                 content = item[text_or_content]
@@ -171,12 +172,12 @@ def populate_invoice_total_from_items(azure_response):
     return azure_response
 
 
-def populate_contract_num(azure_response, raw_text, other_fields, version):
+def populate_contract_num(azure_response, raw_text, other_fields, version, views=None):
     """
         Populating the contract ID from regex pattern incase if it is not predicted by the model but present in the invoice.
         """
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
-    contract_num = spacy_inference.predict_contract_num(raw_text)
+    contract_num = spacy_inference.predict_contract_num(raw_text, views)
     if "palm trace lic" in other_fields:
         license_num = other_fields["palm trace lic"][0]
         if contract_num == license_num:
@@ -244,18 +245,17 @@ def populate_contract_num(azure_response, raw_text, other_fields, version):
     return azure_response
 
 
-def populate_account_number(azure_response, other_fields, raw_text, version):
+def populate_account_number(azure_response, other_fields, raw_text, version, views=None):
     # Get structure details based on version
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
-    vendor_list = ["agl", "origin", "telstra", "energy intelligence", "energy australia"]
-    raw_text_lower = re.sub(r'([a-z])([A-Z])', r'\1 \2', raw_text.replace("\n", " ")).lower()
+    text_index = text_views.of(raw_text, views).camel_split_index
     # Check if any vendor from vendor_list and 'mitsubishi' are both present
-    vendor_found = any(vendor in raw_text_lower for vendor in vendor_list)
-    mitsubishi_found = 'mitsubishi' in raw_text_lower
+    vendor_found = text_index.has_any(keywords.ACCOUNT_NUMBER_VENDORS)
+    mitsubishi_found = text_index.has('mitsubishi')
     # Only proceed if both a vendor name AND 'mitsubishi' are found in the raw text
     if vendor_found and mitsubishi_found:
         print("Both vendor and 'mitsubishi' found, proceeding with account number extraction...")
-        account_num = spacy_inference.predict_account_num(raw_text)
+        account_num = spacy_inference.predict_account_num(raw_text, views)
         if account_num:
             if "/" in account_num:
                 account_num = account_num.replace(" ", "").split("/")[0][:10]
@@ -332,6 +332,7 @@ def get_unspsc_response(items_list):
     return unspsc_response
 
 
+@stage_timer.timed("unspsc")
 def populate_unspsc_code(azure_response, version):
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
     items_list = []
@@ -1,7 +1,8 @@
 import os
 import datetime
 import re
-from src import mapping_utils, font_size_estimation
+from src import mapping_utils, keywords, identifiers, text_views, invoice_model, rules
+from src import layout as layout_analysis
 from src.ner import spacy_inference
 from src.utils import validation_populater
 from datetime import datetime
@@ -14,33 +15,7 @@ log_filename = os.path.join(log_folder, "sc_app.log")
 # sys.stdout = log_writer
 
 MANDATORY_FIELDS = ["PurchaseOrder", "ABN"]
-NOT_AN_INVOICE_LABELS = [["gb electrical contractors pty ltd", "gas maintenance sheet", "equipment details",
-                          "inspection details"],
-                         ["timesheet", "week ending sunday", "minutes", "monday", "tuesday", "wednesday", "thursday",
-                          "friday","consultant"],
-                         ["order form – support services"],
-                         ["statement of certification", "certification"], ["safe handl", "this product was prepar"],
-                         ['copy of legal services order'],
-                         ['company statement'], ['delivery docket','job','order'], ['financial terms'],
-                         ['delivery docket','material'],
-                         ['timesheet','day','night','time on', 'time off'],
-                         ['timesheet','start work','finish work'],
-                         ['timesheet','actual hours','start','finish','day worked'],
-                         ['rental agreement','rental','return address','return hours'],
-                         ['statement of hazardous nature','emergency overview'],
-                         ['timesheet','start', 'finish','total hrs'],
-                         ['delivery challan'],
-                         ['timesheet','dayshift','nightshift'],
-                         ['transmission certificate'],
-                         ['service report', 'work order number', 'job complete'],
-                         ['guest folio','name','room'],
-                         ['terms and conditions for purchase orders'],
-                         ['debit note'],
-                         ['quotation', 'repair advice form', 'description of components to be repaired'],
-                         ['email cover sheet', 'email address'],
-                         ['statement of account','std terms', 'dsb terms'],
-                         ['agency agreement', "between", "pact"],
-                         ['order confirmation', 'order no', 'order date', 'order line']]
+NOT_AN_INVOICE_LABELS = keywords.NOT_AN_INVOICE_LABELS
 
 CREDIT_NOTE_NUM_LABELS = ['tax adjustment note number', 'credit no', 'credit note no','adjustment number','tax credit','adjustment note','credit memo', 'invoice number','invoice no','tax invoice number', 'credit note']
 
@@ -59,55 +34,46 @@ def get_missing_fields(json_data,version):
     return missing_fields
 
 
-def get_invoice_num_index(text):
+def get_invoice_num_index(text, views=None):
     invoice_num_synonyms = ["tax invoice number", "tax invoice no", "invoice number", "invoice no", "document id",
                             "document no"]
+    text = text_views.of(text, views).lower
     for syn in invoice_num_synonyms:
-        try:
-            index = text.lower().index(syn)
-            # print(syn)
+        index = text.find(syn)
+        if index > -1:
             return index
-        except ValueError:
-            pass
     return -1
 
 
-def get_purchase_order_index(text):
+def get_purchase_order_index(text, views=None):
     po_synonyms = ["purchase order", "po", "order id", "reference", "ref"]
+    text = text_views.of(text, views).lower
     for syn in po_synonyms:
-        try:
-            index = text.lower().index(syn)
-            # print(syn)
+        index = text.find(syn)
+        if index > -1:
             return index
-        except ValueError:
-            pass
     return -1
 
 
-def get_dates_index(text):
-    invoice_date_index = -1
-    due_date_index = -1
-    try:
-        invoice_date_index = text.lower().index("invoice date")
-    except:
-        pass
-    try:
-        due_date_index = text.lower().index("due date")
-    except:
-        pass
-    return invoice_date_index, due_date_index
+def get_dates_index(text, views=None):
+    text = text_views.of(text, views).lower
+    return text.find("invoice date"), text.find("due date")
 
 
-def validate_ner_fields(text, entities, logger):
+def validate_ner_fields(text, entities, logger, views=None, line_index=None):
+    """
+    Drops NER entities found more than 20 characters away from their label. With the line_index of
+    the text, the entities that are kept get the boundingRegions of the lines they were found in.
+    """
     if "InvoiceNum" in entities:
-        invoice_num_index = get_invoice_num_index(text)
+        invoice_num_index = get_invoice_num_index(text, views)
         # print("Invoice num index: ", invoice_num_index)
         if invoice_num_index > -1:
             if abs((invoice_num_index - int(entities["InvoiceNum"]["start"]))) > 20:
                 logger.info("Deleting entity: invoice number")
             del entities["InvoiceNum"]
     if "PO" in entities:
-        po_index = get_purchase_order_index(text)
+        po_index = get_purchase_order_index(text, views)
         # print("PO index: ", po_index)
         # print("PO entity index: ", entities["PO"]["start"])
         if po_index > -1:
@@ -115,7 +81,7 @@ def validate_ner_fields(text, entities, logger):
                 logger.info("Deleting entity: PO")
                 del entities["PO"]
 
-    invoice_date_index, due_date_index = get_dates_index(text)
+    invoice_date_index, due_date_index = get_dates_index(text, views)
     # print("Invoice date index: ", invoice_date_index)
     # print("Due date index: ", due_date_index)
     if "InvoiceDate" in entities:
@@ -130,30 +96,24 @@ def validate_ner_fields(text, entities, logger):
                 logger.info("Deleting entity: DueDate")
                 del entities["DueDate"]
 
+    if line_index is not None:
+        for entity in entities.values():
+            entity["boundingRegions"] = line_index.locate(int(entity["start"]),
+                                                          int(entity["start"]) + len(entity["text"]))
     return entities
 
 
 def populate_ntn_strn(raw_text, tapal_entities, version):
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
 
-    # Define multiple NTN patterns for 0709631-3 or 34-01-0712331-7 or 071-2331-7
-    ntn_patterns = [
-        r'\b\d{5,7}-\d{1}\b',
-        r'\b\d{1,3}-\d{4}-\d{0,1}-\d{1}\b',
-        r'\b\d{1,3}-\d{4}-\d{0,1}-\d{1,}\b'
-    ]
-
-    strn_pattern = r'\b\d{2}-\d{2}-\d{4}-\d{3,}-\d{2}\b'
-
-    ntn_numbers = set()  # Removing duplicates
-    for pattern in ntn_patterns:
-        matches = re.findall(pattern, raw_text)
-        ntn_numbers.update(matches)
+    # NTN patterns for 0709631-3 or 34-01-0712331-7 or 071-2331-7, see identifiers.NTN_PATTERNS
+    identifier_table = identifiers.extract(raw_text)
+    ntn_numbers = set(identifier_table.values("ntn"))  # Removing duplicates
 
     # Remove NTN numbers without hyphens
     ntn_numbers = [number for number in ntn_numbers if '-' in number]
 
-    strn_numbers = list(set(re.findall(strn_pattern, raw_text)))
+    strn_numbers = list(set(identifier_table.values("strn")))
 
     print("NTN:", ntn_numbers)
     print("STRN:", strn_numbers)
@@ -167,7 +127,7 @@ def populate_ntn_strn(raw_text, tapal_entities, version):
     return tapal_entities
 
 def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_synonyms, other_fields, missing_fields,
-                fr_field_to_entity_mapping,version):
+                fr_field_to_entity_mapping,version, views=None):
     original_po = None
     potential_po = []
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
@@ -214,31 +174,15 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
                     text_or_content: entities[fr_field_to_entity_mapping[field]]['text']
                 }
 
-    raw_text = raw_text.lower()
-    if any(keyword in raw_text.lower() for keyword in ["tafe", "t.a.f.e", "ryde", "hunter institute of technology", "hunter inst of technology", "hunter tafe - kumi kumi", "kurri kurri campus", "technical & further education commission", "northern sydney institute", "technical and further education","coffs harbour education campus","campbelltown college of t","sydney institute of technology", "89755348137"]):
-        regexes = [
-            r'\b700(?:[\s-]?\d{4,7})\b',  # original pattern
-            r'\b700\d{4,7}-\d{3}\b',  # new pattern to match "7000064-353"
-            'PO700\d{7}' ,#new pattern to match PO7000065802
-            r'\b700\d{3}/\d{3}\b', #pattern to match 700007/631
-            r'\bP/O700\d{7}\b',  # Match "P/O7000078201"
-            r'\b700\d{3}\s?\d{4}\b' ,#pattern to match 700008 5519
-            r'\b760\d{4,7}\b',  # New pattern to match 760xxxxxxx
-            r'\b70000\s?\d{5}\b', # pattern to match 70000 84057 or 70000 85361
-            r'\b70000[\s-]?\d{2}[\s-]?\d{2}[\s-]?\d{1}\b', # Pattern to match "70000 85 36 1"
-            r'\b700\s?\d{3}\s?\d{4}\b', # pattern to match "700 008 5528"
-            r'\bBAKERY700\d{7}\b', # pattern to extract "BAKERY7000085007"
-            r'\bP\.O700\d{7}\b', # pattern to extract "P.O7000066269"
-            r'\b700\d{7}p/o\b'  # Match "7000085855p/o"
-
-        ]
-
-        seven_sth_matching_po = []
-        for regex in regexes:
-            seven_sth_matching_po.extend(re.findall(regex, raw_text, re.IGNORECASE))
+    views = text_views.of(raw_text, views)
+    text_index = views.lower_index
+    single_line_index = views.single_line_index
+    raw_text = views.lower
+    if text_index.has_any(keywords.TAFE_KEYWORDS):
+        # PO numbers starting with 700, see identifiers.TAFE_PO_PATTERNS
+        seven_sth_matching_po = identifiers.extract(raw_text).values("tafe_po")
         if not seven_sth_matching_po:
-            for regex in regexes:
-                seven_sth_matching_po.extend(re.findall(regex, raw_text_without_spaces))
+            seven_sth_matching_po = identifiers.extract(raw_text_without_spaces).values("tafe_po_case_sensitive")
 
         potential_po.extend(seven_sth_matching_po)
 
@@ -274,7 +218,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
                 po_text = next((po for po in unique_potential_po if
                                 po.replace(" ", "").startswith("700") and len(po.replace(" ", "")) == 10), po_text)
             else:
-                if "supagas" in raw_text.lower():
+                if text_index.has("supagas"):
                     po_text = next((po for po in unique_potential_po if
                                     po.replace(" ", "").startswith("700") and len(po.replace(" ", "")) == 9), po_text)
             if po_text is None:
@@ -294,8 +238,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
         azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"][text_or_content].startswith('700'):
             del (azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"])
 
-    updated_raw_text = raw_text.replace("\n", " ").lower()
-    if "talison lithium" in updated_raw_text:
+    if single_line_index.has("talison lithium"):
         if "PurchaseOrder" in azure_response['analyzeResult'][container_key][0]['fields']:
             po_pattern = r'PU\d+'    # pattern to match PU followed by one or more digits for Talison Lithium
             match = re.search(po_pattern, raw_text)
@@ -308,7 +251,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
                 azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"][text_or_content] = po_text
                 azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"][
                     "valueString"] = po_text
-    if "macmahon" in updated_raw_text or "tmm group" in updated_raw_text or " t m m group" in updated_raw_text or "strong minds strong mines" in updated_raw_text or "sandvik" in updated_raw_text:
+    if single_line_index.has_any(["macmahon", "tmm group", " t m m group", "strong minds strong mines", "sandvik"]):
         # if "PurchaseOrder" in azure_response['analyzeResult']['documentResults'][0]['fields']:
         po_pattern = r'\b450\d{0,3}\s?\d{6}\b'
         match = re.search(po_pattern, raw_text)
@@ -316,7 +259,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
             po_number = match.group()
             po_number = re.sub(r'\s', '', po_number)
             if len(po_number) > 10:
-                if "westrac" in updated_raw_text and po_number.endswith('0'):
+                if single_line_index.has("westrac") and po_number.endswith('0'):
                     po_number = po_number.rstrip('0')
                 else:
                     po_number = po_number[:10]
@@ -331,7 +274,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
         if "PurchaseOrder" in azure_response['analyzeResult'][container_key][0]['fields'] and not azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"][text_or_content].startswith('45'):
             del (azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"])
 
-    if "ip australia" in updated_raw_text:
+    if single_line_index.has("ip australia"):
         lot_pattern = r'\blot - \d{5}\b'
         c_pattern = r'\bc\d{4}/\d{5}\b'
         lex_pattern = r'\blex \d{4}\b'
@@ -346,7 +289,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
                 azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"]["valueString"] = \
             potential_pos[0]
 
-    if "tapal" in updated_raw_text:
+    if single_line_index.has("tapal"):
         po_pattern = r'\b4500\d{1}\s*\d{5}\b'
         matches = re.findall(po_pattern, raw_text)
         if matches:
@@ -377,7 +320,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
         azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"][text_or_content].startswith('45'):
             del (azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"])
 
-    if "7-eleven" in updated_raw_text:
+    if single_line_index.has("7-eleven"):
         po_pattern = r'\b455\d{7}\b'
         match = re.search(po_pattern, raw_text)
         if match:
@@ -390,7 +333,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
             azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"][
             "valueString"] = po_number
 
-    if ("mitsubishi" in updated_raw_text or "mmal parts & accessories" in updated_raw_text) and "tafe" not in updated_raw_text:
+    if single_line_index.has_any(["mitsubishi", "mmal parts & accessories"]) and not single_line_index.has("tafe"):
         po_pattern = r'4500\d{6}'
         matches = re.findall(po_pattern, raw_text)
         if matches:
@@ -415,7 +358,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
                 azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"]["valueString"] = po_number
                 azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"]["potential"] = []
             else:
-                if "Items" in azure_response['analyzeResult'][container_key][0]['fields'] and ('commercial invoice' not in raw_text.lower() and 'sundry' not in raw_text.lower()):
+                if "Items" in azure_response['analyzeResult'][container_key][0]['fields'] and not text_index.has_any(['commercial invoice', 'sundry']):
                     line_items = azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray']
                     po_numbers = []
                     for item in line_items:
@@ -452,7 +395,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
             if not (po_number.startswith('45') or po_number.startswith('00703') or po_number.startswith('703') or po_number.startswith('AA') or po_number.startswith('704')):
                 del azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"]
 
-    if "adcb" in updated_raw_text:
+    if single_line_index.has("adcb"):
         po_pattern = r'4500\d{6}'
         matches = re.findall(po_pattern, raw_text)
         if matches:
@@ -467,7 +410,7 @@ def populate_po(azure_response, raw_text, raw_text_without_spaces, entities, po_
     return azure_response
 
 
-def validate_po(azure_response, raw_text, version):
+def validate_po(azure_response, raw_text, version, views=None):
     non_po_keywords = ["unknown", "INV", "number", "box", "SCTASK", "Page"]
     deleted = False
     container_key, text_or_content, value_type= mapping_utils.get_version_structure(version)
@@ -503,7 +446,7 @@ def validate_po(azure_response, raw_text, version):
             if any(kw in po_text for kw in non_po_keywords):
                 del (azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"])
                 deleted = True
-            if "dicetek" in raw_text.lower() and po_text.startswith("IT"):
+            if text_views.of(raw_text, views).lower_index.has("dicetek") and po_text.startswith("IT"):
                 del (azure_response['analyzeResult'][container_key][0]['fields']["PurchaseOrder"])
                 deleted = True
         else:
@@ -574,9 +517,9 @@ def validate_customer_address(azure_response, blocks_list, address_kind,version)
                                 "valueString"] = custom_addr + " " + rest_addr
     return azure_response
 
-def populate_employee_id(azure_response, raw_text,version,employee_ids):
+def populate_employee_id(azure_response, raw_text,version,employee_ids, views=None):
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
-    if 'tapal' in raw_text.lower() and 'employee id' in raw_text.lower():
+    if text_views.of(raw_text, views).lower_index.has_all(['tapal', 'employee id']):
         if 'Items' in azure_response['analyzeResult'][container_key][0]['fields']:
             for item in azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray']:
                 items = azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray']
@@ -698,7 +641,7 @@ def validate_supplier_name(azure_response,version, detected_language):
     return azure_response
 
 
-def validate_invoice_num(azure_response, other_fields, version, raw_text, final_processing):
+def validate_invoice_num(azure_response, other_fields, version, raw_text, final_processing, views=None):
     """
     Cleaning invoice number from form recognizer
     in some cases, form recognizer is sending invoice number twice e.g. 2237906 2237906
@@ -724,7 +667,7 @@ def validate_invoice_num(azure_response, other_fields, version, raw_text, final_
             updated_invoice_text = invoice_id_text.replace(" ", "")
             updated_invoice_text = updated_invoice_text.replace(":", "")
         # Trimming leading zeros for Macmahon only
-        if ("macmahon" in raw_text.lower() or "tmm group" in raw_text.lower()) and (final_processing is True):
+        if text_views.of(raw_text, views).lower_index.has_any(["macmahon", "tmm group"]) and (final_processing is True):
             updated_invoice_text = updated_invoice_text.lstrip('0')
         azure_response['analyzeResult'][container_key][0]['fields']["InvoiceId"][text_or_content] = updated_invoice_text
         azure_response['analyzeResult'][container_key][0]['fields']["InvoiceId"][
@@ -955,10 +898,11 @@ def validate_invoice_date(azure_response,other_fields,version):
     return azure_response
 
 
-def validate_numeric_field(azure_response, numeric_field,version):
-    container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
-    if numeric_field in azure_response['analyzeResult'][container_key][0]['fields']:
-        field_text = azure_response['analyzeResult'][container_key][0]['fields'][numeric_field][text_or_content]
+def validate_numeric_field(azure_response, numeric_field,version, invoice=None):
+    invoice = invoice_model.of(azure_response, version, invoice)
+    field = invoice.get(numeric_field)
+    if field is not None:
+        field_text = field.text
         if isinstance(field_text, int) or isinstance(field_text, float): # Resolved TypeError to check type before subscripting field_text variable
             field_text = str(field_text)
         if field_text and field_text[-1] == "-":
@@ -974,7 +918,7 @@ def validate_numeric_field(azure_response, numeric_field,version):
                 except ValueError as e:
                     pass
 
-            azure_response = mapping_utils.set_currency(azure_response, version, numeric_field, updated_field_number, updated_field_text)
+            invoice.set_amount(numeric_field, updated_field_number, updated_field_text)
 
     return azure_response
 
@@ -997,20 +941,18 @@ def validate_line_item_quantity(azure_response, version):
     return azure_response
 
 
-def validate_line_items(azure_response, version, final_processing):
+def validate_line_items(azure_response, version, final_processing, invoice=None):
     if final_processing is True:
         indexes_to_delete = []
-        container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
+        invoice = invoice_model.of(azure_response, version, invoice)
         item_content_and_fields = defaultdict(lambda: {"content": "", "fields": []})
-        if "Items" in azure_response['analyzeResult'][container_key][0]['fields']:
-            for i, value_array in enumerate(
-                    azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray']):
-                if "content" in value_array:
-                    item_content_and_fields[i]["content"] = value_array["content"]
-                if "valueObject" in value_array:
-                    item_content_and_fields[i]["fields"] = list(value_array["valueObject"].keys())
-                    if (not "Description" in value_array["valueObject"]) and (not "Quantity" in value_array["valueObject"]):
-                        indexes_to_delete.append(i)
+        for i, value_array in enumerate(invoice.items):
+            if "content" in value_array:
+                item_content_and_fields[i]["content"] = value_array["content"]
+            if "valueObject" in value_array:
+                item_content_and_fields[i]["fields"] = list(value_array["valueObject"].keys())
+                if (not "Description" in value_array["valueObject"]) and (not "Quantity" in value_array["valueObject"]):
+                    indexes_to_delete.append(i)
 
         print(item_content_and_fields)
 
@@ -1036,143 +978,91 @@ def validate_line_items(azure_response, version, final_processing):
                 if include:
                     indexes_to_delete.append(k)
 
-        indexes_to_delete = set(list(indexes_to_delete))
-        for idx in sorted(indexes_to_delete, reverse=True): # Delete in reverse order so you don't throw off the subsequent indexes
-            del azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][idx]
+        if indexes_to_delete:
+            invoice.delete_items(indexes_to_delete)
 
     return azure_response
 
 
-def validate_line_item_amounts(azure_response,version):
-    container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
-    if "Items" in azure_response['analyzeResult'][container_key][0]['fields']:
-        for i, value_array in enumerate(
-                azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray']):
-            if "valueObject" in value_array:
-                if "Amount" in value_array["valueObject"]:
-                    # print(value_array["valueObject"]["Amount"]["text"])
-                    field_text = str(value_array["valueObject"]["Amount"][text_or_content])
-                    if field_text[-1] == "-" and (
-                            isinstance(field_text[:-1], int) or isinstance(field_text[:-1], float)):
-                        updated_field_text = "-" + field_text[:-1]
-                        azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                            "valueObject"]["Amount"][text_or_content] = updated_field_text
-                        try:
-                            azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                "valueObject"]["Amount"][value_type] = int(updated_field_text)
-                        except ValueError as e:
-                            azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                "valueObject"]["Amount"][value_type] = float(
-                                updated_field_text)
+def validate_line_item_amounts(azure_response,version, invoice=None):
+    invoice = invoice_model.of(azure_response, version, invoice)
+    text_or_content, value_type = invoice.text_key, invoice.value_key
+    for item in invoice.items:
+        if "valueObject" in item:
+            if "Amount" in item["valueObject"]:
+                amount = item["valueObject"]["Amount"]
+                field_text = str(amount[text_or_content])
+                if field_text[-1] == "-" and (
+                        isinstance(field_text[:-1], int) or isinstance(field_text[:-1], float)):
+                    updated_field_text = "-" + field_text[:-1]
+                    amount[text_or_content] = updated_field_text
+                    try:
+                        amount[value_type] = int(updated_field_text)
+                    except ValueError as e:
+                        amount[value_type] = float(updated_field_text)
 
     return azure_response
 
 
-def validate_quantity_for_packing_invoices(azure_response, version):
-    container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
+def validate_quantity_for_packing_invoices(azure_response, version, invoice=None):
+    invoice = invoice_model.of(azure_response, version, invoice)
     supplier_name = None
-    if "Items" in azure_response['analyzeResult'][container_key][0]['fields'] and "VendorName" in azure_response['analyzeResult'][container_key][0]['fields']:
-        items = azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray']
-        supplier_name = azure_response['analyzeResult'][container_key][0]['fields']["VendorName"][text_or_content]
-        for item in items:
-            content = item[text_or_content]
+    if "Items" in invoice and "VendorName" in invoice:
+        supplier_name = invoice.text("VendorName")
+        for item in invoice.items:
+            content = item[invoice.text_key]
             content_split = content.split('\n')
             if supplier_name == "KASMY PACK (PRIVATE) LIMITED":
                 if len(content_split) > 6:
                     quantity = content_split[6]
-                    update_item_field(item, text_or_content, "Quantity", quantity)
+                    invoice.set_item_text(item, "Quantity", quantity)
             elif supplier_name in ["BULLEH SHAH PACKAGING (PVT) LTD", "PACKAGES CONVERTORS LIMITED"]:
                 if len(content_split) > 2:
                     quantity = content_split[2]
-                    update_item_field(item, text_or_content, "Quantity", quantity)
+                    invoice.set_item_text(item, "Quantity", quantity)
             elif "MP POWER" in supplier_name:
                 # Regex pattern to match integers before PC for MP POWER supplier
                 match = re.search(r'(\d+)\.0-\s*PC', content)
                 if match:
                     quantity = int(match.group(1))
-                    update_item_field(item, text_or_content, "Quantity", quantity)
+                    invoice.set_item_text(item, "Quantity", quantity)
 
     return azure_response
 
-def validate_and_update_line_items(azure_response, version):
-    container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
+def validate_and_update_line_items(azure_response, version, invoice=None):
+    invoice = invoice_model.of(azure_response, version, invoice)
     supplier_name = None
-    if "Items" in azure_response['analyzeResult'][container_key][0]['fields'] and "VendorName" in azure_response['analyzeResult'][container_key][0]['fields']:
-        items = azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray']
-        supplier_name = azure_response['analyzeResult'][container_key][0]['fields']["VendorName"][text_or_content]
-        for item in items:
-            content = item[text_or_content]
+    if "Items" in invoice and "VendorName" in invoice:
+        supplier_name = invoice.text("VendorName")
+        for item in invoice.items:
+            content = item[invoice.text_key]
             content_split = content.split()
             if "Diners Club" in supplier_name:
                 if len(content_split) > 2:
                     unit_price = content_split[2]
-                    update_item_field(item, text_or_content, "UnitPrice", unit_price)
+                    invoice.set_item_text(item, "UnitPrice", unit_price)
 
     return azure_response
 
-def update_item_field(item, text_or_content, field_name, value):
-    if "valueObject" not in item:
-        item["valueObject"] = {}
-    if field_name not in item["valueObject"]:
-        item["valueObject"][field_name] = {}
-
-    item["valueObject"][field_name][text_or_content] = value
-
-    try:
-        value = str(value)
-        value_number = float(value.replace(',', ''))
-        item["valueObject"][field_name]["valueNumber"] = value_number
-    except ValueError:
-        item["valueObject"][field_name]["valueNumber"] = None
 
-
-def validate_line_item_gst(azure_response,version):
-    container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
-    if "Items" in azure_response['analyzeResult'][container_key][0]['fields']:
-        for i, value_array in enumerate(
-                azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray']):
-            if "valueObject" in value_array:
-                if "Tax" in value_array["valueObject"]:
-                    field_text = value_array["valueObject"]["Tax"][text_or_content]
-                    if isinstance(field_text, str) and '%' in field_text:
-                        tax = field_text.replace('%', '')
-                        if value_type == "valueNumber":
-                            azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                            "valueObject"]["Tax"][text_or_content] = tax
-                            azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                            "valueObject"]["Tax"]["type"] = "number"
-                            azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                            "valueObject"]["Tax"][value_type] = tax
-                        else:
-                            azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                "valueObject"]["Tax"][value_type] = {"amount": tax}
-                            azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                "valueObject"]["Tax"]["type"] = "currency"
-                            azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                "valueObject"]["Tax"][text_or_content] = tax
-                else:
-                    if "UnitPrice" in value_array["valueObject"]:
-                        field_text = value_array["valueObject"]["UnitPrice"][text_or_content]
-                        amounts = field_text.split()
-                        if len(amounts) == 3 and all(amount for amount in amounts):
-                            tax = amounts[2]
-                            if tax.isdigit():
-                                azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                 'valueObject']['Tax'] = {}
-                                if value_type == "valueNumber":
-                                    azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                    "valueObject"]["Tax"][text_or_content] = tax
-                                    azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                    "valueObject"]["Tax"]["type"] = "number"
-                                    azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                    "valueObject"]["Tax"][value_type] = tax
-                                else:
-                                    azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                    "valueObject"]["Tax"][value_type] = {"amount": tax}
-                                    azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                    "valueObject"]["Tax"]["type"] = "currency"
-                                    azure_response['analyzeResult'][container_key][0]['fields']['Items']['valueArray'][i][
-                                    "valueObject"]["Tax"][text_or_content] = tax
+def validate_line_item_gst(azure_response,version, invoice=None):
+    invoice = invoice_model.of(azure_response, version, invoice)
+    text_or_content = invoice.text_key
+    for item in invoice.items:
+        if "valueObject" in item:
+            if "Tax" in item["valueObject"]:
+                field_text = item["valueObject"]["Tax"][text_or_content]
+                if isinstance(field_text, str) and '%' in field_text:
+                    tax = field_text.replace('%', '')
+                    invoice_model.set_amount(item["valueObject"]["Tax"], tax, tax, text_or_content, invoice.value_key)
+            else:
+                if "UnitPrice" in item["valueObject"]:
+                    field_text = item["valueObject"]["UnitPrice"][text_or_content]
+                    amounts = field_text.split()
+                    if len(amounts) == 3 and all(amount for amount in amounts):
+                        tax = amounts[2]
+                        if tax.isdigit():
+                            invoice.set_item_amount(item, "Tax", tax, tax)
 
     return azure_response
 
@@ -1189,82 +1079,48 @@ def normalize_bounding_box(bounding_box):
     return bounding_box
 
 
-def check_tax_invoice_header(azure_response, version, max_lines=15):
+def check_tax_invoice_header(azure_response, version, max_lines=15, layout=None):
     # Check if 'tax invoice' or 'invoice' is present in the first `max_lines` lines of the document.
     """Added this because OCR was detecting 'invoice' keyword found anywhere
        in the document and calculating its font size leading to all pages being
        flagged as isInvoice True"""
-    container_key, text_or_content, block_type = mapping_utils.get_response_structure(version)
-    line_counter = 0
-    keywords = ["tax invoice", "invoice", "manual payment requisition form", "cheque requisition",
-                "payment request form"]
-    pattern = r"\b(?:{})\b".format("|".join(re.escape(kw) for kw in keywords))
-
-    for page in azure_response["analyzeResult"][container_key]:
-        for line in page["lines"]:
-            line_counter += 1
-            if line_counter > max_lines:
-                return False
-
-            line_text = line[text_or_content].lower()
-            for keyword in keywords:
-                if re.search(pattern, line_text, re.IGNORECASE):
-                    print(f"Found '{keyword}' in line {line_counter}")
-                    return True
-
-    return False
-
-
-def calculate_font_size_for_tax_invoice(azure_response, version):
-    # Calculate the font size and average character width for the given line text and bounding box.
-    container_key, text_or_content, block_type = mapping_utils.get_response_structure(version)
-    keyword = ["tax invoice", "invoice"]
-    line_count = 0
-    max_lines_to_check = 15
-
-    for page in azure_response["analyzeResult"][container_key]:
-        for line in page["lines"]:
-            line_count += 1
-            if line_count > max_lines_to_check:
-                break
-            for key in keyword:
-                if key in line[text_or_content].lower():
-                    line_bounding_box = line[block_type]
-                    line_bounding_box = normalize_bounding_box(line_bounding_box)
-                    num_words = len(line[text_or_content].split())
-
-                    font_size = font_size_estimation.estimate_font_size(line_bounding_box, num_words)
-                    print(f"Estimated font size: {font_size}")
-
-                    return font_size
-    return None
-
-
-def final_invoice_verification(raw_text, azure_response,version, detected_language):
+    if layout is None:
+        layout = layout_analysis.DocumentLayout(azure_response, version)
+    return layout.has_header(max_lines)
+
+
+def calculate_font_size_for_tax_invoice(azure_response, version, layout=None):
+    # Calculate the font size and average character width for the first line mentioning an invoice.
+    if layout is None:
+        layout = layout_analysis.DocumentLayout(azure_response, version)
+    return layout.header_font_size()
+
+
+def final_invoice_verification(raw_text, azure_response,version, detected_language, layout=None, views=None):
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
+    # The layout built for identify_blocks is passed in, so the line polygons are only read once
+    if layout is None:
+        layout = layout_analysis.DocumentLayout(azure_response, version)
     azure_response['nonInvoice'] = False  # Using this to separate specifically non-invoices vs invoices with low
     # completeness score
-    tax_header = check_tax_invoice_header(azure_response,version)
+    tax_header = check_tax_invoice_header(azure_response,version, layout=layout)
     if azure_response['isTaxInvoice'] is True:
         if not tax_header and azure_response['analyzeResult'][container_key][0][
         'completenessScore'] <= 0.4:
             azure_response['isTaxInvoice'] = False
-    font_size = calculate_font_size_for_tax_invoice(azure_response, version)
+    font_size = calculate_font_size_for_tax_invoice(azure_response, version, layout)
     if isinstance(font_size, tuple):
         font_size = font_size[0]
     if azure_response['isTaxInvoice'] is False and not tax_header and (font_size is None or font_size <= 201) and azure_response['analyzeResult'][container_key][0][
         'completenessScore'] <= 0.75:
         is_invoice = False
-        raw_text = raw_text.lower()
-        email_keywords = ["from", "to", "subject", "cc", "attachments"]
-        greeting_keywords = ["dear", "hi", "hello"]
-        regards_keywords = ["regards", "best regards", "sincerely", "thanks", "thank you"]
+        text_index = text_views.of(raw_text, views).lower_index
         is_email = False
 
         # Check if all keywords in email_keywords are present in raw_text
-        if all(keyword in raw_text for keyword in email_keywords):
-            has_greetings = any(greet in raw_text for greet in greeting_keywords)
-            has_regards = any(regard in raw_text for regard in regards_keywords)
+        if text_index.has_all(keywords.EMAIL_KEYWORDS):
+            has_greetings = text_index.has_any(keywords.GREETING_KEYWORDS)
+            has_regards = text_index.has_any(keywords.REGARDS_KEYWORDS)
             if has_greetings and has_regards:
                 is_email = True
 
@@ -1272,7 +1128,7 @@ def final_invoice_verification(raw_text, azure_response,version, detected_langua
             is_invoice = False
         else:
             for label_list in NOT_AN_INVOICE_LABELS:
-                if all(label in raw_text for label in label_list):
+                if text_index.has_all(label_list):
                     print(f"Label causing invoice to be flagged as non invoice: {label_list}")
                     is_invoice = False
                     break
@@ -1285,7 +1141,7 @@ def final_invoice_verification(raw_text, azure_response,version, detected_langua
             azure_response['nonInvoice'] = True  # Using this to separate specifically non-invoices vs invoices with low
             # completeness score
         else:
-            if ("job #" in raw_text or "job id" in raw_text) and not (
+            if text_index.has_any(["job #", "job id"]) and not (
                     "InvoiceTotal" in azure_response['analyzeResult'][container_key][0]['fields'] or "AmountDue" in
                     azure_response['analyzeResult'][container_key][0]['fields']):
                 azure_response['isInvoice'] = False
@@ -1387,10 +1243,10 @@ def validate_invoice_total(azure_response, raw_text, version):
     return azure_response
 
 
-def populate_credit_note_num(azure_response, other_fields, raw_text,version):
+def populate_credit_note_num(azure_response, other_fields, raw_text,version, views=None):
     container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
     if azure_response['isCreditNote'] is True:
-        credit_memo_num = spacy_inference.predict_credit_memo_num(raw_text)
+        credit_memo_num = spacy_inference.predict_credit_memo_num(raw_text, views)
         print("Raw text: ", raw_text)
         print("Model result for credit memo number:", credit_memo_num)
         po_num = None
@@ -1448,10 +1304,7 @@ def populate_credit_note_num(azure_response, other_fields, raw_text,version):
                 }
 
         else:
-            credit_memo_num_patterns = [r'SC\d+', r'CFS-CN\d+']
-            potential_credit_note_nums = []
-            for pattern in credit_memo_num_patterns:
-                potential_credit_note_nums.extend(re.findall(pattern, raw_text))
+            potential_credit_note_nums = identifiers.extract(raw_text).values("credit_memo")
             if potential_credit_note_nums:
                 credit_note_num = potential_credit_note_nums[0]
                 if '/' in credit_note_num or ' ' in credit_note_num:
@@ -1475,11 +1328,13 @@ def populate_credit_note_num(azure_response, other_fields, raw_text,version):
 
 
 
-def convert_negative_to_positive(azure_response, numeric_field,version):
-    container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
-    if numeric_field in azure_response['analyzeResult'][container_key][0]['fields']:
-        field_info = azure_response['analyzeResult'][container_key][0]['fields'][numeric_field]
-        numeric_field_content = str(field_info[text_or_content])
+def convert_negative_to_positive(azure_response, numeric_field,version, invoice=None):
+    invoice = invoice_model.of(azure_response, version, invoice)
+    value_type = invoice.value_key
+    field = invoice.get(numeric_field)
+    if field is not None:
+        field_info = field.data
+        numeric_field_content = str(field.text)
         if version == "v2.1":
             value_number = field_info.get("valueNumber", None)
         else:
@@ -1496,7 +1351,7 @@ def convert_negative_to_positive(azure_response, numeric_field,version):
                 value_number = value_number.replace("$", "").replace(",", "").strip()
             try:
                 positive_value = abs(float(value_number))
-                azure_response = mapping_utils.set_currency(azure_response, version, numeric_field, positive_value, numeric_field_content.lstrip("-"))
+                invoice.set_amount(numeric_field, positive_value, numeric_field_content.lstrip("-"))
             except ValueError:
                 print(f"Error converting value to float: {value_number}")
 
@@ -1539,39 +1394,100 @@ def validate_vendor_add_recipient(azure_response, version):
     return azure_response
 
 
-def validate_fr_fields(azure_response, raw_text, blocks_list, other_fields,version, detected_language, final_processing):
-    azure_response = validate_supplier_name(azure_response, version, detected_language)
-    azure_response = validation_populater.populate_billing_info(azure_response, version)
-    azure_response = validate_invoice_total(azure_response, raw_text, version)
-    if detected_language != "ar":
-        azure_response = validate_customer_address(azure_response, blocks_list, "CustomerAddress",version)
-        azure_response = validate_customer_address(azure_response, blocks_list, "VendorAddress",version)
-        azure_response = validate_customer_name(azure_response, other_fields,version)
-        azure_response = validation_populater.populate_account_number(azure_response, other_fields, raw_text, version)
-        azure_response = validation_populater.populate_contract_num(azure_response, raw_text, other_fields,version)
-        azure_response = validate_invoice_num(azure_response, other_fields, version, raw_text,
-                                                              final_processing)
-        azure_response = validate_invoice_for_dockerizedversion(azure_response, version, other_fields)
-        azure_response = validate_invoice_date(azure_response,other_fields,version)
-        azure_response = validate_numeric_field(azure_response, "InvoiceTotal",version)
-        azure_response = validate_numeric_field(azure_response, "TotalTax",version)
-        azure_response = validate_line_items(azure_response, version, final_processing)
-        azure_response = validate_line_item_amounts(azure_response,version)
-        azure_response = validate_quantity_for_packing_invoices(azure_response, version)
-        azure_response = validate_and_update_line_items(azure_response, version)
-        azure_response = validate_line_item_gst(azure_response,version)
-        if version == 'v2.1':
-            azure_response = validation_populater.populate_invoice_total_from_items(azure_response)
-        if version == 'v3.1':
-            # azure_response = validate_vendor_add_recipient(azure_response, version)
-            azure_response = validation_populater.populate_customer_add_recipient(azure_response, version)
-        # azure_response = validate_invoice_total(azure_response, raw_text, version)
-        azure_response = validation_populater.populate_total_tax(azure_response, other_fields,version)
-        azure_response = validate_tax_amount(azure_response,version)
-        azure_response = validation_populater.populate_shipment_number(azure_response, other_fields, raw_text, version)
-        azure_response = validation_populater.populate_cost_center(azure_response, version)
-        azure_response = validation_populater.populate_dc_num(azure_response, raw_text, version)
-        azure_response = validation_populater.populate_unspsc_code(azure_response, version)
-        azure_response = validation_populater.populate_contact_person(azure_response, version, other_fields)
-
-    return azure_response
+# validate_fr_fields as rules, in the order they ran before. Triggers only skip rules that would not change
+# anything (the functions still check for themselves), FR_FIELD_RULES.get_stats() has the runs and time of each.
+FR_FIELD_RULES = rules.RuleSet("validate_fr_fields")
+FR_FIELD_RULES.add("validate_supplier_name",
+                   lambda c: validate_supplier_name(c.azure_response, c.version, c.detected_language))
+FR_FIELD_RULES.add("populate_billing_info",
+                   lambda c: validation_populater.populate_billing_info(c.azure_response, c.version))
+FR_FIELD_RULES.add("validate_invoice_total",
+                   lambda c: validate_invoice_total(c.azure_response, c.raw_text, c.version))
+# The rules below do not run for Arabic documents
+FR_FIELD_RULES.add("validate_customer_address",
+                   lambda c: validate_customer_address(c.azure_response, c.blocks_list, "CustomerAddress", c.version),
+                   exclude_languages=["ar"])
+FR_FIELD_RULES.add("validate_vendor_address",
+                   lambda c: validate_customer_address(c.azure_response, c.blocks_list, "VendorAddress", c.version),
+                   exclude_languages=["ar"])
+FR_FIELD_RULES.add("validate_customer_name",
+                   lambda c: validate_customer_name(c.azure_response, c.other_fields, c.version),
+                   exclude_languages=["ar"])
+FR_FIELD_RULES.add("populate_account_number",
+                   lambda c: validation_populater.populate_account_number(c.azure_response, c.other_fields,
+                                                                          c.raw_text, c.version, c.views),
+                   exclude_languages=["ar"], keywords=["mitsubishi"])
+FR_FIELD_RULES.add("populate_contract_num",
+                   lambda c: validation_populater.populate_contract_num(c.azure_response, c.raw_text,
+                                                                        c.other_fields, c.version, c.views),
+                   exclude_languages=["ar"])
+FR_FIELD_RULES.add("validate_invoice_num",
+                   lambda c: validate_invoice_num(c.azure_response, c.other_fields, c.version, c.raw_text,
+                                                  c.final_processing, c.views),
+                   exclude_languages=["ar"])
+FR_FIELD_RULES.add("validate_invoice_for_dockerizedversion",
+                   lambda c: validate_invoice_for_dockerizedversion(c.azure_response, c.version, c.other_fields),
+                   exclude_languages=["ar"])
+FR_FIELD_RULES.add("validate_invoice_date",
+                   lambda c: validate_invoice_date(c.azure_response, c.other_fields, c.version),
+                   exclude_languages=["ar"])
+FR_FIELD_RULES.add("validate_invoice_total_number",
+                   lambda c: validate_numeric_field(c.azure_response, "InvoiceTotal", c.version, c.invoice),
+                   exclude_languages=["ar"], fields=["InvoiceTotal"])
+FR_FIELD_RULES.add("validate_total_tax_number",
+                   lambda c: validate_numeric_field(c.azure_response, "TotalTax", c.version, c.invoice),
+                   exclude_languages=["ar"], fields=["TotalTax"])
+FR_FIELD_RULES.add("validate_line_items",
+                   lambda c: validate_line_items(c.azure_response, c.version, c.final_processing, c.invoice),
+                   exclude_languages=["ar"], fields=["Items"])
+FR_FIELD_RULES.add("validate_line_item_amounts",
+                   lambda c: validate_line_item_amounts(c.azure_response, c.version, c.invoice),
+                   exclude_languages=["ar"], fields=["Items"])
+FR_FIELD_RULES.add("validate_quantity_for_packing_invoices",
+                   lambda c: validate_quantity_for_packing_invoices(c.azure_response, c.version, c.invoice),
+                   exclude_languages=["ar"], fields=["Items", "VendorName"],
+                   vendors=["KASMY PACK (PRIVATE) LIMITED", "BULLEH SHAH PACKAGING (PVT) LTD",
+                            "PACKAGES CONVERTORS LIMITED", "MP POWER"])
+FR_FIELD_RULES.add("validate_and_update_line_items",
+                   lambda c: validate_and_update_line_items(c.azure_response, c.version, c.invoice),
+                   exclude_languages=["ar"], fields=["Items", "VendorName"], vendors=["Diners Club"])
+FR_FIELD_RULES.add("validate_line_item_gst",
+                   lambda c: validate_line_item_gst(c.azure_response, c.version, c.invoice),
+                   exclude_languages=["ar"], fields=["Items"])
+FR_FIELD_RULES.add("populate_invoice_total_from_items",
+                   lambda c: validation_populater.populate_invoice_total_from_items(c.azure_response),
+                   exclude_languages=["ar"], versions=["v2.1"])
+FR_FIELD_RULES.add("populate_customer_add_recipient",
+                   lambda c: validation_populater.populate_customer_add_recipient(c.azure_response, c.version),
+                   exclude_languages=["ar"], versions=["v3.1"])
+FR_FIELD_RULES.add("populate_total_tax",
+                   lambda c: validation_populater.populate_total_tax(c.azure_response, c.other_fields, c.version),
+                   exclude_languages=["ar"])
+FR_FIELD_RULES.add("validate_tax_amount",
+                   lambda c: validate_tax_amount(c.azure_response, c.version),
+                   exclude_languages=["ar"])
+FR_FIELD_RULES.add("populate_shipment_number",
+                   lambda c: validation_populater.populate_shipment_number(c.azure_response, c.other_fields,
+                                                                           c.raw_text, c.version, c.views),
+                   exclude_languages=["ar"], keywords=["mitsubishi", "costco"])
+FR_FIELD_RULES.add("populate_cost_center",
+                   lambda c: validation_populater.populate_cost_center(c.azure_response, c.version),
+                   exclude_languages=["ar"], fields=["Items"])
+FR_FIELD_RULES.add("populate_dc_num",
+                   lambda c: validation_populater.populate_dc_num(c.azure_response, c.raw_text, c.version, c.views),
+                   exclude_languages=["ar"], fields=["Items"], keywords=["dc no"])
+FR_FIELD_RULES.add("populate_unspsc_code",
+                   lambda c: validation_populater.populate_unspsc_code(c.azure_response, c.version),
+                   exclude_languages=["ar"], fields=["Items"])
+FR_FIELD_RULES.add("populate_contact_person",
+                   lambda c: validation_populater.populate_contact_person(c.azure_response, c.version,
+                                                                          c.other_fields),
+                   exclude_languages=["ar"])
+
+
+def validate_fr_fields(azure_response, raw_text, blocks_list, other_fields,version, detected_language, final_processing,
+                       views=None, invoice=None):
+    # Fields and line items are read through the invoice model instead of walking the response each time
+    context = rules.RuleContext(azure_response, version, detected_language, raw_text, views, invoice,
+                                blocks_list=blocks_list, other_fields=other_fields, final_processing=final_processing)
+    return FR_FIELD_RULES.run(context)
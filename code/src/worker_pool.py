@@ -0,0 +1,81 @@
+import os
+import asyncio
+import functools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# "process" runs every process_invoice call in a pool of worker processes so a batch of N files takes
+# roughly as long as its slowest file. "inline" keeps the old behaviour of running it on the event loop.
+EXECUTION_MODE = os.getenv("SERVICE_BUS_EXECUTION_MODE", "process").lower()
+WORKER_PROCESSES = int(os.getenv("SERVICE_BUS_WORKER_PROCESSES", str(os.cpu_count() or 1)))
+# Recycling workers after a number of files keeps memory growth from PyMuPDF/spaCy in check
+MAX_TASKS_PER_WORKER = int(os.getenv("SERVICE_BUS_MAX_TASKS_PER_WORKER", "0")) or None
+
+pool_logger = logging.getLogger('servicebus_logger')
+
+_executor = None
+
+
+def _init_worker():
+    # Models are loaded lazily, so load them here once per worker and no file pays the model loading cost
+    import processor
+    from src import resources
+    resources.warmup(["spacy.*"])
+    pool_logger.info(f"Worker process {os.getpid()} initialised with models loaded")
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        kwargs = {"max_workers": WORKER_PROCESSES, "initializer": _init_worker}
+        if MAX_TASKS_PER_WORKER:
+            # Python 3.11+ only, ignored otherwise
+            try:
+                _executor = ProcessPoolExecutor(max_tasks_per_child=MAX_TASKS_PER_WORKER, **kwargs)
+            except TypeError:
+                _executor = ProcessPoolExecutor(**kwargs)
+        else:
+            _executor = ProcessPoolExecutor(**kwargs)
+        pool_logger.info(f"Started worker pool with {WORKER_PROCESSES} processes")
+    return _executor
+
+
+def shutdown_executor(wait=True):
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+
+
+def warmup():
+    """Starts every worker process up front so the first batch does not pay the model loading cost."""
+    if EXECUTION_MODE != "process":
+        return
+    executor = get_executor()
+    futures = [executor.submit(os.getpid) for _ in range(WORKER_PROCESSES)]
+    for future in futures:
+        future.result()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking I/O call (blob download/upload, translation) on the default thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+async def run_in_worker(func, *args, **kwargs):
+    """
+    Runs a CPU/blocking pipeline call (e.g. process_invoice) in the worker pool and awaits its result
+    without blocking the event loop. func and its arguments must be picklable.
+    """
+    if EXECUTION_MODE != "process":
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+    except BrokenProcessPool:
+        # A worker died (OOM, segfault in a native lib), drop the pool so the next call starts a fresh one
+        pool_logger.error("Worker pool is broken, restarting it for the next file")
+        shutdown_executor(wait=False)
+        raise
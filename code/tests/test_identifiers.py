@@ -0,0 +1,38 @@
+import re
+from src import identifiers, raw_text_utils
+
+RAW_TEXT = ("TAX INVOICE\nABN: 12 345 678 910\nNTN 0709631-3 STRN 34-01-0712331-7 and 071-2331-7\n"
+            "IBAN PK36SCBL0000001123456702\nLp0 12345 LPO 98765\nPO7000065802 P/O7000078201 700 008 5528\n"
+            "Credit SC1234 CFS-CN55\nGreenhouse gas emissions for this bill 12.5 tonnes\n12345678901")
+
+
+class TestIdentifierTable():
+    def test_values_match_findall_per_pattern(self):
+        table = identifiers.extract(RAW_TEXT)
+        lower_text = RAW_TEXT.lower()
+
+        for kind, patterns in identifiers.IDENTIFIER_PATTERNS.items():
+            expected = []
+            for identifier_pattern in patterns:
+                expected.extend(identifier_pattern.pattern.findall(RAW_TEXT))
+            assert table.values(kind) == expected, kind
+        tafe_po = []
+        for regex in identifiers.TAFE_PO_PATTERNS:
+            tafe_po.extend(re.findall(regex, lower_text, re.IGNORECASE))
+        assert identifiers.extract(lower_text).values("tafe_po") == tafe_po
+        assert tafe_po
+
+    def test_anchors_skip_patterns_that_cannot_match(self):
+        table = identifiers.IdentifierTable("No identifiers here, 12345678901")
+
+        assert table.values("ntn") == []
+        assert table.first("iban") is None
+        assert table.values("abn_fallback") == ["12345678901"]
+
+    def test_extraction_functions_read_the_table(self):
+        assert raw_text_utils.extract_lpo(RAW_TEXT) == "LPO 98765"
+        assert raw_text_utils.extract_lpo("LP0 1234") == "LPO 1234"
+        assert raw_text_utils.extract_iban_num(RAW_TEXT) == "PK36SCBL0000001123456702"
+        emission = re.search(r"(?i)greenhouse gas emissions(?:\W+\w+){0,6}.*?([-+]?\d*\.?\d+)\s*tonnes", RAW_TEXT)
+        assert raw_text_utils.extract_co2_emission(RAW_TEXT) == float(emission.group(1))
+        assert raw_text_utils.extract_co2_emission("No emissions") == ""
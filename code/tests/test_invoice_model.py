@@ -0,0 +1,51 @@
+from src import invoice_model
+
+
+def make_response(container_key, text_key):
+    return {"analyzeResult": {container_key: [{"fields": {
+        "VendorName": {"type": "string", text_key: "ACME"},
+        "Items": {"valueArray": [{text_key: "Widget 2 5"}, {text_key: "Bolt", "valueObject": {}}]}}}]}}
+
+
+class TestInvoiceModel():
+    def test_fields_are_read_and_written_with_the_version_keys(self):
+        for version, container_key, text_key in [("v2.1", "documentResults", "text"),
+                                                 ("v3.1", "documents", "content")]:
+            response = make_response(container_key, text_key)
+            invoice = invoice_model.Invoice(response, version)
+
+            assert invoice.text("VendorName") == "ACME"
+            assert invoice.text("InvoiceId") is None
+            invoice.set_amount("InvoiceTotal", 10.5, "$10.50")
+            invoice.get("VendorName").text = "ACME PTY LTD"
+
+            fields = invoice.to_response()["analyzeResult"][container_key][0]["fields"]
+            assert fields["VendorName"][text_key] == "ACME PTY LTD"
+            assert fields["InvoiceTotal"][text_key] == "$10.50"
+        assert fields["InvoiceTotal"]["valueCurrency"] == {"amount": 10.5}
+
+    def test_line_items_are_the_response_dicts(self):
+        response = make_response("documents", "content")
+        invoice = invoice_model.Invoice(response, "v3.1")
+        first, second = invoice.items
+
+        invoice.set_item_text(first, "Quantity", "2")
+        invoice.set_item_text(second, "UnitPrice", "n/a")
+        invoice.set_item_amount(second, "Tax", "10", "10")
+
+        assert first["valueObject"]["Quantity"] == {"content": "2", "valueNumber": 2.0}
+        assert second["valueObject"]["UnitPrice"]["valueNumber"] is None
+        assert second["valueObject"]["Tax"] == {"valueCurrency": {"amount": "10"}, "type": "currency", "content": "10"}
+        invoice.delete_items([0, 0])
+        assert invoice.items == [second]
+
+    def test_model_is_reused_only_for_its_response(self):
+        response = make_response("documents", "content")
+        invoice = invoice_model.Invoice(response, "v3.1")
+
+        assert invoice_model.of(response, "v3.1", invoice) is invoice
+        other = make_response("documents", "content")
+        assert invoice_model.of(other, "v3.1", invoice).response is other
+        invoice.set("Currency", "AUD")
+        assert invoice.to_response() is response
+        assert response["analyzeResult"]["documents"][0]["fields"]["Currency"] == "AUD"
@@ -0,0 +1,32 @@
+import threading
+from src import keywords
+
+
+class TestKeywordIndex():
+    def test_index_matches_substring_checks(self):
+        text = "tax invoice\noriginenergy pty ltd\ncredit note number 1234"
+        index = keywords.KeywordIndex(text)
+
+        for keyword in keywords.TAX_INVOICE_KEYWORDS + keywords.CREDIT_NOTE_LABELS + keywords.UTILITY_VENDORS:
+            assert index.has(keyword) == (keyword in text)
+            # Remembered answers are the same
+            assert index.has(keyword) == (keyword in text)
+        assert index.has("pty ltd")
+        assert not index.has("not in the text")
+        assert index.first(["credit memo", "credit note number", "credit note"]) == "credit note number"
+
+    def test_shared_between_threads(self):
+        index = keywords.KeywordIndex("tax invoice " * 1000)
+        misses = []
+
+        def check():
+            for _ in range(200):
+                if not index.has("tax invoice") or index.has("credit note"):
+                    misses.append(True)
+
+        threads = [threading.Thread(target=check) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not misses
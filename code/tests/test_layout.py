@@ -0,0 +1,60 @@
+import random
+from src import layout
+
+
+def line_by_line_blocks(data):
+    # identify_blocks before the layout module, every line compared to every block in turn
+    pages = data["analyzeResult"]["pages"]
+    x_threshold = pages[0]["width"] * 0.3
+    page_blocks_list = []
+    for page in pages:
+        blocks = []
+        for line in page["lines"]:
+            min_x = round(line["polygon"][0], 1)
+            min_y = round(line["polygon"][1], 1)
+            for blk in blocks:
+                if abs(min_x - blk['min_x']) < x_threshold and abs(min_y - blk['min_y']) < 0.5:
+                    blk['lines'].append(line["content"])
+                    blk['min_y'] = min_y
+                    break
+            else:
+                blocks.append({'min_x': min_x, 'min_y': min_y, 'lines': [line["content"]]})
+        page_blocks_list.append(blocks)
+    return page_blocks_list
+
+
+def build_response(seed, line_count=120):
+    rng = random.Random(seed)
+    pages = []
+    for page_number in (1, 2):
+        lines = []
+        for i in range(line_count):
+            x = rng.uniform(0, 8)
+            y = i * 0.09 + rng.uniform(0, 0.05)
+            lines.append({"content": f"line {page_number}-{i}", "polygon": [x, y, x + 1, y, x + 1, y + 0.1, x, y + 0.1]})
+        pages.append({"pageNumber": page_number, "width": 8.5, "lines": lines})
+    return {"analyzeResult": {"pages": pages}}
+
+
+class TestLayout():
+    def test_blocks_match_line_by_line_grouping(self):
+        for seed in range(5):
+            response = build_response(seed)
+            assert layout.DocumentLayout(response, "v3.1").identify_blocks() == line_by_line_blocks(response)
+
+    def test_header_checks(self):
+        response = build_response(0)
+        lines = response["analyzeResult"]["pages"][0]["lines"]
+        lines[3] = {"content": "TAX INVOICE", "polygon": [1, 1, 3, 1, 3, 1.2, 1, 1.2]}
+        document_layout = layout.DocumentLayout(response, "v3.1")
+
+        assert document_layout.has_header()
+        font_size, avg_char_width = document_layout.header_font_size()
+        assert round(font_size) == 200
+        assert round(avg_char_width) == 1000
+
+        lines[3] = {"content": "Statement", "polygon": [1, 1, 3, 1, 3, 1.2, 1, 1.2]}
+        lines[20] = {"content": "Invoice", "polygon": [1, 1, 3, 1, 3, 1.2, 1, 1.2]}
+        document_layout = layout.DocumentLayout(response, "v3.1")
+        assert not document_layout.has_header()
+        assert document_layout.header_font_size() is None
@@ -0,0 +1,35 @@
+from src import line_index, raw_text_utils
+
+
+def make_response(pages):
+    return {"analyzeResult": {"pages": [
+        {"pageNumber": page_number, "lines": [{"content": text, "polygon": [page_number, i, 1, i, 1, i + 1, 0, i + 1]}
+                                              for i, text in enumerate(texts)]}
+        for page_number, texts in enumerate(pages, 1)]}}
+
+
+class TestLineIndex():
+    def test_build_matches_line_by_line_concatenation(self):
+        response = make_response([["Tax Invoice", "ABN 12 345 678 901", ""], ["Invoice No 1234"]])
+        lines = ""
+        lines_without_spaces = ""
+        for page in response["analyzeResult"]["pages"]:
+            for line in page["lines"]:
+                lines = lines + line["content"] + "\n"
+                lines_without_spaces = lines_without_spaces + line["content"].replace(" ", "") + "\n"
+
+        assert raw_text_utils.get_raw_text(response, "v3.1") == (lines, lines_without_spaces)
+        assert raw_text_utils.get_raw_text(make_response([]), "v3.1") == ("", "")
+
+    def test_offsets_map_to_lines_pages_and_polygons(self):
+        raw_text, _, index = line_index.build(make_response([["Tax Invoice", "ABN 123"], ["Invoice No 1234"]]),
+                                              "v3.1")
+        start = raw_text.index("1234")
+
+        assert index.line_at(0) == 0
+        assert index.line_at(raw_text.index("ABN")) == 1
+        assert index.line_at(start) == 2
+        assert index.line_at(len(raw_text)) is None
+        assert index.locate(start, start + 4) == [{"pageNumber": 2, "polygon": [2, 0, 1, 0, 1, 1, 0, 1]}]
+        assert [region["pageNumber"] for region in index.locate(0, start)] == [1, 1, 2]
+        assert index.line_span(2) == (raw_text.index("Invoice No"), start + 4)
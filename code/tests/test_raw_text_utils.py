@@ -0,0 +1,31 @@
+import re
+from src import raw_text_utils
+
+
+def first_field_name(line, start=0):
+    # What other_field_values matched with one regex per field name
+    for index, fn in enumerate(raw_text_utils.FIELD_NAMES[start:], start):
+        if re.compile(r"\b%s\b" % fn, re.I).search(line):
+            return index
+    return None
+
+
+class TestRawTextUtils():
+    def test_find_field_name_matches_list_order(self):
+        lines = ["tax invoice number 12345", "invoice no 4411 po 99", "our ref 12 reference 55", "po box 12 sydney",
+                 "purchase order number 7781", "contact john account number 1234", "order numberorderno 1",
+                 "dn number date 21", "nothing to see here", "d c 44 dc no 12", "shipment 7 swift abc",
+                 "tax invoice 1", "abn 12 345 678 901", "p o box 44 po 1234"]
+        for line in lines:
+            assert raw_text_utils.find_field_name(line) == first_field_name(line), line
+            assert raw_text_utils.find_field_name(line, 20) == first_field_name(line, 20), line
+
+    def test_other_field_values(self):
+        blocks_list = [[{"lines": ["Invoice No 123456", "PO Box 99 Melbourne 3000", "Due Date", "12/01/2024",
+                                   "ABN: 12 345 678 901"]}]]
+        other_fields = raw_text_utils.other_field_values(blocks_list)
+
+        assert other_fields["invoice no"] == ["123456"]
+        assert other_fields["due date"] == ["12/01/2024"]
+        assert other_fields["abn"] == ["12 345 678 901"]
+        assert "po" not in other_fields
@@ -0,0 +1,33 @@
+from src import resources
+
+
+class TestResources():
+    def test_resource_is_created_once_on_first_use(self):
+        calls = []
+        resource = resources.LazyResource("test.once", lambda: calls.append(1) or object())
+
+        assert not resource.loaded
+        first = resource.get()
+        second = resource.get()
+
+        assert first is second
+        assert len(calls) == 1
+        assert resource.loaded
+
+    def test_per_process_resource_is_recreated_after_fork(self, monkeypatch):
+        resource = resources.LazyResource("test.client", object, per_process=True)
+        first = resource.get()
+        monkeypatch.setattr(resources.os, "getpid", lambda: -1)
+
+        assert resource.get() is not first
+
+    def test_warmup_loads_matching_resources_only(self):
+        model = resources.register("test_warmup.model", object)
+        client = resources.register("test_warmup_client", object)
+
+        loaded = resources.warmup(["test_warmup.*"])
+
+        assert loaded == ["test_warmup.model"]
+        assert model.loaded
+        assert not client.loaded
+        assert "test_warmup.model" in resources.get_init_timings()
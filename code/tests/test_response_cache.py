@@ -0,0 +1,54 @@
+import json
+from src import response_cache
+
+
+class TestResponseCache():
+    def setup_method(self):
+        response_cache.memory_cache.clear()
+
+    def test_memory_cache_is_bounded_by_bytes(self):
+        cache = response_cache.MemoryCache(max_bytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.get("a")
+        cache.put("c", b"12345")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"12345"
+        assert cache.size == 10
+
+    def test_blob_hit_is_promoted_to_local_tiers(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(response_cache, "disk_cache", response_cache.DiskCache(str(tmp_path), 10 ** 6))
+        calls = []
+
+        def fetch_remote():
+            calls.append(1)
+            return json.dumps({"status": "succeeded"}).encode("utf-8")
+
+        first = response_cache.get("container", "abc123", fetch_remote)
+        first["status"] = "modified"
+        second = response_cache.get("container", "abc123", fetch_remote)
+        response_cache.memory_cache.clear()
+        third = response_cache.get("container", "abc123", fetch_remote)
+
+        assert len(calls) == 1
+        assert second == {"status": "succeeded"}
+        assert third == {"status": "succeeded"}
+
+    def test_misses_are_remembered_for_the_request(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(response_cache, "disk_cache", response_cache.DiskCache(str(tmp_path), 10 ** 6))
+        calls = []
+
+        def fetch_remote():
+            calls.append(1)
+            return None
+
+        @response_cache.request_scoped
+        def request():
+            response_cache.get("container", "missing", fetch_remote)
+            response_cache.get("container", "missing", fetch_remote)
+
+        request()
+        request()
+
+        assert len(calls) == 2
@@ -0,0 +1,90 @@
+from src import response_slicer
+
+
+def build_v3_response():
+    content = "INVOICE 1\nTotal 10\nINVOICE 2\nTotal 20"
+    return {
+        "status": "succeeded",
+        "analyzeResult": {
+            "apiVersion": "2023-07-31",
+            "content": content,
+            "pages": [
+                {"pageNumber": 1, "width": 8.5, "spans": [{"offset": 0, "length": 18}],
+                 "lines": [{"content": "INVOICE 1", "polygon": [1, 1, 2, 1, 2, 2, 1, 2]},
+                           {"content": "Total 10", "polygon": [1, 3, 2, 3, 2, 4, 1, 4]}]},
+                {"pageNumber": 2, "width": 8.5, "spans": [{"offset": 19, "length": 18}],
+                 "lines": [{"content": "INVOICE 2", "polygon": [1, 1, 2, 1, 2, 2, 1, 2]},
+                           {"content": "Total 20", "polygon": [1, 3, 2, 3, 2, 4, 1, 4]}]},
+            ],
+            "tables": [{"rowCount": 1, "boundingRegions": [{"pageNumber": 2, "polygon": []}], "cells": []}],
+            "documents": [{
+                "docType": "invoice",
+                "boundingRegions": [{"pageNumber": 1, "polygon": []}, {"pageNumber": 2, "polygon": []}],
+                "fields": {
+                    "InvoiceId": {"type": "string", "content": "1", "boundingRegions": [{"pageNumber": 1}]},
+                    "VendorName": {"type": "string", "content": "ACME", "boundingRegions": [{"pageNumber": 1}]},
+                    "InvoiceTotal": {"type": "currency", "content": "20", "boundingRegions": [{"pageNumber": 2}]},
+                    "Items": {"type": "array", "valueArray": [
+                        {"content": "a", "boundingRegions": [{"pageNumber": 1}]},
+                        {"content": "b", "boundingRegions": [{"pageNumber": 2}]},
+                    ]},
+                },
+            }],
+        },
+    }
+
+
+def build_v2_response():
+    return {
+        "status": "succeeded",
+        "analyzeResult": {
+            "readResults": [
+                {"page": 1, "width": 8.5, "lines": [{"text": "INVOICE 1", "boundingBox": [1, 1, 2, 1, 2, 2, 1, 2]}]},
+                {"page": 2, "width": 8.5, "lines": [{"text": "INVOICE 2", "boundingBox": [1, 1, 2, 1, 2, 2, 1, 2]}]},
+            ],
+            "pageResults": [{"page": 1, "tables": []}, {"page": 2, "tables": []}],
+            "documentResults": [{
+                "docType": "prebuilt:invoice",
+                "pageRange": [1, 2],
+                "fields": {
+                    "InvoiceId": {"type": "string", "text": "1", "page": 1},
+                    "InvoiceTotal": {"type": "number", "text": "20", "page": 2},
+                },
+            }],
+        },
+    }
+
+
+class TestResponseSlicer():
+    def test_v3_slice_keeps_only_requested_pages(self):
+        response = build_v3_response()
+        sliced = response_slicer.slice_response(response, [2], "v3.1")
+        analyze_result = sliced["analyzeResult"]
+
+        assert [page["pageNumber"] for page in analyze_result["pages"]] == [1]
+        assert analyze_result["pages"][0]["lines"][0]["content"] == "INVOICE 2"
+        assert analyze_result["content"] == "INVOICE 2\nTotal 20"
+        assert len(analyze_result["tables"]) == 1
+        fields = analyze_result["documents"][0]["fields"]
+        assert set(fields) == {"InvoiceTotal", "Items"}
+        assert fields["InvoiceTotal"]["boundingRegions"][0]["pageNumber"] == 1
+        assert [item["content"] for item in fields["Items"]["valueArray"]] == ["b"]
+        # The original response is not modified
+        assert response["analyzeResult"]["documents"][0]["fields"]["InvoiceTotal"]["boundingRegions"][0]["pageNumber"] == 2
+
+    def test_v2_slice_keeps_only_requested_pages(self):
+        sliced = response_slicer.slice_response(build_v2_response(), [1], "v2.1")
+        analyze_result = sliced["analyzeResult"]
+
+        assert [page["page"] for page in analyze_result["readResults"]] == [1]
+        assert [page["page"] for page in analyze_result["pageResults"]] == [1]
+        assert set(analyze_result["documentResults"][0]["fields"]) == {"InvoiceId"}
+        assert analyze_result["documentResults"][0]["pageRange"] == [1, 1]
+
+    def test_is_slice_sufficient(self):
+        response = build_v3_response()
+        whole = response_slicer.slice_response(response, [1, 2], "v3.1")
+        second_page = response_slicer.slice_response(response, [2], "v3.1")
+
+        assert response_slicer.is_slice_sufficient(whole, "v3.1")
+        assert not response_slicer.is_slice_sufficient(second_page, "v3.1")
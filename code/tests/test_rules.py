@@ -0,0 +1,78 @@
+import threading
+import pytest
+from src import rules
+
+
+def make_response(**fields):
+    return {"analyzeResult": {"documents": [{"fields": {
+        name: {"type": "string", "content": text} for name, text in fields.items()}}]}}
+
+
+def make_rule_set(calls):
+    rule_set = rules.RuleSet("test")
+
+    def record(name):
+        def action(context):
+            calls.append(name)
+            return context.azure_response
+        return action
+
+    rule_set.add("always", record("always"))
+    rule_set.add("v2.1_only", record("v2.1_only"), versions=["v2.1"])
+    rule_set.add("not_arabic", record("not_arabic"), exclude_languages=["ar"])
+    rule_set.add("needs_items", record("needs_items"), fields=["Items"])
+    rule_set.add("acme_only", record("acme_only"), vendors=["ACME"])
+    rule_set.add("mitsubishi_only", record("mitsubishi_only"), keywords=["mitsubishi"])
+    return rule_set
+
+
+class TestRules():
+    def test_only_triggered_rules_run_in_order(self):
+        calls = []
+        rule_set = make_rule_set(calls)
+
+        context = rules.RuleContext(make_response(VendorName="ACME PTY LTD"), "v3.1", "en", "Mitsubishi Motors")
+        rule_set.run(context)
+        assert calls == ["always", "not_arabic", "acme_only", "mitsubishi_only"]
+
+        calls.clear()
+        rule_set.run(rules.RuleContext(make_response(Items="Widget"), "v3.1", "ar", "Invoice"))
+        assert calls == ["always", "needs_items"]
+
+    def test_rules_see_the_response_earlier_rules_return(self):
+        rule_set = rules.RuleSet("test")
+        rule_set.add("add_vendor", lambda c: make_response(VendorName="ACME"))
+        rule_set.add("acme_only", lambda c: make_response(VendorName="ACME", InvoiceId="1"), vendors=["ACME"])
+
+        result = rule_set.run(rules.RuleContext(make_response(), "v3.1", raw_text="Invoice"))
+        assert result == make_response(VendorName="ACME", InvoiceId="1")
+
+    def test_stats_count_runs_and_skips(self):
+        rule_set = make_rule_set([])
+        for language in ["en", "ar"]:
+            rule_set.run(rules.RuleContext(make_response(), "v3.1", language, "Invoice"))
+
+        stats = rule_set.get_stats()
+        assert stats["always"]["runs"] == 2
+        assert stats["not_arabic"] == {"runs": 1, "skips": 1, "seconds": stats["not_arabic"]["seconds"]}
+        assert stats["needs_items"]["skips"] == 2
+        with pytest.raises(ValueError):
+            rule_set.add("always", lambda c: c.azure_response)
+        rule_set.reset_stats()
+        assert rule_set.get_stats()["always"]["runs"] == 0
+
+    def test_stats_are_not_lost_between_threads(self):
+        rule_set = make_rule_set([])
+
+        def run():
+            for _ in range(500):
+                rule_set.run(rules.RuleContext(make_response(), "v3.1", "en", "Invoice"))
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = rule_set.get_stats()
+        assert stats["always"]["runs"] == 4000
+        assert stats["v2.1_only"]["skips"] == 4000
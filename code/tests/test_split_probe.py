@@ -0,0 +1,47 @@
+import os
+import copy
+import logging
+import processor
+from src import split_util, mapping_utils
+
+logger = logging.getLogger()
+
+TEST_PDF_PATH = os.path.abspath("fixtures/CSVN515208.pdf")
+
+
+def split_inputs(response, version):
+    # Everything split_util.find_splits reads from a page response
+    container_key, text_or_content, value_type = mapping_utils.get_version_structure(version)
+    fields = response['analyzeResult'][container_key][0]['fields']
+    return {
+        "isCreditNote": response['isCreditNote'],
+        "isInvoice": response['isInvoice'],
+        "nonInvoice": response['nonInvoice'],
+        "isBill": response['isBill'],
+        "completenessScore": response['analyzeResult'][container_key][0]['completenessScore'],
+        "InvoiceId": fields.get("InvoiceId", {}).get(text_or_content),
+        "VendorName": fields.get("VendorName", {}).get(text_or_content),
+        "CustomerAccountNumber": "CustomerAccountNumber" in fields,
+    }
+
+
+def process_page(azure_response, version, split_probe):
+    return processor.process_single_invoice(TEST_PDF_PATH, logger, None, "pdf", version, False, upload_log=False,
+                                            azure_response=copy.deepcopy(azure_response), split_probe=split_probe)
+
+
+class TestSplitProbe():
+    def check_same_split_inputs(self, azure_response, version):
+        probed, probed_raw_text = process_page(azure_response, version, split_probe=True)
+        processed, processed_raw_text = process_page(azure_response, version, split_probe=False)
+        assert probed_raw_text == processed_raw_text
+        assert split_inputs(probed, version) == split_inputs(processed, version)
+        assert "invoiceB64Data" not in probed and "isScanned" not in probed
+        assert split_util.find_splits([probed, copy.deepcopy(probed)], [probed_raw_text] * 2, version) == \
+               split_util.find_splits([processed, copy.deepcopy(processed)], [processed_raw_text] * 2, version)
+
+    def test_same_split_inputs_v2(self, form_recognizer_response_v2):
+        self.check_same_split_inputs(form_recognizer_response_v2, "v2.1")
+
+    def test_same_split_inputs_v3(self, form_recognizer_response_v3):
+        self.check_same_split_inputs(form_recognizer_response_v3, "v3.1")
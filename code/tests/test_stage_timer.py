@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from src import stage_timer
+
+
+@stage_timer.timed("decorated")
+def decorated_stage():
+    time.sleep(0.001)
+    return "done"
+
+
+@stage_timer.collected
+def process_request(page_count, correlation_id=None):
+    responses = []
+    for _ in range(page_count):
+        with stage_timer.collecting(correlation_id, enabled=True) as timings:
+            with stage_timer.stage("form_recognizer"):
+                decorated_stage()
+        responses.append({"diagnostics": stage_timer.diagnostics(timings)})
+    return responses
+
+
+class TestStageTimer():
+    def test_stages_are_not_timed_when_nothing_collects(self):
+        assert stage_timer.stage("form_recognizer") is stage_timer.NO_STAGE
+        assert decorated_stage() == "done"
+        with stage_timer.collecting("off", enabled=False) as timings:
+            assert timings is None
+            assert stage_timer.stage("form_recognizer") is stage_timer.NO_STAGE
+        assert stage_timer.get_timings("off") is None
+
+    def test_invoice_stages_add_up_per_correlation_id(self, monkeypatch):
+        monkeypatch.setattr(stage_timer, "STAGE_TIMINGS_ENABLED", True)
+        responses = process_request(2, correlation_id="correlation-1")
+        process_request(1, correlation_id="correlation-1")
+
+        diagnostics = responses[0]["diagnostics"]
+        assert diagnostics["correlationId"] == "correlation-1"
+        assert diagnostics["stageTimings"]["decorated"]["count"] == 1
+        assert diagnostics["requestStageTimings"]["form_recognizer"]["count"] == 2
+        totals = stage_timer.get_timings("correlation-1")
+        assert totals["form_recognizer"]["count"] == 3
+        assert totals["decorated"]["seconds"] >= totals["decorated"]["count"] * 0.001
+
+    def test_threads_started_with_the_context_add_to_the_request(self):
+        with stage_timer.collecting(enabled=True) as timings:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                for _ in range(8):
+                    executor.submit(contextvars.copy_context().run, decorated_stage)
+        assert timings.as_dict()["decorated"]["count"] == 8
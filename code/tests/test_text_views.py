@@ -0,0 +1,27 @@
+import re
+import string
+from src import text_views
+
+
+class TestTextViews():
+    def test_views_match_the_transformations_they_replace(self):
+        raw_text = "Tax\nInvoice from OriginEnergy, A.B.N. 12 345\r\nTotal: $10"
+        views = text_views.TextViews(raw_text)
+
+        assert views.lower == raw_text.lower()
+        assert views.single_line_lower == raw_text.replace("\n", " ").lower()
+        assert views.joined_lines == raw_text.replace("\r\n", " ").replace("\n", " ")
+        assert views.punctuation_stripped == raw_text.translate(
+            str.maketrans(string.punctuation, ' ' * len(string.punctuation)))
+        assert views.without_spaces == raw_text.replace(" ", "")
+        assert views.camel_split == re.sub(r'([a-z])([A-Z])', r'\1 \2', raw_text.replace("\n", " ")).lower()
+
+    def test_keyword_indexes_use_their_view(self):
+        views = text_views.get("Tax\nInvoice from OriginEnergy")
+
+        assert views.single_line_index.has("tax invoice")
+        assert not views.lower_index.has("tax invoice")
+        assert views.camel_split_index.has_all(["origin energy", "origin"])
+        assert views.lower_index is views.lower_index
+        assert text_views.of("Tax\nInvoice from OriginEnergy") is views
+        assert text_views.of("other text", views) is views